@@ -0,0 +1,189 @@
+#!/bin/python
+"""Benchmark suite for the public dihz functions.
+
+Usage:
+    python benchmarks/run.py [-s SIZES] [-k PATTERN] [-o OUT.json] [-c BASELINE.json]
+
+Every case is timed at each size it supports (best and median of
+`repeat` runs) and its peak memory is measured in a separate run with
+tracemalloc, which sees numpy's allocations. Results are written as
+JSON; with --compare they are checked against a previous run and the
+script exits with status 1 if any case got slower than --threshold.
+"""
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib
+matplotlib.use('Agg')
+
+import dihz
+from dihz import seff, sshz, circumstellar, circumbinary, stability, semianalytic, batch
+
+SIZES = [1, 10**3, 10**6, 10**7]
+
+
+def catalog(n, seed=0):
+    """Random catalog of n binary star systems with HZs in most rows."""
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'abS': rng.uniform(15., 40., n), 'abP': rng.uniform(0.05, 0.3, n),
+            'eb': rng.uniform(0., 0.4, n)}
+
+def argsS(c):
+    return (c['LA'], c['teffA'], c['LB'], c['teffB'], c['abS'], c['eb'])
+
+def argsP(c):
+    return (c['LA'], c['teffA'], c['mA'], c['LB'], c['teffB'], c['mB'], c['abP'], c['eb'])
+
+def quiet(func):
+    # the semianalytic and plotting functions print diagnostics
+    def run(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args)
+    return run
+
+def plotS(c):
+    dihz.plot.circumstellarhz2D(c['LA'][0], c['LB'][0], c['teffA'][0], c['teffB'][0],
+                                c['mA'][0], c['mB'][0], c['abS'][0], c['eb'][0])
+    dihz.plot.plt.close('all')
+
+def plotP(c):
+    dihz.plot.circumbinaryhz2D(c['LA'][0], c['LB'][0], c['teffA'][0], c['teffB'][0],
+                               c['mA'][0], c['mB'][0], c['abP'][0], c['eb'][0])
+    dihz.plot.plt.close('all')
+
+def hzfigure(c):
+    dihz.plot.hzfigure('P', c['LA'][0], c['LB'][0], c['teffA'][0], c['teffB'][0],
+                       c['mA'][0], c['mB'][0], c['abP'][0], c['eb'][0]).savefig(io.BytesIO(), format='png')
+
+def batchcat(c, ab):
+    return {'LA': c['LA'], 'teffA': c['teffA'], 'mA': c['mA'], 'LB': c['LB'],
+            'teffB': c['teffB'], 'mB': c['mB'], 'ab': c[ab], 'eb': c['eb']}
+
+# name: (function, arguments from catalog, largest size)
+CASES = {
+    'seff.seffi': (seff.seffi, lambda c: (c['teffA'],), None),
+    'seff.seffo': (seff.seffo, lambda c: (c['teffA'],), None),
+    'seff.seffio': (seff.seffio, lambda c: (c['teffA'],), None),
+    'sshz.SSHZ': (sshz.SSHZ, lambda c: (c['LA'], c['teffA']), None),
+    'circumstellar.PHZ': (circumstellar.PHZ, argsS, None),
+    'circumstellar.AHZ': (circumstellar.AHZ, argsS, None),
+    'circumbinary.PHZ': (circumbinary.PHZ, argsP, None),
+    'circumbinary.AHZ': (circumbinary.AHZ, argsP, None),
+    'stability.hw99S': (stability.hw99S, lambda c: (c['mA'], c['mB'], c['abS'], c['eb']), None),
+    'stability.hw99P': (stability.hw99P, lambda c: (c['mA'], c['mB'], c['abP'], c['eb']), None),
+    'batch.hzS': (batch.hzS, lambda c: (batchcat(c, 'abS'),), None),
+    'batch.hzP': (batch.hzP, lambda c: (batchcat(c, 'abP'),), None),
+    'semianalytic.PHZ_A': (quiet(semianalytic.PHZ_A), argsS, 10**6),
+    'semianalytic.AHZ_S': (quiet(semianalytic.AHZ_S), argsS, 10**6),
+    'semianalytic.PHZ_P': (quiet(semianalytic.PHZ_P), argsP, 10**6),
+    'semianalytic.AHZ_P': (quiet(semianalytic.AHZ_P), argsP, 10**6),
+    'plot.circumstellarhz2D': (quiet(plotS), lambda c: (c,), 1),
+    'plot.circumbinaryhz2D': (quiet(plotP), lambda c: (c,), 1),
+    'plot.hzfigure': (hzfigure, lambda c: (c,), 1),
+}
+
+
+def measure(func, args, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter()-t0)
+    times.sort()
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'min': times[0], 'median': times[len(times)//2], 'repeat': repeat,
+            'peak_bytes': peak}
+
+def run(sizes=SIZES, pattern='*', repeat=None):
+    """Run all cases matching pattern at all supported sizes.
+
+    Returns:
+    -------
+    res ... dict with 'meta' and 'results'[case][size] timing dicts
+    """
+    res = {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                    'platform': platform.platform(), 'machine': platform.machine(),
+                    'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+           'results': {}}
+    for n in sizes:
+        c = catalog(n)
+        for name, (func, args, nmax) in CASES.items():
+            if(not fnmatch.fnmatch(name, pattern) or (nmax is not None and n > nmax)):
+                continue
+            r = repeat or (5 if n <= 10**3 else 3 if n <= 10**6 else 1)
+            m = measure(func, args(c), r)
+            res['results'].setdefault(name, {})[str(n)] = m
+            print('%-26s n=%-9d min %10.3f ms  median %10.3f ms  peak %9.1f MB' %
+                  (name, n, 1e3*m['min'], 1e3*m['median'], m['peak_bytes']/2**20))
+        del c
+    return res
+
+def compare(res, baseline, threshold=1.2):
+    """Print time ratios against a baseline run.
+
+    Returns:
+    -------
+    slower ... list of (case, size, ratio) above threshold
+    """
+    slower = []
+    for name, sizes in res['results'].items():
+        for n, m in sizes.items():
+            b = baseline['results'].get(name, {}).get(n)
+            if(b is None):
+                continue
+            ratio = m['min']/b['min']
+            mem = m['peak_bytes']/max(b['peak_bytes'], 1)
+            flag = '  SLOWER' if ratio > threshold else ''
+            print('%-26s n=%-9s time x%.2f  memory x%.2f%s' % (name, n, ratio, mem, flag))
+            if(ratio > threshold):
+                slower.append((name, n, ratio))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-s', '--sizes', type=int, nargs='*', default=SIZES)
+    parser.add_argument('-k', '--pattern', default='*', help='glob pattern of case names')
+    parser.add_argument('-r', '--repeat', type=int, default=None)
+    parser.add_argument('-o', '--output', default='benchmarks.json')
+    parser.add_argument('-c', '--compare', default=None, help='baseline JSON file')
+    parser.add_argument('-t', '--threshold', type=float, default=1.2,
+                        help='time ratio above which a case counts as slower')
+    args = parser.parse_args(argv)
+
+    res = run(args.sizes, args.pattern, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump(res, f, indent=1)
+
+    if(args.compare):
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if(compare(res, baseline, args.threshold)):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
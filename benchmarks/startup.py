@@ -0,0 +1,57 @@
+#!/bin/python
+"""Measure the start-up time of `python -c "import dihz"`.
+
+Usage:
+    python benchmarks/startup.py [-n REPEAT] [-m MODULE]
+
+Each measurement runs a fresh interpreter, so the numbers include the
+interpreter start-up itself. It is reported separately (`python -c pass`)
+so that the cost of importing dihz can be read off as the difference.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timeit(code, repeat):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT+os.pathsep+env.get('PYTHONPATH', '')
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, env=env)
+        times.append(time.perf_counter()-t0)
+    times.sort()
+    return {'min': times[0], 'median': times[len(times)//2], 'repeat': repeat}
+
+
+def startup(repeat=20, modules=('dihz',)):
+    """Start-up times [s] of the bare interpreter and of importing modules."""
+    res = {'python': timeit('pass', repeat)}
+    for module in modules:
+        res[module] = timeit('import '+module, repeat)
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--repeat', type=int, default=20)
+    parser.add_argument('-m', '--module', nargs='*', default=['dihz'],
+                        help='modules to import, e.g. dihz dihz.plot')
+    args = parser.parse_args(argv)
+
+    res = startup(args.repeat, args.module)
+    base = res['python']['min']
+    for name, r in res.items():
+        extra = '' if name == 'python' else '  (+%.1f ms)' % (1e3*(r['min']-base))
+        print('%-20s min %7.1f ms  median %7.1f ms%s' % (name, 1e3*r['min'], 1e3*r['median'], extra))
+    print(json.dumps(res))
+
+
+if __name__ == '__main__':
+    main()
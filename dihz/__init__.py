@@ -1,6 +1,45 @@
-from .circumbinary import *
-from .circumstellar import *
-from .sshz import *
-from .seff import *
-from .stability import *
-from .plot import *
+import importlib
+
+# Submodules are imported on first attribute access (PEP 562), so that
+# `import dihz` stays cheap and matplotlib is only loaded for plotting.
+
+_submodules = ['circumbinary', 'circumstellar', 'sshz', 'seff', 'stability',
+               'plot', 'batch', 'semianalytic', 'pipeline', 'parallel', 'store',
+               'sweep', 'nbody', 'insolation', 'uncertainty', 'instrument', 'cache', 'server', 'index', 'surface', 'fused', 'chunked', 'stars', 'evolution']
+
+# names exported at package level, the __all__ of each module (checked
+# by tests/test_exports.py), later modules take precedence
+_exports = [('circumbinary', ['reqb', 'reqpP', 'eforcedP', 'epmaxPe0', 'epmaxP',
+                              'eav2P', 'eav2Pe0', 'PHZ', 'AHZ']),
+            ('circumstellar', ['reqb', 'reqpS', 'eforcedS', 'epmaxSe0', 'epmaxS',
+                               'eav2S', 'eav2Se0', 'PHZ', 'AHZ']),
+            ('sshz', ['SSHZ']),
+            ('seff', ['seffi', 'seffo', 'seffall', 'seffio', 'SeffTable']),
+            ('stability', ['stabilityLimit', 'hw99S', 'hw99P']),
+            ('plot', ['circumbinaryhz2D', 'circumstellarhz2D', 'hzfigure', 'savehz', 'gallery']),
+            ('batch', ['hzP', 'hzS']),
+            ('cache', ['HZCache']),
+            ('stars', ['MassTable', 'mainsequence', 'spectype', 'complete'])]
+
+_origin = {}
+for _module, _names in _exports:
+    for _name in _names:
+        _origin[_name] = _module
+del _module, _names, _name
+
+__all__ = list(_origin)
+
+
+def __getattr__(name):
+    if(name in _submodules):
+        value = importlib.import_module('.'+name, __name__)
+    elif(name in _origin):
+        value = getattr(importlib.import_module('.'+_origin[name], __name__), name)
+    else:
+        raise AttributeError("module 'dihz' has no attribute '"+name+"'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules) | set(_origin))
@@ -0,0 +1,4 @@
+import sys
+from .pipeline import main
+
+sys.exit(main())
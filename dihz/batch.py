@@ -0,0 +1,251 @@
+#!/bin/python
+import numpy as np
+from . import circumbinary
+from . import circumstellar
+from . import stability
+from . import semianalytic
+from . import fused
+from . import stars
+
+################################
+# Catalog-scale (batch) evaluation
+###############################
+
+__all__=['hzP','hzS']
+
+# default number of rows evaluated per block
+BLOCK = 65536
+
+# catalog columns for P-type and S-type systems
+COLUMNSP = ['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb']
+COLUMNSS = COLUMNSP
+
+# output columns of hzP and hzS
+RESULTS = ['phzi', 'phzo', 'ahzi', 'ahzo', 'astab']
+FLAGS = ['valid', 'phz', 'ahz']
+
+
+def columns(catalog, names, dtype=np.float64):
+    """Extract contiguous floating point columns from a catalog.
+    Missing luminosities, effective temperatures and masses (absent
+    columns or nan entries) are filled in with main-sequence values
+    from the masses or spectral types, see stars.complete.
+
+    Parameters:
+    ----------
+    catalog ... numpy structured array or dict of columns
+    names   ... list of column names
+    dtype   ... floating point type of the columns
+
+    Returns:
+    -------
+    cols    ... dict of contiguous 1D arrays of equal length
+    """
+    cols = {}
+    for name in names:
+        if(name in stars.DERIVED and not stars._has(catalog, name)):
+            continue
+        cols[name] = np.ascontiguousarray(catalog[name], dtype=dtype).ravel()
+    stars.complete(catalog, cols, [k for k in names if k in stars.DERIVED], dtype)
+
+    n = {len(c) for c in cols.values()}
+    if(len(n) > 1):
+        raise ValueError('Catalog columns must have equal length!')
+
+    return cols
+
+
+def valid(c):
+    """Mask of physically meaningful catalog rows.
+
+    Parameters:
+    ----------
+    c ... dict of catalog columns (see COLUMNSP, COLUMNSS)
+
+    Returns:
+    -------
+    valid ... boolean array, True where L, m, ab > 0 and 0 <= eb < 1
+    """
+    ok = (c['LA'] > 0) & (c['LB'] > 0) & (c['mA'] > 0) & (c['mB'] > 0)
+    ok &= (c['teffA'] > 0) & (c['teffB'] > 0)
+    ok &= (c['ab'] > 0) & (c['eb'] >= 0) & (c['eb'] < 1)
+    return ok
+
+
+def _kernelP(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    [phzi, phzo] = circumbinary.PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+    [ahzi, ahzo] = circumbinary.AHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+    astab = stability.hw99P(mA, mB, ab, eb)
+    return [phzi, phzo, ahzi, ahzo, astab]
+
+def _kernelS(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    [phzi, phzo] = circumstellar.PHZ(LA, teffA, LB, teffB, ab, eb)
+    [ahzi, ahzo] = circumstellar.AHZ(LA, teffA, LB, teffB, ab, eb)
+    astab = stability.hw99S(mA, mB, ab, eb)
+    return [phzi, phzo, ahzi, ahzo, astab]
+
+def _kernelPsemi(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    p = (LA, teffA, mA, LB, teffB, mB, ab, eb)
+    res = [semianalytic.solve(r, *p) for r in ['phziP', 'phzoP', 'ahziP', 'ahzoP']]
+    return [np.where(conv, x, np.nan) for x, conv in res]+[stability.hw99P(mA, mB, ab, eb)]
+
+def _kernelSsemi(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    p = (LA, teffA, LB, teffB, ab, eb)
+    res = [semianalytic.solve(r, *p) for r in ['phziS', 'phzoS', 'ahziS', 'ahzoS']]
+    return [np.where(conv, x, np.nan) for x, conv in res]+[stability.hw99S(mA, mB, ab, eb)]
+
+KERNELS = {('P', 'analytic'): _kernelP, ('S', 'analytic'): _kernelS,
+           ('P', 'semianalytic'): _kernelPsemi, ('S', 'semianalytic'): _kernelSsemi}
+
+# kernels that have a fused variant writing into the result arrays
+FUSED = {_kernelP: fused.edgesP, _kernelS: fused.edgesS}
+
+def _kernel(hztype, method):
+    if((hztype, method) not in KERNELS):
+        raise ValueError('Method not recognized. \
+                              Choose "analytic" or "semianalytic".')
+    return KERNELS[(hztype, method)]
+
+def _rows(catalog, rows):
+    # rows of a catalog, as a dict of columns (views for slices)
+    keys = catalog.dtype.names if getattr(catalog, 'dtype', None) is not None else list(catalog)
+    return {k: np.asarray(catalog[k]).reshape(-1)[rows] for k in keys}
+
+def _length(catalog):
+    # number of catalog rows
+    if(getattr(catalog, 'dtype', None) is not None):
+        return catalog.size
+    n = {np.size(catalog[k]) for k in catalog}
+    if(len(n) > 1):
+        raise ValueError('Catalog columns must have equal length!')
+    return n.pop() if n else 0
+
+def _hz(catalog, names, kernel, block, dtype=np.float64):
+    dtype = np.dtype(dtype)
+    reduced = dtype != np.float64
+    if(reduced and kernel not in FUSED):
+        raise ValueError('Reduced precision requires the analytic method.')
+
+    n = _length(catalog)
+
+    res = {}
+    for name in RESULTS:
+        res[name] = np.full(n, np.nan, dtype=dtype)
+    for name in FLAGS:
+        res[name] = np.zeros(n, dtype=bool)
+    if(reduced):
+        res['recomputed'] = np.zeros(n, dtype=bool)
+
+    work = fused.Workspace(dtype=dtype) if kernel in FUSED else None
+
+    with np.errstate(all='ignore'):
+        for start in range(0, n, block):
+            s = slice(start, min(start+block, n))
+            # only the rows of the block are converted and completed
+            cs = columns(_rows(catalog, s), names, dtype)
+
+            ok = valid(cs)
+            if(work is not None):
+                # evaluate straight into the result arrays
+                out = [res[name][s] for name in RESULTS]
+                flags = res['recomputed'][s] if reduced else None
+                FUSED[kernel](*[cs[k] for k in names], out=out, work=work, flags=flags)
+                if(reduced):
+                    # rows that lost precision to cancellation, redone in float64
+                    flags &= ok
+                    idx = np.nonzero(flags)[0]
+                    if(idx.size):
+                        # from the catalog values, these rows are sensitive
+                        # to the rounding of the inputs as well
+                        c64 = columns(_rows(catalog, start+idx), names)
+                        redo = FUSED[kernel](*[c64[k] for k in names])
+                        for x, y in zip(out, redo):
+                            x[idx] = y
+                for x in out:
+                    x[~ok] = np.nan
+            else:
+                out = kernel(*[cs[k] for k in names])
+                for name, x in zip(RESULTS, out):
+                    np.copyto(res[name][s], x, where=ok)
+            [phzi, phzo, ahzi, ahzo, astab] = out
+
+            res['valid'][s] = ok
+            res['phz'][s] = ok & (phzi > 0) & (phzo > phzi)
+            res['ahz'][s] = ok & (ahzi > 0) & (ahzo > ahzi)
+
+    return res
+
+def hzP(catalog, block=BLOCK, method='analytic', dtype=np.float64):
+    """Permanently and Averaged Habitable Zones as well as the
+    Holman & Wiegert (1999) stability limit for a catalog of
+    P-type binary star systems.
+
+    The catalog is evaluated in blocks of at most `block` rows,
+    so that apart from the output arrays only a bounded number
+    of block sized temporaries is allocated.
+
+    Parameters:
+    ----------
+    catalog ... numpy structured array or dict of columns with
+                LA, teffA, mA, LB, teffB, mB, ab, eb
+                (see circumbinary.PHZ for units); L and teff may be left
+                out for main-sequence stars with masses or spectral
+                types (sptA, sptB), see stars.complete
+    block   ... number of rows evaluated at once
+    method  ... 'analytic' or 'semianalytic' habitable zones
+    dtype   ... floating point type of the computation and results;
+                np.float32 halves the memory traffic (analytic method
+                only), rows that lose more than fused.RTOL relative
+                accuracy to cancellation are recomputed in float64
+
+    Returns:
+    -------
+    res     ... dict of contiguous arrays of catalog length:
+                phzi, phzo ... inner and outer edge of the PHZ [au]
+                ahzi, ahzo ... inner and outer edge of the AHZ [au]
+                astab      ... minimum stable planetary orbit distance [au]
+                valid      ... input row is physically meaningful
+                phz        ... a PHZ exists (0 < phzi < phzo)
+                ahz        ... an AHZ exists (0 < ahzi < ahzo)
+                recomputed ... row was recomputed in float64
+                               (only in reduced precision)
+    """
+    return _hz(catalog, COLUMNSP, _kernel('P', method), block, dtype)
+
+def hzS(catalog, block=BLOCK, method='analytic', dtype=np.float64):
+    """Permanently and Averaged Habitable Zones as well as the
+    Holman & Wiegert (1999) stability limit for a catalog of
+    S-type binary star systems. The habitable zones are
+    calculated around the primary star.
+
+    The catalog is evaluated in blocks of at most `block` rows,
+    so that apart from the output arrays only a bounded number
+    of block sized temporaries is allocated.
+
+    Parameters:
+    ----------
+    catalog ... numpy structured array or dict of columns with
+                LA, teffA, mA, LB, teffB, mB, ab, eb
+                (see circumstellar.PHZ for units); L and teff may be left
+                out for main-sequence stars with masses or spectral
+                types (sptA, sptB), see stars.complete
+    block   ... number of rows evaluated at once
+    method  ... 'analytic' or 'semianalytic' habitable zones
+    dtype   ... floating point type of the computation and results;
+                np.float32 halves the memory traffic (analytic method
+                only), rows that lose more than fused.RTOL relative
+                accuracy to cancellation are recomputed in float64
+
+    Returns:
+    -------
+    res     ... dict of contiguous arrays of catalog length:
+                phzi, phzo ... inner and outer edge of the PHZ [au]
+                ahzi, ahzo ... inner and outer edge of the AHZ [au]
+                astab      ... maximum stable planetary orbit distance [au]
+                valid      ... input row is physically meaningful
+                phz        ... a PHZ exists (0 < phzi < phzo)
+                ahz        ... an AHZ exists (0 < ahzi < ahzo)
+                recomputed ... row was recomputed in float64
+                               (only in reduced precision)
+    """
+    return _hz(catalog, COLUMNSS, _kernel('S', method), block, dtype)
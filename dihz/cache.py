@@ -0,0 +1,218 @@
+#!/bin/python
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from . import batch
+
+################################
+# Memoized habitable zones
+###############################
+# Results of batch.hzP / batch.hzS for individual systems are kept in a
+# least recently used cache keyed on (hztype, method, parameters), with
+# the parameters rounded to a number of significant digits. Misses of a
+# query are evaluated together in one vectorized call, from the exact
+# parameters; the rounded ones only serve as the key.
+
+__all__=['HZCache']
+
+# cached values per system, in this order
+VALUES = batch.RESULTS+batch.FLAGS
+
+PARAMS = batch.COLUMNSP
+
+METHODS = ['analytic', 'semianalytic']
+
+
+def _round(x, digits):
+    # round to significant digits, zeros and non-finite values are kept
+    x = np.asarray(x, dtype=float)
+    with np.errstate(all='ignore'):
+        e = np.floor(np.log10(np.abs(x)))
+        scale = 10.**(digits-1-e)
+        r = np.round(x*scale)/scale
+    return np.where(np.isfinite(r), r, x)
+
+def _key(p):
+    # nan != nan would never hit, so missing values are keyed as None
+    return tuple(None if v != v else v for v in p)
+
+def _nbytes(key, value):
+    return (sys.getsizeof(key)+sum(sys.getsizeof(k) for k in key)+
+            sys.getsizeof(value)+sum(sys.getsizeof(v) for v in value))
+
+
+class HZCache:
+    """Bounded LRU cache of habitable zones and stability limits.
+
+    Two queries share an entry if hztype and method agree and all
+    parameters agree to `digits` significant digits (missing, nan
+    parameters agree with each other). Misses are computed from the
+    exact parameters, so they equal batch.hzP / batch.hzS; a hit returns
+    the values of the first query that created the entry, which may
+    differ from its own parameters in the last rounded digit.
+
+    Parameters:
+    ----------
+    maxsize  ... maximum number of cached systems
+    maxbytes ... maximum estimated memory of the cached entries [bytes],
+                 None for no limit
+    digits   ... significant digits of the parameters in the cache key
+    path     ... optional .npz file; loaded on creation if it exists,
+                 written by save() and on leaving a with block
+    """
+
+    def __init__(self, maxsize=65536, maxbytes=None, digits=8, path=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.digits = digits
+        self.path = path
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        if(path is not None and os.path.exists(path)):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if(self.path is not None):
+            self.save()
+
+    def _insert(self, key, value):
+        old = self._data.pop(key, None)
+        if(old is not None):
+            self.nbytes -= _nbytes(key, old)
+        self._data[key] = value
+        self.nbytes += _nbytes(key, value)
+        while(len(self._data) > self.maxsize or
+              (self.maxbytes is not None and self.nbytes > self.maxbytes and self._data)):
+            k, v = self._data.popitem(last=False)
+            self.nbytes -= _nbytes(k, v)
+            self.evictions += 1
+
+    def query(self, catalog, hztype='P', method='analytic'):
+        """Habitable zones and stability limits for a catalog,
+        served from the cache where possible.
+
+        Parameters:
+        ----------
+        catalog ... numpy structured array or dict of columns with
+                    LA, teffA, mA, LB, teffB, mB, ab, eb
+        hztype  ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+        method  ... 'analytic' or 'semianalytic' habitable zones
+
+        Returns:
+        -------
+        res     ... dict of arrays as returned by batch.hzP / batch.hzS
+        """
+        if(hztype not in ['S', 'P']):
+            raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+        kernel = batch._kernel(hztype, method)
+
+        c = batch.columns(catalog, PARAMS)
+        r = {k: _round(c[k], self.digits) for k in PARAMS}
+        n = len(r[PARAMS[0]])
+        keys = [(hztype, method)+_key(p) for p in zip(*[r[k].tolist() for k in PARAMS])]
+
+        values = [None]*n
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                v = self._data.get(key)
+                if(v is None):
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._data.move_to_end(key)
+                    values[i] = v
+            self.hits += n-sum(len(rows) for rows in missing.values())
+            self.misses += sum(len(rows) for rows in missing.values())
+
+        if(missing):
+            first = [rows[0] for rows in missing.values()]
+            sub = batch._hz({k: c[k][first] for k in PARAMS}, PARAMS, kernel, batch.BLOCK)
+            new = list(zip(*[sub[k].tolist() for k in VALUES]))
+            with self._lock:
+                for (key, rows), v in zip(missing.items(), new):
+                    self._insert(key, v)
+                    for i in rows:
+                        values[i] = v
+
+        res = {}
+        for j, k in enumerate(VALUES):
+            dtype = bool if k in batch.FLAGS else float
+            res[k] = np.array([v[j] for v in values], dtype=dtype)
+        return res
+
+    def lookup(self, hztype, LA, teffA, mA, LB, teffB, mB, ab, eb, method='analytic'):
+        """Habitable zones and stability limit of a single system.
+
+        Returns:
+        -------
+        res ... dict with phzi, phzo, ahzi, ahzo, astab [au] and
+                the flags valid, phz, ahz (see batch.hzP)
+        """
+        p = dict(zip(PARAMS, [LA, teffA, mA, LB, teffB, mB, ab, eb]))
+        res = self.query({k: np.atleast_1d(v) for k, v in p.items()}, hztype, method)
+        return {k: v[0].item() for k, v in res.items()}
+
+    def stats(self):
+        """Cache statistics.
+
+        Returns:
+        -------
+        res ... dict with size, nbytes, hits, misses, evictions and hitrate
+        """
+        with self._lock:
+            total = self.hits+self.misses
+            return {'size': len(self._data), 'nbytes': self.nbytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions,
+                    'hitrate': self.hits/total if total else 0.}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def save(self, path=None):
+        """Write the cache to an .npz file, least recently used entries first.
+
+        Parameters:
+        ----------
+        path ... output file, default the path given on creation
+        """
+        path = self.path if path is None else path
+        with self._lock:
+            items = list(self._data.items())
+        keys = np.array([(k[0], METHODS.index(k[1])) for k, v in items],
+                        dtype=[('hztype', 'S1'), ('method', 'u1')]).reshape(len(items))
+        params = np.array([k[2:] for k, v in items], dtype=float).reshape(len(items), len(PARAMS))
+        values = np.array([v for k, v in items], dtype=float).reshape(len(items), len(VALUES))
+
+        tmp = path+'.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, keys=keys, params=params, values=values, digits=self.digits)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Add the entries of a file written by save(). Entries stored
+        with a different number of significant digits are skipped."""
+        with np.load(path) as f:
+            if(int(f['digits']) != self.digits):
+                return
+            keys, params, values = f['keys'], f['params'], f['values']
+        nflags = len(batch.FLAGS)
+        with self._lock:
+            for key, p, v in zip(keys, params.tolist(), values.tolist()):
+                k = (key['hztype'].decode(), METHODS[key['method']])+_key(p)
+                self._insert(k, tuple(v[:-nflags])+tuple(bool(x) for x in v[-nflags:]))
@@ -0,0 +1,313 @@
+#!/bin/python
+import glob
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from . import batch
+from . import instrument
+from . import stars
+
+################################
+# Out-of-core evaluation of chunked catalogs
+###############################
+# Catalogs larger than memory are read chunk by chunk from any chunked
+# array source and the results are written to a chunked sink with the
+# same chunk boundaries. Sources are duck typed: anything with .shape,
+# optionally .chunks, and row slicing works. That includes h5py and
+# zarr datasets and groups, numpy (memory mapped) arrays, dicts of
+# columns and NpyChunks directories. h5py and zarr are never imported
+# here. Chunks are read ahead on a background thread, so reading the
+# next chunk overlaps with evaluating the current one.
+
+__all__=['NpyChunks','chunks','run']
+
+# default number of rows per chunk of unchunked sources
+CHUNKSIZE = 4*batch.BLOCK
+
+# default number of chunks read ahead
+PREFETCH = 2
+
+HZTYPES = {'S': batch.COLUMNSS, 'P': batch.COLUMNSP}
+
+# file name of chunk i in an NpyChunks directory
+CHUNKNAME = '%06d.npy'
+
+
+class NpyChunks:
+    """Directory of .npy files holding consecutive row chunks of one
+    array, in the order of their (zero padded) file names. The files
+    are memory mapped on access.
+
+    A directory of structured array chunks is a catalog source or a
+    result sink of its own. A dict of NpyChunks with 1D chunks, one
+    directory per column, is a column-wise source.
+
+    Parameters:
+    ----------
+    path ... directory
+    mode ... 'r' read only, 'w' write new chunks with append()
+             (the directory is created and must not hold chunks yet)
+    """
+
+    def __init__(self, path, mode='r'):
+        if(mode not in ['r', 'w']):
+            raise ValueError('Mode not recognized. Choose "r" or "w".')
+        self.path = path
+        self.mode = mode
+        if(mode == 'w'):
+            os.makedirs(path, exist_ok=True)
+            if(self._files()):
+                raise FileExistsError('Chunk directory '+str(path)+' is not empty.')
+        elif(not os.path.isdir(path)):
+            raise FileNotFoundError('No chunk directory at '+str(path))
+        self._open()
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.path, '*.npy')))
+
+    def _open(self):
+        self._maps = [np.load(f, mmap_mode='r') for f in self._files()]
+        self.offsets = np.zeros(len(self._maps)+1, dtype=np.int64)
+        np.cumsum([len(m) for m in self._maps], out=self.offsets[1:])
+
+    @property
+    def shape(self):
+        return (int(self.offsets[-1]),)+(self._maps[0].shape[1:] if self._maps else ())
+
+    @property
+    def dtype(self):
+        return self._maps[0].dtype if self._maps else None
+
+    @property
+    def chunks(self):
+        return (len(self._maps[0]),)+self.shape[1:] if self._maps else None
+
+    @property
+    def bounds(self):
+        """(start, stop) row ranges of the chunk files."""
+        return list(zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if(isinstance(key, str)):
+            return self[:][key]
+        if(not isinstance(key, slice)):
+            raise TypeError('Index the chunks with a row slice or a field name.')
+        start, stop, step = key.indices(len(self))
+        if(step != 1):
+            raise ValueError('Row slices must be contiguous.')
+        i0 = np.searchsorted(self.offsets, start, side='right')-1
+        i1 = np.searchsorted(self.offsets, stop, side='left')
+        parts = []
+        for i in range(max(i0, 0), i1):
+            o = self.offsets[i]
+            parts.append(self._maps[i][max(start-o, 0):stop-o])
+        if(not parts):
+            return np.zeros((0,)+self.shape[1:], dtype=self.dtype)
+        return np.concatenate(parts)
+
+    def append(self, data):
+        """Write the next chunk.
+
+        Parameters:
+        ----------
+        data ... numpy array, structured arrays for catalogs and results
+        """
+        if(self.mode != 'w'):
+            raise IOError('Chunk directory is opened read only.')
+        path = os.path.join(self.path, CHUNKNAME % len(self._maps))
+        tmp = path+'.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data))
+        os.replace(tmp, path)
+        self._maps.append(np.load(path, mmap_mode='r'))
+        self.offsets = np.append(self.offsets, self.offsets[-1]+len(data))
+
+
+def _structured(source):
+    return getattr(getattr(source, 'dtype', None), 'names', None) is not None
+
+def _bounds(source, names, chunksize):
+    # row ranges following the chunking of the source; chunksize is
+    # rounded to a multiple of the source chunks
+    arr = source if _structured(source) else source[names[0]]
+    if(hasattr(arr, 'bounds')):
+        # NpyChunks: whole files, chunksize groups consecutive files
+        bounds = list(arr.bounds)
+        step = arr.chunks[0] if arr.chunks else CHUNKSIZE
+        if(chunksize and bounds):
+            k = max(1, int(round(chunksize/step)))
+            bounds = [(bounds[i][0], bounds[min(i+k, len(bounds))-1][1]) for i in range(0, len(bounds), k)]
+            step *= k
+        return bounds, step
+    n = arr.shape[0]
+    chunks = getattr(arr, 'chunks', None)
+    step = chunks[0] if chunks else (chunksize or CHUNKSIZE)
+    if(chunks and chunksize):
+        step *= max(1, int(round(chunksize/step)))
+    return [(start, min(start+step, n)) for start in range(0, n, step)], step
+
+def _reader(source, names):
+    if(_structured(source)):
+        def read(start, stop):
+            data = source[start:stop]
+            return {k: np.asarray(data[k]) for k in names}
+    else:
+        def read(start, stop):
+            return {k: np.asarray(source[k][start:stop]) for k in names}
+    return read
+
+def _prefetch(read, bounds, depth):
+    # read the chunks on a background thread, at most depth ahead
+    if(depth <= 0):
+        for start, stop in bounds:
+            yield start, stop, read(start, stop)
+        return
+
+    q = queue.Queue(depth)
+    done = threading.Event()
+
+    def work():
+        try:
+            for start, stop in bounds:
+                if(done.is_set()):
+                    return
+                q.put((start, stop, read(start, stop)))
+        except BaseException as e:
+            q.put(e)
+            return
+        q.put(None)
+
+    thread = threading.Thread(target=work, name='dihz-prefetch', daemon=True)
+    thread.start()
+    try:
+        while(True):
+            t0 = time.perf_counter()
+            item = q.get()
+            if(instrument.ENABLED and isinstance(item, tuple)):
+                instrument.record('chunked.wait', time.perf_counter()-t0, item[1]-item[0])
+            if(item is None):
+                break
+            if(isinstance(item, BaseException)):
+                raise item
+            yield item
+    finally:
+        # unblock and retire the reader if the consumer stops early
+        done.set()
+        while(thread.is_alive()):
+            try:
+                q.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        thread.join()
+
+def chunks(source, names=batch.COLUMNSP, chunksize=None, prefetch=PREFETCH):
+    """Stream the columns of a chunked catalog, reading ahead on
+    a background thread.
+
+    Parameters:
+    ----------
+    source    ... chunked catalog: a structured array-like (h5py/zarr
+                  dataset, NpyChunks, np.memmap) or a mapping of 1D
+                  array-likes (h5py/zarr group, dict) with the columns
+    names     ... columns to read
+    chunksize ... rows per chunk, rounded to a multiple of the source
+                  chunks (of the files of NpyChunks); default the source
+                  chunks, CHUNKSIZE for unchunked sources
+    prefetch  ... number of chunks read ahead, 0 reads synchronously
+
+    Returns:
+    -------
+    generator of (start, stop, cols), cols a dict of column arrays
+    of rows start to stop
+    """
+    bounds = _bounds(source, names, chunksize)[0]
+    return _prefetch(_reader(source, list(names)), bounds, prefetch)
+
+
+class _Sink:
+    # writes result chunks to a sink with the chunking of the source
+
+    def __init__(self, sink, n, step):
+        if(isinstance(sink, (str, os.PathLike))):
+            sink = NpyChunks(sink, 'w')
+        self.sink = sink
+        self.n = n
+        self.step = step
+
+    def write(self, start, stop, res):
+        if(isinstance(self.sink, NpyChunks)):
+            data = np.empty(stop-start, dtype=[(k, v.dtype) for k, v in res.items()])
+            for k, v in res.items():
+                data[k] = v
+            self.sink.append(data)
+            return
+        for k, v in res.items():
+            if(k not in self.sink):
+                self._create(k, v.dtype)
+            self.sink[k][start:stop] = v
+
+    def _create(self, name, dtype):
+        if(hasattr(self.sink, 'create_dataset')):
+            self.sink.create_dataset(name, shape=(self.n,), dtype=dtype,
+                                     chunks=(min(self.step, self.n) or 1,))
+        else:
+            self.sink[name] = np.empty(self.n, dtype=dtype)
+
+
+@instrument.stage('chunked.run')
+def run(source, sink, hztype='P', method='analytic', chunksize=None,
+        prefetch=PREFETCH, keep=(), block=batch.BLOCK, dtype=np.float64):
+    """Calculate PHZ, AHZ and stability limits for a chunked catalog
+    that need not fit in memory, chunk by chunk. Only `prefetch`+1
+    chunks of the catalog and one chunk of results are held at a time.
+
+    Parameters:
+    ----------
+    source    ... chunked catalog with the columns LA, teffA, mA, LB,
+                  teffB, mB, ab, eb, see chunks(); L and teff may be
+                  left out for main-sequence stars, see batch.hzP
+    sink      ... output: an h5py/zarr group or anything with
+                  create_dataset(name, shape, dtype, chunks), one
+                  dataset per result column with the chunk length of
+                  the source; a dict of writable arrays (missing
+                  columns are allocated); or an NpyChunks directory
+                  (or its path) with one structured .npy file per chunk
+    hztype    ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    method    ... 'analytic' or 'semianalytic' habitable zones
+    chunksize ... rows per chunk, see chunks()
+    prefetch  ... number of chunks read ahead on a background thread
+    keep      ... names of input columns copied to the output (e.g. system ids)
+    block     ... rows evaluated at once within a chunk
+    dtype     ... floating point type of the computation, see batch.hzP
+
+    Returns:
+    -------
+    n         ... number of rows processed
+    """
+    if(hztype not in HZTYPES):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+    names = HZTYPES[hztype]
+    kernel = batch._kernel(hztype, method)
+    # columns stars.complete can derive are only read if present
+    read = [k for k in names if k not in stars.DERIVED or stars._has(source, k)]
+    read += [star[3] for star in stars.STARS if stars._has(source, star[3])]
+    read += [k for k in keep if k not in read]
+
+    bounds, step = _bounds(source, read, chunksize)
+    n = bounds[-1][1] if bounds else 0
+    out = _Sink(sink, n, step)
+
+    rows = 0
+    for start, stop, cols in _prefetch(_reader(source, read), bounds, prefetch):
+        res = {k: cols[k] for k in keep}
+        res.update(batch._hz(cols, names, kernel, block, dtype))
+        out.write(start, stop, res)
+        rows += stop-start
+    return rows
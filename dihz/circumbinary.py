@@ -1,6 +1,7 @@
 #!/bin/python
 import numpy as np
 from .seff import *
+from . import instrument
 
 ################################
 # Circumbinary (P-type systems)
@@ -54,6 +55,7 @@ def epmaxPe0(ab, eb, ap, mA, mB):
     emax = 2.*eforcedP(ab, eb, ap, mA, mB)
     return emax
 
+@instrument.stage('circumbinary.epmaxP')
 def epmaxP(ab, eb, ap, mA, mB):
     """Maximum eccentricity of
     planetary orbit in P-type binary system.
@@ -111,7 +113,7 @@ def eav2Pe0(ab, eb, ap, mA, mB):
     -------
     eav2 ... average squared eccentricity of planetary orbit
     """
-    efp = circumbinary.forcedP(ab, eb, ap, mA, mB)
+    efp = eforcedP(ab, eb, ap, mA, mB)
     eav2 = 2.*efp**2
     return eav2
 
@@ -142,9 +144,10 @@ def reqpP(mA, mB, ab, eb, ap):
     -------
     reqp ... equivalent radius [au]
     """
-    reqp = ap*(1-circumbinary.eav2P(ab, eb, ap, mA, mB))**0.25
+    reqp = ap*(1-eav2P(ab, eb, ap, mA, mB))**0.25
     return reqp
 
+@instrument.stage('circumbinary.PHZ')
 def PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb):
     """Permanently Habitable Zone (PHZ) for P-type
     binary star systems (Eggl, 2018).
@@ -172,11 +175,14 @@ def PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb):
     """
     mu = mB/(mA+mB)
 
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
+
+    AI = LA/siA
+    BI = LB/siB
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    AO = LA/soA
+    BO = LB/soB
 
     qpI = sqrt(AI+BI)
     qpO = sqrt(AO+BO)
@@ -200,6 +206,7 @@ def PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb):
 
     return [phzi, phzo]
 
+@instrument.stage('circumbinary.AHZ')
 def AHZ(LA, teffA, mA, LB, teffB,  mB, ab, eb):
     """Averaged Habitable Zone (AHZ) for S-type
      binary star systems (Eggl, 2018).
@@ -227,11 +234,14 @@ def AHZ(LA, teffA, mA, LB, teffB,  mB, ab, eb):
     """
     mu = mB/(mA+mB)
 
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
+
+    AI = LA/siA
+    BI = LB/siB
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    AO = LA/soA
+    BO = LB/soB
 
     apI = sqrt(AI+BI)
     apO = sqrt(AO+BO)
@@ -1,6 +1,7 @@
 #!/bin/python
 import numpy as np
 from .seff import *
+from . import instrument
 
 ################################
 # Circumstellar (S-type systems)
@@ -42,6 +43,7 @@ def eforcedS(ab, eb, ap):
     emax = 5./2.*ap/ab*(eb/(1.-eb*eb))
     return emax
 
+@instrument.stage('circumstellar.epmaxS')
 def epmaxS(ab, eb, ap):
     """Maximum eccentricity of planetary orbit in S-type binary system
     assuming the planet stats out on its forced orbit.
@@ -129,6 +131,7 @@ def reqpS(ab, eb, ap):
     reqp = ap*(1.-eav2S(ab, eb, ap))**(0.25)
     return reqp
 
+@instrument.stage('circumstellar.AHZ')
 def AHZ(LA, teffA, LB, teffB, ab, eb):
     """Averaged Habitable Zone (AHZ) for S-type
      binary star systems (Eggl, 2018).
@@ -153,11 +156,14 @@ def AHZ(LA, teffA, LB, teffB, ab, eb):
     Functions sinner, souter
     """
     #analytic approximation
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    AI = LA/siA
+    BI = LB/siB
+
+    AO = LA/soA
+    BO = LB/soB
 
 #     apI = sqrt(AI)
 #     apO = sqrt(AO)
@@ -181,6 +187,7 @@ def AHZ(LA, teffA, LB, teffB, ab, eb):
 
     return [ahzi, ahzo]
 
+@instrument.stage('circumstellar.PHZ')
 def PHZ(LA, teffA, LB, teffB, ab, eb):
     """Permanently Habitable Zone (PHZ) for S-type
     binary star systems (Eggl, 2018).
@@ -204,11 +211,14 @@ def PHZ(LA, teffA, LB, teffB, ab, eb):
     import numpy as np
     Functions sinner, souter
     """
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
+
+    AI = LA/siA
+    BI = LB/siB
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    AO = LA/soA
+    BO = LB/soB
 
     apI = sqrt(AI)
     apO = sqrt(AO)
@@ -0,0 +1,239 @@
+#!/bin/python
+import numpy as np
+from .seff import seffio
+from . import stability
+from . import instrument
+
+################################
+# Habitable zones along stellar evolution tracks
+###############################
+# The binary orbit and the stellar masses do not change with age, so
+# the mass ratio, the forced eccentricity coefficients, the insolation
+# equivalent binary distance and the stability limits are evaluated
+# once per system (Binary). Only the stellar fluxes are evaluated per
+# age, broadcast against the binary terms, which gives the zones for
+# all ages in one vectorized pass instead of one PHZ/AHZ call per age.
+
+__all__=['Binary','tracks','chz']
+
+sqrt=np.sqrt
+
+
+class Binary:
+    """Age independent terms of the PHZ, AHZ and stability limit of
+    binary star systems, see circumbinary.PHZ and circumstellar.PHZ.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    mA     ... mass of primary star [Msun]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    The parameters are scalars or arrays of one shape, one entry per system.
+    """
+
+    def __init__(self, hztype, mA, mB, ab, eb):
+        if(hztype not in ['S', 'P']):
+            raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+        self.hztype = hztype
+        mA, mB, ab, eb = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (mA, mB, ab, eb)])
+        self.shape = ab.shape
+
+        # trailing axis broadcasts against the ages
+        mA, mB, ab, eb = [x[..., None] for x in (mA, mB, ab, eb)]
+        self.mu = mB/(mA+mB)
+        self.qb = ab*(1.-eb)
+        self.apob = ab*(1.+eb)
+
+        if(hztype == 'P'):
+            self.astab = stability.hw99P(mA, mB, ab, eb)[..., 0]
+            # epmaxP = k/ap
+            self.k = 5./2.*ab*(1-2*self.mu)*(4.*eb+3*eb**3)/(4.+6.*eb*eb)
+            reqbP = ab*(1.-eb*eb)**(0.25)
+            self.cA = (self.mu*reqbP*self.mu)**2
+            self.cB = ((1-self.mu)*reqbP*(1.-self.mu))**2
+        else:
+            self.astab = stability.hw99S(mA, mB, ab, eb)[..., 0]
+            # epmaxS = k*ap
+            self.k = 5./2./ab*(eb/(1.-eb*eb))
+            self.d = ab**2*sqrt(1-eb**2)
+
+    def hz(self, LA, teffA, LB, teffB):
+        """PHZ and AHZ edges for stellar parameters at many ages.
+
+        Parameters:
+        ----------
+        LA     ... luminosity of primary star [Lsun]
+        teffA  ... effective temperature of primary star [K]
+        LB     ... luminosity of secondary star [Lsun]
+        teffB  ... effective temperature of secondary star [K]
+
+        The tracks have the ages on their last axis and shape (nage,),
+        shared by all systems, or self.shape+(nage,).
+
+        Returns:
+        -------
+        phzi, phzo, ahzi, ahzo ... edges of the PHZ and AHZ [au],
+                                   arrays of shape self.shape+(nage,)
+        """
+        siA, soA = seffio(np.asarray(teffA, dtype=float))
+        siB, soB = seffio(np.asarray(teffB, dtype=float))
+
+        AI = LA/siA
+        BI = LB/siB
+        AO = LA/soA
+        BO = LB/soB
+
+        if(self.hztype == 'P'):
+            return self._hzP(AI, BI, AO, BO)
+        return self._hzS(AI, BI, AO, BO)
+
+    def _hzP(self, AI, BI, AO, BO):
+        mu, apob = self.mu, self.apob
+
+        qpI = sqrt(AI+BI)
+        qpO = sqrt(AO+BO)
+
+        apI = qpI/(1.-self.k/qpI)
+        apO = qpO/(1.+self.k/qpO)
+
+        a = qpI-mu*apob
+        b = qpI+(1-mu)*apob
+        phzi = (AI/a**2+BI/b**2)*apI
+
+        a = qpO+mu*apob
+        b = qpO-(1-mu)*apob
+        phzo = (AO/a**2+BO/b**2)*apO
+
+        ahzi = AI*qpI/(qpI**2-self.cA)+BI*qpI/(qpI**2+self.cB)
+        ahzo = AO*qpO/(qpO**2-self.cA)+BO*qpO/(qpO**2+self.cB)
+
+        return [phzi, phzo, ahzi, ahzo]
+
+    def _hzS(self, AI, BI, AO, BO):
+        apI = sqrt(AI)
+        apO = sqrt(AO)
+
+        qpI = apI*(1.-self.k*apI)
+        apopO = apO*(1.+self.k*apO)
+
+        phzi = AI/qpI+BI*qpI/(qpI-self.qb)**2
+        phzo = AO/apopO+BO*apopO/(apopO-self.apob)**2
+
+        ahzi = apI*(1.+BI/(self.d-AI))
+        ahzo = apO*(1.+BO/(self.d-AO))
+
+        return [phzi, phzo, ahzi, ahzo]
+
+
+@instrument.stage('evolution.tracks')
+def tracks(hztype, LA, teffA, mA, LB, teffB, mB, ab, eb):
+    """Permanently and Averaged Habitable Zones along stellar
+    evolution tracks, for all ages at once.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    LA     ... luminosity track of primary star [Lsun]
+    teffA  ... effective temperature track of primary star [K]
+    mA     ... mass of primary star [Msun]
+    LB     ... luminosity track of secondary star [Lsun]
+    teffB  ... effective temperature track of secondary star [K]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    mA, mB, ab, eb are scalars or arrays of shape (nsys,). The tracks
+    have shape (nage,), shared by all systems, or (nsys, nage).
+
+    Returns:
+    -------
+    res    ... dict of arrays:
+               phzi, phzo ... edges of the PHZ [au], shape (nsys, nage)
+               ahzi, ahzo ... edges of the AHZ [au], shape (nsys, nage)
+               phz, ahz   ... the zone exists at that age
+               astab      ... stability limit [au], shape (nsys,)
+    """
+    binary = Binary(hztype, mA, mB, ab, eb)
+    with np.errstate(all='ignore'):
+        phzi, phzo, ahzi, ahzo = binary.hz(LA, teffA, LB, teffB)
+        res = {'phzi': phzi, 'phzo': phzo, 'ahzi': ahzi, 'ahzo': ahzo,
+               'phz': (phzi > 0) & (phzo > phzi), 'ahz': (ahzi > 0) & (ahzo > ahzi),
+               'astab': binary.astab}
+    return res
+
+
+def _windowed(x, length, ufunc, identity):
+    # ufunc reduction of x[..., i:i+length[i]] along the last axis for
+    # every i, streaming over the binary digits of the window lengths:
+    # pass j folds in a table of the windows of length 2**j, built from
+    # the table of the previous pass, so time is O(nage log window)
+    # and only one table is held at a time.
+    res = np.full(x.shape, identity)
+    pos = np.arange(x.shape[-1])
+    rest = np.array(length, dtype=np.int64)
+    table = x
+    k = 1
+    while(True):
+        sel = np.nonzero(rest & 1)[0]
+        if(sel.size):
+            res[..., sel] = ufunc(res[..., sel], table[..., pos[sel]])
+            pos[sel] += k
+        rest >>= 1
+        if(not np.any(rest)):
+            break
+        table = ufunc(table[..., :-k], table[..., k:])
+        k *= 2
+    return res
+
+
+def chz(ages, res, zone='phz', window=None):
+    """Continuously habitable zone: the orbit distances that stay in
+    the habitable zone over an age window.
+
+    Parameters:
+    ----------
+    ages   ... ascending ages of the tracks, shape (nage,)
+    res    ... results of tracks(), or a dict with the zone edges
+    zone   ... 'phz' or 'ahz'
+    window ... age span >= 0; the zone at age t is the intersection
+               [max inner edge, min outer edge] of the zones at all
+               ages in [t, t+window]. None intersects all ages.
+
+    Returns:
+    -------
+    lo, hi ... edges of the continuously habitable zone [au], shape
+               (nsys, nage) for a window, (nsys,) without one; nan where
+               it is empty, the zone is missing at some age, or the
+               window extends beyond the last age
+    """
+    if(zone not in ['phz', 'ahz']):
+        raise ValueError('Zone not recognized. Choose "phz" or "ahz".')
+    inner = np.asarray(res[zone+'i'], dtype=float)
+    outer = np.asarray(res[zone+'o'], dtype=float)
+
+    if(window is None):
+        lo = np.maximum.reduce(inner, axis=-1)
+        hi = np.minimum.reduce(outer, axis=-1)
+    else:
+        ages = np.asarray(ages, dtype=float)
+        if(window < 0):
+            raise ValueError('Age window must not be negative.')
+        if(np.any(np.diff(ages) <= 0)):
+            raise ValueError('Ages must be strictly ascending.')
+        i = np.arange(len(ages))
+        length = np.searchsorted(ages, ages+window, side='right')-i
+        lo = _windowed(inner, length, np.maximum, -np.inf)
+        hi = _windowed(outer, length, np.minimum, np.inf)
+        complete = ages+window <= ages[-1]
+        lo[..., ~complete] = np.nan
+        hi[..., ~complete] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        empty = ~((lo > 0) & (hi >= lo))
+    lo = np.where(empty, np.nan, lo)
+    hi = np.where(empty, np.nan, hi)
+    return lo, hi
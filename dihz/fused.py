@@ -0,0 +1,426 @@
+#!/bin/python
+import numpy as np
+from .seff import COEFFS, teffsun
+
+################################
+# Fused low-temporary evaluation
+###############################
+# The analytic PHZ, AHZ and stability formulae of circumbinary,
+# circumstellar and stability, evaluated block by block with ufunc out=
+# arguments into a fixed set of block sized scratch buffers. Apart from
+# the inputs and outputs memory use is O(block), and outputs can be
+# written into caller supplied arrays (e.g. memory maps or columns of
+# a larger table). Results agree with the reference functions to
+# rounding.
+#
+# With dtype=np.float32 the whole computation stays in single precision.
+# The steps that can lose many digits to cancellation are checked in
+# every row: 1-eb^2, the mass ratio factors 1-2mu (epmaxP) and 1-mu
+# (near-equal and very unequal masses), the distances of the planet to
+# the stars qpI-qb and apopO-apob (S-type) or qp-mu*apob and
+# qp-(1-mu)*apob (P-type), 1-epmax, the AHZ denominators, the P-type
+# AHZ sum of the two stars' terms and the stability polynomials. Rows
+# where the relative difference falls below `tol` are reported in a
+# flags array so that they can be recomputed in float64 (see batch.hzP).
+
+__all__=['Workspace','phzP','ahzP','phzS','ahzS','edgesP','edgesS']
+
+# default number of rows evaluated per block
+BLOCK = 16384
+
+# relative accuracy kept by rows that are not flagged in reduced precision
+RTOL = 1e-4
+
+
+class Workspace:
+    """Named scratch buffers of `block` elements of type dtype,
+    allocated on first use and reused across blocks and calls.
+
+    In reduced precision rows are flagged where a difference of two
+    terms is smaller than tol times the terms. A single cancellation
+    then keeps rtol/10 relative accuracy, tol = 40 eps/rtol; the factor
+    10 leaves room for the rounding errors of earlier steps that later
+    cancellations amplify, so unflagged rows keep `rtol` overall.
+    """
+
+    def __init__(self, block=BLOCK, dtype=np.float64, rtol=RTOL):
+        self.block = block
+        self.dtype = np.dtype(dtype)
+        self.n = block
+        self.guard = self.dtype != np.float64
+        self.tol = 40.*np.finfo(self.dtype).eps/rtol
+        self.flags = None
+        self._buffers = {}
+
+    def __getitem__(self, name):
+        b = self._buffers.get(name)
+        if(b is None):
+            b = self._buffers[name] = np.empty(self.block, dtype=np.bool_ if name[0] == '?' else self.dtype)
+        return b[:self.n]
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self._buffers.values())
+
+
+def _guard(w, diff, ref):
+    # flag rows where diff, a difference of terms of size ref, lost too many digits
+    if(w.guard):
+        g, h, m = w['g'], w['h'], w['?m']
+        np.abs(ref, out=h)
+        h *= w.tol
+        np.abs(diff, out=g)
+        np.less(g, h, out=m)
+        w.flags |= m
+
+def _seff(teff, limit, out, t):
+    # Kopparapu et al. (2014) polynomial in Horner form, t is scratch
+    seff0, a, b, c, d = COEFFS[limit]
+    np.subtract(teff, teffsun, out=t)
+    np.multiply(t, d, out=out)
+    out += c
+    out *= t
+    out += b
+    out *= t
+    out += a
+    out *= t
+    out += seff0
+    return out
+
+def _terms(p, w):
+    # AI, BI, AO, BO = L/S_eff of both stars at both limits
+    for name, L, teff, limit in [('AI', 'LA', 'teffA', 'rg'), ('AO', 'LA', 'teffA', 'mg'),
+                                 ('BI', 'LB', 'teffB', 'rg'), ('BO', 'LB', 'teffB', 'mg')]:
+        x = _seff(p[teff], limit, w[name], w['t'])
+        np.divide(p[L], x, out=x)
+
+def _mu(p, w):
+    mu = w['mu']
+    np.add(p['mA'], p['mB'], out=mu)
+    np.divide(p['mB'], mu, out=mu)
+    return mu
+
+def _phzP(p, w, phzi, phzo):
+    mu = w['mu']
+    ab, eb = p['ab'], p['eb']
+
+    # forced eccentricity epmaxP = C/ap with C = 5/2 ab (1-2mu) (4eb+3eb^3)/(4+6eb^2)
+    C, t = w['C'], w['t']
+    np.multiply(eb, eb, out=t)
+    np.multiply(t, 6., out=C)
+    C += 4.
+    t *= 3.
+    t += 4.
+    t *= eb
+    np.divide(t, C, out=C)
+    np.multiply(mu, -2., out=t)
+    t += 1.
+    _guard(w, t, 1.)
+    C *= t
+    C *= ab
+    C *= 2.5
+
+    # binary apocenter and barycentric distances of the stars
+    apob, ca, cb = w['apob'], w['ca'], w['cb']
+    np.add(eb, 1., out=apob)
+    apob *= ab
+    np.multiply(mu, apob, out=ca)
+    np.subtract(apob, ca, out=cb)
+    _guard(w, cb, apob)
+
+    qp, ap, a, b = w['qp'], w['ap'], w['a'], w['b']
+    for A, B, sign, res in [(w['AI'], w['BI'], -1., phzi), (w['AO'], w['BO'], 1., phzo)]:
+        np.add(A, B, out=qp)
+        np.sqrt(qp, out=qp)
+        # inner: ap = qp/(1-C/qp), outer: ap = qp/(1+C/qp)
+        np.divide(C, qp, out=ap)
+        ap *= sign
+        ap += 1.
+        _guard(w, ap, 1.)
+        np.divide(qp, ap, out=ap)
+        # inner: a = qp-mu apob, b = qp+(1-mu) apob; outer: signs swapped
+        if(sign < 0):
+            np.subtract(qp, ca, out=a)
+            np.add(qp, cb, out=b)
+        else:
+            np.add(qp, ca, out=a)
+            np.subtract(qp, cb, out=b)
+        _guard(w, a, qp)
+        _guard(w, b, qp)
+        a *= a
+        np.divide(A, a, out=a)
+        b *= b
+        np.divide(B, b, out=b)
+        np.add(a, b, out=res)
+        res *= ap
+
+def _ahzP(p, w, ahzi, ahzo):
+    mu = w['mu']
+    eb = p['eb']
+
+    # dA = (mu^2 reqb)^2, dB = ((1-mu)^2 reqb)^2 with reqb = ab (1-eb^2)^(1/4)
+    dA, dB, t = w['dA'], w['dB'], w['t']
+    np.multiply(eb, eb, out=t)
+    np.subtract(1., t, out=t)
+    _guard(w, t, 1.)
+    np.sqrt(t, out=t)
+    np.sqrt(t, out=t)
+    t *= p['ab']
+    np.multiply(mu, mu, out=dA)
+    dA *= t
+    dA *= dA
+    np.subtract(1., mu, out=dB)
+    _guard(w, dB, 1.)
+    dB *= dB
+    dB *= t
+    dB *= dB
+
+    ap2, a, b = w['ap2'], w['a'], w['b']
+    for A, B, res in [(w['AI'], w['BI'], ahzi), (w['AO'], w['BO'], ahzo)]:
+        np.add(A, B, out=ap2)
+        np.subtract(ap2, dA, out=a)
+        _guard(w, a, ap2)
+        np.divide(A, a, out=a)
+        np.add(ap2, dB, out=b)
+        np.divide(B, b, out=b)
+        np.add(a, b, out=res)
+        # a < 0 inside the primary's equivalent orbit
+        _guard(w, res, a)
+        np.sqrt(ap2, out=ap2)
+        res *= ap2
+
+def _phzS(p, w, phzi, phzo):
+    ab, eb = p['ab'], p['eb']
+
+    # epmaxS = k ap with k = 5/2 eb/(ab (1-eb^2))
+    k, t = w['k'], w['t']
+    np.multiply(eb, eb, out=t)
+    np.subtract(1., t, out=t)
+    _guard(w, t, 1.)
+    t *= ab
+    np.divide(eb, t, out=k)
+    k *= 2.5
+
+    ap, q, b = w['ap'], w['q'], w['b']
+    for A, B, sign, edge, res in [(w['AI'], w['BI'], -1., -1., phzi),
+                                  (w['AO'], w['BO'], 1., 1., phzo)]:
+        # inner: q = ap (1-k ap), qb = ab (1-eb); outer: q = ap (1+k ap), apob = ab (1+eb)
+        np.sqrt(A, out=ap)
+        np.multiply(k, ap, out=q)
+        q *= sign
+        q += 1.
+        _guard(w, q, 1.)
+        q *= ap
+        np.multiply(eb, edge, out=b)
+        b += 1.
+        b *= ab
+        np.subtract(q, b, out=b)
+        _guard(w, b, q)
+        b *= b
+        np.divide(q, b, out=b)
+        b *= B
+        np.divide(A, q, out=res)
+        res += b
+
+def _ahzS(p, w, ahzi, ahzo):
+    eb = p['eb']
+
+    # ab^2 sqrt(1-eb^2)
+    r, t = w['r'], w['t']
+    np.multiply(eb, eb, out=r)
+    np.subtract(1., r, out=r)
+    _guard(w, r, 1.)
+    np.sqrt(r, out=r)
+    np.multiply(p['ab'], p['ab'], out=t)
+    r *= t
+
+    for A, B, res in [(w['AI'], w['BI'], ahzi), (w['AO'], w['BO'], ahzo)]:
+        np.subtract(r, A, out=t)
+        _guard(w, t, r)
+        np.divide(B, t, out=t)
+        t += 1.
+        _guard(w, t, 1.)
+        np.sqrt(A, out=res)
+        res *= t
+
+def _hw99P(p, w, astab):
+    mu, eb = w['mu'], p['eb']
+    t, u = w['t'], w['u']
+    # ab (1.6+5.1eb-2.22eb^2 + mu (4.12-4.27eb) + mu^2 (-5.09+4.61eb^2))
+    np.multiply(eb, -2.22, out=astab)
+    astab += 5.1
+    astab *= eb
+    astab += 1.6
+    np.multiply(eb, -4.27, out=t)
+    t += 4.12
+    t *= mu
+    astab += t
+    np.multiply(eb, eb, out=t)
+    t *= 4.61
+    t -= 5.09
+    np.multiply(mu, mu, out=u)
+    t *= u
+    astab += t
+    _guard(w, astab, 1.)
+    astab *= p['ab']
+
+def _hw99S(p, w, astab):
+    mu, eb = w['mu'], p['eb']
+    t = w['t']
+    # ab (0.464-0.631eb+0.15eb^2 + mu (-0.38+0.586eb-0.198eb^2))
+    np.multiply(eb, 0.15, out=astab)
+    astab -= 0.631
+    astab *= eb
+    astab += 0.464
+    np.multiply(eb, -0.198, out=t)
+    t += 0.586
+    t *= eb
+    t -= 0.38
+    t *= mu
+    astab += t
+    _guard(w, astab, 1.)
+    astab *= p['ab']
+
+
+def _check(o, n, dtype, what):
+    if(not isinstance(o, np.ndarray) or o.dtype != dtype or o.size != n or
+       not o.flags.c_contiguous or not o.flags.writeable):
+        raise ValueError(what+' must be writeable, C-contiguous '+str(dtype)+' arrays of size '+str(n)+'!')
+    return o.reshape(-1)
+
+def _run(names, params, stages, nout, out, block, work, dtype, flags):
+    # broadcast inputs without copying scalars, evaluate block by block
+    w = work if work is not None else Workspace(block, dtype)
+    block = w.block
+
+    params = [np.asarray(x) for x in params]
+    params = [x if x.dtype.kind == 'f' else x.astype(float) for x in params]
+    shape = np.broadcast_shapes(*[x.shape for x in params])
+    n = int(np.prod(shape))
+    flat = {}
+    for name, x in zip(names, params):
+        flat[name] = w.dtype.type(x[()]) if x.ndim == 0 else np.broadcast_to(x, shape).reshape(-1)
+
+    if(out is None):
+        out = [np.empty(shape, dtype=w.dtype) for i in range(nout)]
+    elif(len(out) != nout):
+        raise ValueError('Expected '+str(nout)+' output arrays!')
+    views = [_check(o, n, w.dtype, 'Output arrays') for o in out]
+    if(flags is not None):
+        flags = _check(flags, n, np.bool_, 'flags')
+
+    with np.errstate(all='ignore'):
+        for start in range(0, n, block):
+            s = slice(start, min(start+block, n))
+            w.n = s.stop-s.start
+            p = {}
+            for k, v in flat.items():
+                if(not isinstance(v, np.ndarray)):
+                    p[k] = v
+                elif(v.dtype == w.dtype):
+                    p[k] = v[s]
+                else:
+                    p[k] = w['_'+k]
+                    p[k][...] = v[s]
+            w.flags = w['?flags']
+            w.flags[...] = False
+            for stage, j in stages:
+                if(j is None):
+                    stage(p, w)
+                else:
+                    stage(p, w, *[v[s] for v in views[j:j+2]])
+            if(flags is not None):
+                flags[s] = w.flags
+    w.n = w.block
+    w.flags = None
+    return [o[()] if o.ndim == 0 else o for o in out]
+
+
+def phzP(LA, teffA, mA, LB, teffB, mB, ab, eb, out=None, block=BLOCK, work=None,
+         dtype=np.float64, flags=None):
+    """Fused circumbinary.PHZ.
+
+    Parameters:
+    ----------
+    LA, teffA, mA, LB, teffB, mB, ab, eb ... see circumbinary.PHZ
+    out   ... optional pair of C-contiguous output arrays of type dtype
+    block ... number of rows evaluated at once
+    work  ... optional Workspace to reuse between calls, its dtype
+              takes precedence over dtype
+    dtype ... floating point type of the computation and the outputs
+    flags ... optional boolean array, set True in rows that lost
+              precision to cancellation (only checked if dtype is not float64)
+
+    Returns:
+    -------
+    phzi, phzo ... inner and outer edge of the PHZ [au]
+    """
+    return _run(['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb'],
+                [LA, teffA, mA, LB, teffB, mB, ab, eb],
+                [(_terms, None), (_mu, None), (_phzP, 0)], 2, out, block, work, dtype, flags)
+
+def ahzP(LA, teffA, mA, LB, teffB, mB, ab, eb, out=None, block=BLOCK, work=None,
+         dtype=np.float64, flags=None):
+    """Fused circumbinary.AHZ, see phzP.
+
+    Returns:
+    -------
+    ahzi, ahzo ... inner and outer edge of the AHZ [au]
+    """
+    return _run(['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb'],
+                [LA, teffA, mA, LB, teffB, mB, ab, eb],
+                [(_terms, None), (_mu, None), (_ahzP, 0)], 2, out, block, work, dtype, flags)
+
+def phzS(LA, teffA, LB, teffB, ab, eb, out=None, block=BLOCK, work=None,
+         dtype=np.float64, flags=None):
+    """Fused circumstellar.PHZ, see phzP.
+
+    Returns:
+    -------
+    phzi, phzo ... inner and outer edge of the PHZ [au]
+    """
+    return _run(['LA', 'teffA', 'LB', 'teffB', 'ab', 'eb'], [LA, teffA, LB, teffB, ab, eb],
+                [(_terms, None), (_phzS, 0)], 2, out, block, work, dtype, flags)
+
+def ahzS(LA, teffA, LB, teffB, ab, eb, out=None, block=BLOCK, work=None,
+         dtype=np.float64, flags=None):
+    """Fused circumstellar.AHZ, see phzP.
+
+    Returns:
+    -------
+    ahzi, ahzo ... inner and outer edge of the AHZ [au]
+    """
+    return _run(['LA', 'teffA', 'LB', 'teffB', 'ab', 'eb'], [LA, teffA, LB, teffB, ab, eb],
+                [(_terms, None), (_ahzS, 0)], 2, out, block, work, dtype, flags)
+
+def edgesP(LA, teffA, mA, LB, teffB, mB, ab, eb, out=None, block=BLOCK, work=None,
+           dtype=np.float64, flags=None):
+    """PHZ, AHZ and the Holman & Wiegert (1999) stability limit of
+    P-type systems in one fused pass (the analytic batch kernel).
+
+    Parameters:
+    ----------
+    see phzP, out is an optional list of 5 output arrays
+
+    Returns:
+    -------
+    phzi, phzo, ahzi, ahzo, astab ... [au]
+    """
+    return _run(['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb'],
+                [LA, teffA, mA, LB, teffB, mB, ab, eb],
+                [(_terms, None), (_mu, None), (_phzP, 0), (_ahzP, 2), (_hw99P, 4)],
+                5, out, block, work, dtype, flags)
+
+def edgesS(LA, teffA, mA, LB, teffB, mB, ab, eb, out=None, block=BLOCK, work=None,
+           dtype=np.float64, flags=None):
+    """PHZ, AHZ and the Holman & Wiegert (1999) stability limit of
+    S-type systems in one fused pass, see edgesP.
+
+    Returns:
+    -------
+    phzi, phzo, ahzi, ahzo, astab ... [au]
+    """
+    return _run(['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb'],
+                [LA, teffA, mA, LB, teffB, mB, ab, eb],
+                [(_terms, None), (_mu, None), (_phzS, 0), (_ahzS, 2), (_hw99S, 4)],
+                5, out, block, work, dtype, flags)
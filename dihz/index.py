@@ -0,0 +1,254 @@
+#!/bin/python
+import numpy as np
+from . import stability
+
+################################
+# Reverse lookup of habitable zones
+###############################
+# Static centered interval tree stored in flat arrays. Every node holds
+# the intervals that contain its center, once sorted by their lower and
+# once by their upper ends, and the intervals left and right of the
+# center go to its children. A point query walks one root to leaf path
+# and reports a prefix of one sorted list per node, O(log n + k).
+
+__all__=['IntervalIndex','habitable']
+
+# maximum number of intervals in a leaf
+LEAF = 64
+
+
+def _column(res, name):
+    if(isinstance(res, dict)):
+        return res.get(name)
+    if(name in getattr(res, 'columns', [])):
+        return res[name]
+    return None
+
+def habitable(res, hztype=None, zone='phz', stable=True):
+    """Habitable (and stable) orbit distance intervals of many systems.
+
+    Parameters:
+    ----------
+    res    ... dict of result columns (batch.hzP / hzS) or a
+                store.ResultStore with phzi, phzo, ahzi, ahzo, astab
+    hztype ... 'S' or 'P', default the hztype column of res (str or
+               bytes, see stability.STYPES and PTYPES); required for
+               results without one (batch.hzP / hzS)
+    zone   ... 'phz' or 'ahz'
+    stable ... intersect with the stable region, [max(inner, astab), outer]
+               for P-type and [inner, min(outer, astab)] for S-type systems
+
+    Returns:
+    -------
+    lo, hi ... interval edges [au], nan where the interval is empty
+    """
+    if(zone not in ['phz', 'ahz']):
+        raise ValueError('Zone not recognized. Choose "phz" or "ahz".')
+    lo = np.array(_column(res, zone+'i'), dtype=float)
+    hi = np.array(_column(res, zone+'o'), dtype=float)
+
+    if(stable):
+        astab = np.asarray(_column(res, 'astab'), dtype=float)
+        if(hztype is None):
+            types = _column(res, 'hztype')
+            if(types is None):
+                raise ValueError('Results have no hztype column. \
+                              Choose hztype "S" or "P".')
+            types = np.asarray(types)
+            if(types.dtype.kind == 'S'):
+                types = np.char.decode(types)
+            types = types.astype(str)
+            ptype = np.isin(types, stability.PTYPES)
+            if(not np.all(ptype | np.isin(types, stability.STYPES))):
+                raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+        elif(hztype in ['S', 'P']):
+            ptype = hztype == 'P'
+        else:
+            raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+        with np.errstate(invalid='ignore'):
+            lo = np.where(ptype, np.fmax(lo, astab), lo)
+            hi = np.where(ptype, hi, np.fmin(hi, astab))
+
+    with np.errstate(invalid='ignore'):
+        empty = ~((lo > 0) & (hi >= lo))
+    lo[empty] = np.nan
+    hi[empty] = np.nan
+    return lo, hi
+
+
+class IntervalIndex:
+    """Index of closed intervals [lo, hi] for stabbing queries:
+    which intervals contain an orbit distance, overlap or contain
+    a range of distances.
+
+    Parameters:
+    ----------
+    lo, hi   ... interval edges, intervals with nan edges are left out
+    ids      ... ids reported for the intervals, default their row numbers
+    leafsize ... maximum number of intervals in a leaf
+    """
+
+    ARRAYS = ['lo', 'hi', 'ids', 'center', 'left', 'right', 'offset', 'count',
+              'sidx', 'slo', 'eidx', 'ehi', 'order', 'olo']
+
+    def __init__(self, lo, hi, ids=None, leafsize=LEAF):
+        self.lo = np.ascontiguousarray(lo, dtype=float).ravel()
+        self.hi = np.ascontiguousarray(hi, dtype=float).ravel()
+        if(self.lo.shape != self.hi.shape):
+            raise ValueError('Interval edges must have equal length!')
+        self.ids = np.arange(len(self.lo)) if ids is None else np.asarray(ids).ravel()
+        self._build(leafsize)
+
+    @classmethod
+    def fromresults(cls, res, hztype=None, zone='phz', stable=True, ids=None, leafsize=LEAF):
+        """Index of the habitable (and stable) orbit distances of a
+        set of results, see habitable(). The ids default to the id
+        column of res if there is one."""
+        if(ids is None):
+            ids = _column(res, 'id')
+        lo, hi = habitable(res, hztype, zone, stable)
+        return cls(lo, hi, ids, leafsize)
+
+    def _build(self, leafsize):
+        lo, hi = self.lo, self.hi
+        items = np.nonzero(np.isfinite(lo) & np.isfinite(hi) & (hi >= lo))[0]
+
+        center, left, right, offset, count = [], [], [], [], []
+        sidx, eidx = [], []
+        n = 0
+        stack = [(items, -1, 0)]
+        while(stack):
+            it, parent, side = stack.pop()
+            node = len(center)
+            if(parent >= 0):
+                (left if side < 0 else right)[parent] = node
+            left.append(-1)
+            right.append(-1)
+
+            if(len(it) <= leafsize):
+                c = np.nan
+                here = it
+            else:
+                c = np.median(np.concatenate([lo[it], hi[it]]))
+                inside = (lo[it] <= c) & (hi[it] >= c)
+                here = it[inside]
+                below = it[~inside & (hi[it] < c)]
+                above = it[~inside & (lo[it] > c)]
+                if(len(above)):
+                    stack.append((above, node, 1))
+                if(len(below)):
+                    stack.append((below, node, -1))
+
+            center.append(c)
+            offset.append(n)
+            count.append(len(here))
+            sidx.append(here[np.argsort(lo[here], kind='stable')])
+            eidx.append(here[np.argsort(-hi[here], kind='stable')])
+            n += len(here)
+
+        self.center = np.array(center, dtype=float)
+        self.left = np.array(left, dtype=np.int64)
+        self.right = np.array(right, dtype=np.int64)
+        self.offset = np.array(offset, dtype=np.int64)
+        self.count = np.array(count, dtype=np.int64)
+        self.sidx = np.concatenate(sidx).astype(np.int64)
+        self.eidx = np.concatenate(eidx).astype(np.int64)
+        self.slo = lo[self.sidx]
+        self.ehi = -hi[self.eidx]
+
+        # all intervals sorted by their lower edge, for range queries
+        self.order = items[np.argsort(lo[items], kind='stable')]
+        self.olo = lo[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _stab(self, x):
+        # row numbers of the intervals containing x
+        out = []
+        node = 0
+        if(len(self.center) == 0 or not np.isfinite(x)):
+            return np.zeros(0, dtype=np.int64)
+        while(node >= 0):
+            s = slice(self.offset[node], self.offset[node]+self.count[node])
+            c = self.center[node]
+            if(np.isnan(c)):
+                idx = self.sidx[s]
+                k = np.searchsorted(self.slo[s], x, side='right')
+                idx = idx[:k]
+                out.append(idx[self.hi[idx] >= x])
+                break
+            if(x < c):
+                k = np.searchsorted(self.slo[s], x, side='right')
+                out.append(self.sidx[s][:k])
+                node = self.left[node]
+            elif(x > c):
+                k = np.searchsorted(self.ehi[s], -x, side='right')
+                out.append(self.eidx[s][:k])
+                node = self.right[node]
+            else:
+                out.append(self.sidx[s])
+                break
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.int64)
+
+    def _ids(self, rows):
+        return self.ids[np.sort(rows)]
+
+    def stab(self, x):
+        """Ids of the intervals that contain the point x."""
+        return self._ids(self._stab(float(x)))
+
+    def overlap(self, lo, hi):
+        """Ids of the intervals that overlap the range [lo, hi]."""
+        rows = self._stab(float(lo))
+        i0 = np.searchsorted(self.olo, lo, side='right')
+        i1 = np.searchsorted(self.olo, hi, side='right')
+        return self._ids(np.concatenate([rows, self.order[i0:i1]]))
+
+    def contain(self, lo, hi):
+        """Ids of the intervals that contain the whole range [lo, hi],
+        e.g. a planetary orbit from pericenter to apocenter."""
+        rows = self._stab(float(lo))
+        return self._ids(rows[self.hi[rows] >= hi])
+
+    def query(self, lo, hi=None, mode='stab'):
+        """Batch query.
+
+        Parameters:
+        ----------
+        lo   ... array of points, or of lower range edges
+        hi   ... array of upper range edges (modes overlap and contain)
+        mode ... 'stab', 'overlap' or 'contain'
+
+        Returns:
+        -------
+        offsets, ids ... the ids for query i are ids[offsets[i]:offsets[i+1]]
+        """
+        lo = np.atleast_1d(np.asarray(lo, dtype=float)).ravel()
+        if(mode == 'stab'):
+            res = [self.stab(x) for x in lo]
+        elif(mode in ['overlap', 'contain']):
+            hi = np.broadcast_to(np.asarray(hi, dtype=float), lo.shape)
+            func = self.overlap if mode == 'overlap' else self.contain
+            res = [func(a, b) for a, b in zip(lo, hi)]
+        else:
+            raise ValueError('Mode not recognized. Choose "stab", "overlap" or "contain".')
+        offsets = np.zeros(len(res)+1, dtype=np.int64)
+        np.cumsum([len(r) for r in res], out=offsets[1:])
+        ids = np.concatenate(res) if res else self.ids[:0]
+        return offsets, ids
+
+    def save(self, path):
+        """Write the index to an .npz file, e.g. next to a result store."""
+        np.savez(path, **{k: getattr(self, k) for k in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save()."""
+        with np.load(path) as f:
+            self = cls.__new__(cls)
+            for k in cls.ARRAYS:
+                setattr(self, k, f[k])
+        return self
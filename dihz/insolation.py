@@ -0,0 +1,166 @@
+#!/bin/python
+import numpy as np
+from .seff import *
+
+################################
+# Time resolved insolation
+###############################
+# Insolation of planets on Keplerian orbits in binary star systems,
+# sampled over arrays of epochs for many systems at once.
+# Units: au, yr, Msun, Lsun.
+
+__all__=['kepler','orbit','insolation']
+
+# gravitational constant [au^3/(Msun yr^2)]
+G = 4.*np.pi**2
+
+# default number of epochs evaluated at once
+BLOCK = 256
+
+
+def kepler(M, e, tol=1e-14, maxiter=50):
+    """Solve Kepler's equation M = E - e sin(E) for many orbits and
+    epochs at once with Newton's method.
+
+    Parameters:
+    ----------
+    M       ... mean anomalies [rad]
+    e       ... orbital eccentricities, broadcast against M
+    tol     ... absolute tolerance on E [rad]
+    maxiter ... maximum number of Newton iterations
+
+    Returns:
+    -------
+    E       ... eccentric anomalies in [0, 2 pi) [rad]
+    """
+    M, e = np.broadcast_arrays(np.mod(M, 2.*np.pi), e)
+    E = np.where(e < 0.8, M+e*np.sin(M), np.pi)
+    for i in range(maxiter):
+        dE = (E-e*np.sin(E)-M)/(1.-e*np.cos(E))
+        E = E-dE
+        if(np.all(np.abs(dE) < tol)):
+            break
+    return E
+
+def orbit(a, e, M, omega=0.):
+    """Position on a Keplerian orbit relative to the focus.
+
+    Parameters:
+    ----------
+    a     ... semimajor axis [au]
+    e     ... eccentricity
+    M     ... mean anomaly [rad]
+    omega ... argument of pericenter [rad]
+
+    Returns:
+    -------
+    x, y  ... position [au]
+    """
+    E = kepler(M, e)
+    xo = a*(np.cos(E)-e)
+    yo = a*np.sqrt(1.-e*e)*np.sin(E)
+    co, so = np.cos(omega), np.sin(omega)
+    return co*xo-so*yo, so*xo+co*yo
+
+def insolation(hztype, LA, teffA, mA, LB, teffB, mB, ab, eb, ap, t,
+               ep=0., omega=0., Mb0=0., Mp0=0., block=BLOCK):
+    """Insolation statistics of coplanar planets on Keplerian orbits
+    in binary star systems over a set of epochs.
+
+    The flux from both stars is summed at every epoch. It is reported
+    in units of the present Earth insolation and normalized to the
+    Kopparapu et al. (2014) Runaway Greenhouse (inner) and Maximum
+    Greenhouse (outer) limits, sum_k L_k/(S_eff,k r_k^2). Epochs are
+    processed in blocks of `block`, and only running minima, maxima
+    and sums are kept, so memory does not grow with the number of
+    epochs.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (planet orbits the primary)
+               or 'P' (planet orbits both stars)
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    mA     ... mass of primary star [Msun]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+    ap     ... planetary orbit semimajor axes [au]
+    t      ... 1D array of epochs [yr]
+    ep     ... planetary orbit eccentricity
+    omega  ... planetary argument of pericenter relative to the binary's [rad]
+    Mb0    ... binary mean anomaly at t = 0 [rad]
+    Mp0    ... planetary mean anomaly at t = 0 [rad]
+    block  ... number of epochs evaluated at once
+
+    Returns:
+    -------
+    res    ... dict of arrays, one value per system:
+               smin, smax, smean ... insolation [S_earth]
+               fimax, fimean     ... insolation normalized to the inner limit
+               fomin, fomean     ... insolation normalized to the outer limit
+               phz ... planet is never too hot or too cold (fimax <= 1 <= fomin)
+               ahz ... planet is habitable on average (fimean <= 1 <= fomean)
+    """
+    if(hztype not in ['S', 'P']):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+
+    p = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in
+                              [LA, teffA, mA, LB, teffB, mB, ab, eb, ap, ep, omega, Mb0, Mp0]])
+    shape = p[0].shape
+    LA, teffA, mA, LB, teffB, mB, ab, eb, ap, ep, omega, Mb0, Mp0 = [x.reshape(-1, 1) for x in p]
+    t = np.asarray(t, dtype=float).ravel()
+
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
+
+    mu = mB/(mA+mB)
+    nb = np.sqrt(G*(mA+mB)/ab**3)
+    if(hztype == 'S'):
+        n_p = np.sqrt(G*mA/ap**3)
+    else:
+        n_p = np.sqrt(G*(mA+mB)/ap**3)
+
+    N = LA.shape[0]
+    stats = {'smin': np.full(N, np.inf), 'smax': np.full(N, -np.inf), 'ssum': np.zeros(N),
+             'fimax': np.full(N, -np.inf), 'fisum': np.zeros(N),
+             'fomin': np.full(N, np.inf), 'fosum': np.zeros(N)}
+
+    for start in range(0, len(t), block):
+        tb = t[start:start+block]
+
+        # binary separation vector and stellar positions w.r.t. the barycenter
+        bx, by = orbit(ab, eb, nb*tb+Mb0)
+        xA, yA = -mu*bx, -mu*by
+        xB, yB = (1.-mu)*bx, (1.-mu)*by
+
+        px, py = orbit(ap, ep, n_p*tb+Mp0, omega)
+        if(hztype == 'S'):
+            px, py = px+xA, py+yA
+
+        rA2 = (px-xA)**2+(py-yA)**2
+        rB2 = (px-xB)**2+(py-yB)**2
+
+        s = LA/rA2+LB/rB2
+        fi = LA/siA/rA2+LB/siB/rB2
+        fo = LA/soA/rA2+LB/soB/rB2
+
+        np.minimum(stats['smin'], s.min(axis=1), out=stats['smin'])
+        np.maximum(stats['smax'], s.max(axis=1), out=stats['smax'])
+        stats['ssum'] += s.sum(axis=1)
+        np.maximum(stats['fimax'], fi.max(axis=1), out=stats['fimax'])
+        stats['fisum'] += fi.sum(axis=1)
+        np.minimum(stats['fomin'], fo.min(axis=1), out=stats['fomin'])
+        stats['fosum'] += fo.sum(axis=1)
+
+    nt = max(len(t), 1)
+    res = {'smin': stats['smin'], 'smax': stats['smax'], 'smean': stats['ssum']/nt,
+           'fimax': stats['fimax'], 'fimean': stats['fisum']/nt,
+           'fomin': stats['fomin'], 'fomean': stats['fosum']/nt}
+    res['phz'] = (res['fimax'] <= 1.) & (res['fomin'] >= 1.)
+    res['ahz'] = (res['fimean'] <= 1.) & (res['fomean'] >= 1.)
+
+    return {k: v.reshape(shape) for k, v in res.items()}
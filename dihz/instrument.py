@@ -0,0 +1,164 @@
+#!/bin/python
+import contextlib
+import functools
+import json
+import threading
+import time
+
+import numpy as np
+
+################################
+# Opt-in instrumentation
+###############################
+# Stages are functions wrapped with @stage(name). While instrumentation
+# is disabled (the default) the wrapper only checks the global flag, so
+# the overhead is one extra Python call. While it is enabled, every call
+# records its wall time and the size of its largest array argument, and
+# stages can add their own counters (e.g. solver iterations) with count().
+# Times are inclusive: a stage that calls other stages includes their time.
+
+__all__=['stage','count','record','enable','disable','instrumented','register','unregister',
+         'reset','summary','export']
+
+ENABLED = False
+
+_stats = {}
+_callbacks = []
+_lock = threading.Lock()
+
+
+def _size(args):
+    size = 1
+    for a in args:
+        if(isinstance(a, np.ndarray)):
+            size = max(size, a.size)
+    return size
+
+def _entry(name):
+    s = _stats.get(name)
+    if(s is None):
+        s = _stats[name] = {'calls': 0, 'time': 0., 'maxtime': 0., 'size': 0, 'maxsize': 0,
+                            'counters': {}}
+    return s
+
+def record(name, elapsed=0., size=0, calls=1, **counters):
+    """Add one event to the statistics of a stage and pass it on to
+    the registered callbacks.
+
+    Parameters:
+    ----------
+    name     ... stage name, e.g. 'circumbinary.PHZ'
+    elapsed  ... wall time [s]
+    size     ... number of elements processed
+    calls    ... number of calls the event stands for
+    counters ... additional integer counters
+    """
+    with _lock:
+        s = _entry(name)
+        s['calls'] += calls
+        s['time'] += elapsed
+        s['maxtime'] = max(s['maxtime'], elapsed)
+        s['size'] += size
+        s['maxsize'] = max(s['maxsize'], size)
+        for k, v in counters.items():
+            s['counters'][k] = s['counters'].get(k, 0)+int(v)
+        callbacks = list(_callbacks)
+    for callback in callbacks:
+        callback(name, {'time': elapsed, 'size': size, 'calls': calls, **counters})
+
+def count(name, **counters):
+    """Add counters to a stage without counting a call, a no-op while
+    instrumentation is disabled."""
+    if(ENABLED):
+        record(name, calls=0, **counters)
+
+def stage(name):
+    """Decorator that records calls of a function as stage `name`
+    while instrumentation is enabled."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if(not ENABLED):
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter()-t0, _size(args))
+        return wrapper
+    return decorate
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def register(callback):
+    """Call callback(name, event) for every recorded event, where event
+    is a dict with time, size, calls and any stage counters."""
+    with _lock:
+        _callbacks.append(callback)
+
+def unregister(callback):
+    with _lock:
+        if(callback in _callbacks):
+            _callbacks.remove(callback)
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+@contextlib.contextmanager
+def instrumented(callback=None, clear=True):
+    """Enable instrumentation within a with block.
+
+    Parameters:
+    ----------
+    callback ... optional callback, see register
+    clear    ... reset the statistics on entry
+
+    Yields:
+    ------
+    summary  ... the summary function, to read the statistics inside or after the block
+    """
+    global ENABLED
+    previous = ENABLED
+    if(clear):
+        reset()
+    if(callback is not None):
+        register(callback)
+    ENABLED = True
+    try:
+        yield summary
+    finally:
+        ENABLED = previous
+        if(callback is not None):
+            unregister(callback)
+
+def summary():
+    """Statistics per stage.
+
+    Returns:
+    -------
+    res ... dict of stage name -> dict with calls, time [s], mean [s],
+            maxtime [s], size (total elements), maxsize and counters
+    """
+    with _lock:
+        res = {}
+        for name, s in sorted(_stats.items()):
+            r = dict(s, counters=dict(s['counters']))
+            r['mean'] = s['time']/s['calls'] if s['calls'] else 0.
+            res[name] = r
+    return res
+
+def export(path=None):
+    """Summary as a JSON string, also written to path if given."""
+    text = json.dumps(summary(), indent=1)
+    if(path is not None):
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
@@ -0,0 +1,196 @@
+#!/bin/python
+import math
+
+import numpy as np
+from .insolation import kepler
+
+################################
+# Restricted three-body integrator
+###############################
+# Test planets in the planar elliptic restricted three-body problem.
+# The binary moves on a fixed Keplerian orbit, all planets are advanced
+# together as arrays. A time step is the fourth order composition
+# (Yoshida 1990) of three drift-kick-drift leapfrog steps: the second
+# order leapfrog alone adds an apsidal precession comparable to the
+# slow secular precession driven by the binary and damps the forced
+# eccentricity unless the orbits are resolved by hundreds of steps.
+# Units: au, yr, Msun.
+
+__all__=['integrate']
+
+# gravitational constant [au^3/(Msun yr^2)]
+G = 4.*np.pi**2
+
+# substep weights of the fourth order composition
+W1 = 1./(2.-2.**(1./3.))
+WEIGHTS = (W1, 1.-2.*W1, W1)
+
+
+def binary(mA, mB, ab, eb, t):
+    """Positions and velocities of both stars relative to the
+    barycenter. The binary starts at pericenter at t = 0.
+
+    Parameters:
+    ----------
+    mA ... mass of primary star [Msun]
+    mB ... mass of secondary star [Msun]
+    ab ... binary orbit semimajor axis [au]
+    eb ... binary orbit eccentricity
+    t  ... time [yr]
+
+    Returns:
+    -------
+    xA, vA, xB, vB ... position [au] and velocity [au/yr] vectors
+    """
+    mu = mB/(mA+mB)
+    n = np.sqrt(G*(mA+mB)/ab**3)
+    E = kepler(n*t, eb)
+    cosE, sinE = np.cos(E), np.sin(E)
+    sq = np.sqrt(1.-eb*eb)
+
+    r = ab*np.array([cosE-eb, sq*sinE])
+    v = n*ab/(1.-eb*cosE)*np.array([-sinE, sq*cosE])
+    return -mu*r, -mu*v, (1.-mu)*r, (1.-mu)*v
+
+def _binary(mA, mB, ab, eb, t):
+    # scalar version of binary for the integrator's inner loop
+    mu = mB/(mA+mB)
+    n = math.sqrt(G*(mA+mB)/ab**3)
+    M = math.fmod(n*t, 2.*math.pi)
+    E = M if eb < 0.8 else math.pi
+    for i in range(50):
+        dE = (E-eb*math.sin(E)-M)/(1.-eb*math.cos(E))
+        E -= dE
+        if(abs(dE) < 1e-14):
+            break
+    cosE, sinE = math.cos(E), math.sin(E)
+    sq = math.sqrt(1.-eb*eb)
+
+    rx, ry = ab*(cosE-eb), ab*sq*sinE
+    f = n*ab/(1.-eb*cosE)
+    vx, vy = -f*sinE, f*sq*cosE
+    return (np.array([-mu*rx, -mu*ry]), np.array([-mu*vx, -mu*vy]),
+            np.array([(1.-mu)*rx, (1.-mu)*ry]), np.array([(1.-mu)*vx, (1.-mu)*vy]))
+
+def _eccentricity(x, v, gm):
+    r = np.sqrt(x[:, 0]**2+x[:, 1]**2)
+    v2 = v[:, 0]**2+v[:, 1]**2
+    rv = x[:, 0]*v[:, 0]+x[:, 1]*v[:, 1]
+    ex = ((v2-gm/r)*x[:, 0]-rv*v[:, 0])/gm
+    ey = ((v2-gm/r)*x[:, 1]-rv*v[:, 1])/gm
+    return np.sqrt(ex*ex+ey*ey)
+
+def _step(x, v, t, h, mA, mB, ab, eb):
+    # drift-kick-drift leapfrog step of length h, x and v are updated in
+    # place; returns the smallest distance to either star
+    x += 0.5*h*v
+    xA, vA, xB, vB = _binary(mA, mB, ab, eb, t+0.5*h)
+
+    dA = x-xA
+    dB = x-xB
+    rA = np.sqrt(dA[:, 0]**2+dA[:, 1]**2)
+    rB = np.sqrt(dB[:, 0]**2+dB[:, 1]**2)
+    a = -G*mA*dA/rA[:, None]**3-G*mB*dB/rB[:, None]**3
+
+    v += h*a
+    x += 0.5*h*v
+    return np.minimum(rA, rB)
+
+def integrate(hztype, mA, mB, ab, eb, ap, phase=0., norbits=100., steps=100,
+              rmin=1e-2, rmax=None):
+    """Integrate test planets on initially circular orbits in a binary
+    star system and measure their eccentricities.
+
+    Memory use is a fixed number of arrays of the size of ap, independent
+    of the integration time. The time step resolves the shortest of the
+    binary and planetary orbital periods by `steps` steps.
+
+    Parameters:
+    ----------
+    hztype  ... binary star type, 'S' (planets orbit the primary)
+                or 'P' (planets orbit both stars)
+    mA      ... mass of primary star [Msun]
+    mB      ... mass of secondary star [Msun]
+    ab      ... binary orbit semimajor axis [au]
+    eb      ... binary orbit eccentricity
+    ap      ... array of initial planetary orbit distances [au]
+    phase   ... initial orbital phase of the planets [rad]
+    norbits ... integration time in binary orbital periods
+    steps   ... time steps per shortest orbital period
+    rmin    ... close encounter distance to either star [au]
+    rmax    ... escape distance from the host [au], default
+                ab for S-type and 10 ab for P-type systems
+
+    Returns:
+    -------
+    res     ... dict with arrays of the size of ap:
+                emax    ... maximum osculating eccentricity
+                e2mean  ... time average of the squared eccentricity
+                ejected ... planet was ejected or collided with a star
+                x, v    ... final barycentric positions [au] and
+                            velocities [au/yr], shape (len(ap), 2)
+                and the integration time t [yr] and time step dt [yr]
+    """
+    if(hztype not in ['S', 'P']):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+
+    ap = np.atleast_1d(np.asarray(ap, dtype=float))
+    phase = np.broadcast_to(np.asarray(phase, dtype=float), ap.shape)
+    N = len(ap)
+
+    M = mA+mB
+    gm = G*mA if hztype == 'S' else G*M
+    if(rmax is None):
+        rmax = ab if hztype == 'S' else 10.*ab
+
+    Pb = 2.*np.pi*np.sqrt(ab**3/(G*M))
+    Pp = 2.*np.pi*np.sqrt(np.min(ap)**3/gm)
+    dt = min(Pb, Pp)/steps
+    nsteps = int(np.ceil(norbits*Pb/dt))
+
+    # initial conditions relative to the host
+    xA, vA, xB, vB = _binary(mA, mB, ab, eb, 0.)
+    vc = np.sqrt(gm/ap)
+    x = np.stack([ap*np.cos(phase), ap*np.sin(phase)], axis=1)
+    v = np.stack([-vc*np.sin(phase), vc*np.cos(phase)], axis=1)
+    if(hztype == 'S'):
+        x += xA
+        v += vA
+
+    emax = np.zeros(N)
+    e2sum = np.zeros(N)
+    nsum = np.zeros(N)
+    ejected = np.zeros(N, dtype=bool)
+
+    t = 0.
+    with np.errstate(all='ignore'):
+        for i in range(nsteps):
+            r = np.inf
+            for w in WEIGHTS:
+                r = np.minimum(r, _step(x, v, t, w*dt, mA, mB, ab, eb))
+                t += w*dt
+
+            # osculating elements with respect to the host
+            if(hztype == 'S'):
+                xA, vA, xB, vB = _binary(mA, mB, ab, eb, t)
+                xh, vh = x-xA, v-vA
+            else:
+                xh, vh = x, v
+            e = _eccentricity(xh, vh, gm)
+            rh = np.sqrt(xh[:, 0]**2+xh[:, 1]**2)
+
+            ejected |= ~np.isfinite(e) | (e >= 1.) | (rh > rmax) | \
+                (r < rmin)
+            alive = ~ejected
+            np.maximum(emax, np.where(alive, e, 0.), out=emax)
+            e2sum += np.where(alive, e*e, 0.)
+            nsum += alive
+
+            # park ejected planets far away so they do not overflow
+            if(not np.all(alive)):
+                x[ejected] = 1e3*rmax
+                v[ejected] = 0.
+
+    return {'emax': emax, 'e2mean': e2sum/np.maximum(nsum, 1),
+            'ejected': ejected, 'x': x, 'v': v, 't': t, 'dt': dt}
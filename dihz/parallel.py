@@ -0,0 +1,121 @@
+#!/bin/python
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from . import batch
+
+################################
+# Multi-core catalog evaluation
+###############################
+
+__all__=['run']
+
+# default number of catalog rows per task
+CHUNKSIZE = 4*batch.BLOCK
+
+HZTYPES = {'S': (batch.hzS, batch.COLUMNSS), 'P': (batch.hzP, batch.COLUMNSP)}
+
+
+def _create(shape, dtype):
+    nbytes = max(int(np.prod(shape))*np.dtype(dtype).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _compute(spec, start, stop, inp, res, flags):
+    hz = HZTYPES[spec['hztype']][0]
+    cat = {k: inp[i, start:stop] for i, k in enumerate(spec['names'])}
+    out = hz(cat, spec['block'], spec['method'])
+    for i, k in enumerate(batch.RESULTS):
+        res[i, start:stop] = out[k]
+    for i, k in enumerate(batch.FLAGS):
+        flags[i, start:stop] = out[k]
+
+def _work(spec, start, stop):
+    n = spec['n']
+    shmi, inp = _attach(spec['inp'], (len(spec['names']), n), float)
+    shmr, res = _attach(spec['res'], (len(batch.RESULTS), n), float)
+    shmf, flags = _attach(spec['flags'], (len(batch.FLAGS), n), bool)
+    try:
+        _compute(spec, start, stop, inp, res, flags)
+    finally:
+        # views must be released before the blocks can be closed
+        del inp, res, flags
+        for shm in [shmi, shmr, shmf]:
+            shm.close()
+    return stop-start
+
+
+def run(catalog, hztype='P', method='analytic', chunksize=CHUNKSIZE,
+        workers=None, block=batch.BLOCK):
+    """Calculate PHZ, AHZ and stability limits for a catalog on
+    several cores.
+
+    The catalog columns are copied once into shared memory. Each
+    worker process evaluates a contiguous range of rows of at most
+    `chunksize` rows and writes its results directly into shared
+    output arrays, so neither inputs nor results are pickled and the
+    output is in input order.
+
+    Parameters:
+    ----------
+    catalog   ... numpy structured array or dict of columns with
+                  LA, teffA, mA, LB, teffB, mB, ab, eb
+    hztype    ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    method    ... 'analytic' or 'semianalytic' habitable zones
+    chunksize ... number of rows per task
+    workers   ... number of worker processes, default os.cpu_count()
+    block     ... number of rows evaluated at once within a task
+
+    Returns:
+    -------
+    res       ... dict of arrays of catalog length, see batch.hzS and batch.hzP
+    """
+    if(hztype not in HZTYPES):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+    batch._kernel(hztype, method)
+
+    names = HZTYPES[hztype][1]
+    c = batch.columns(catalog, names)
+    n = len(c[names[0]])
+
+    shms = []
+    try:
+        shmi, inp = _create((len(names), n), float)
+        shms.append(shmi)
+        shmr, res = _create((len(batch.RESULTS), n), float)
+        shms.append(shmr)
+        shmf, flags = _create((len(batch.FLAGS), n), bool)
+        shms.append(shmf)
+
+        for i, k in enumerate(names):
+            inp[i] = c[k]
+        del c
+
+        spec = {'inp': shmi.name, 'res': shmr.name, 'flags': shmf.name,
+                'n': n, 'names': names, 'hztype': hztype, 'method': method,
+                'block': block}
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [pool.submit(_work, spec, start, min(start+chunksize, n))
+                     for start in range(0, n, chunksize)]
+            for task in tasks:
+                task.result()
+
+        out = {k: res[i].copy() for i, k in enumerate(batch.RESULTS)}
+        out.update({k: flags[i].copy() for i, k in enumerate(batch.FLAGS)})
+    finally:
+        # views must be released before the blocks can be closed
+        inp = res = flags = None
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    return out
@@ -0,0 +1,352 @@
+#!/bin/python
+import argparse
+import csv
+import os
+
+import numpy as np
+from . import batch
+
+################################
+# Streaming catalog pipeline
+###############################
+
+__all__=['read','evaluate','write','run','main']
+
+# default number of catalog rows per chunk
+CHUNKSIZE = 100000
+
+FORMATS = {'.csv': 'csv', '.txt': 'csv',
+           '.parquet': 'parquet', '.pq': 'parquet',
+           '.feather': 'feather', '.arrow': 'feather', '.ipc': 'feather'}
+
+HZTYPES = {'S': batch.hzS, 'P': batch.hzP}
+
+
+def _format(path, fmt=None):
+    if(fmt is None):
+        fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if(fmt not in FORMATS.values()):
+        raise ValueError('File format of '+str(path)+' not recognized. \
+                              Choose "csv", "parquet" or "feather".')
+    return fmt
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Reading and writing Parquet/Feather files requires pyarrow.')
+    return pyarrow
+
+def _floats(col):
+    # empty fields are missing values
+    return np.asarray([v if v.strip() else 'nan' for v in col], dtype=float)
+
+def _parse(name, col, lines, dtype):
+    # column of a CSV chunk as float, or as str if dtype is str or
+    # (first chunk, dtype None) not all fields are numbers
+    if(dtype is not str):
+        try:
+            return _floats(col)
+        except ValueError:
+            if(dtype is float):
+                for v, line in zip(col, lines):
+                    try:
+                        _floats([v])
+                    except ValueError:
+                        raise ValueError('Line '+str(line)+': column '+name+
+                                         ' is not a number: '+repr(v))
+    return np.asarray(col, dtype=str)
+
+#######################################
+# Readers
+######################################
+
+def readcsv(path, chunksize=CHUNKSIZE, delimiter=',', numeric=batch.COLUMNSP):
+    """Stream a CSV catalog with a header line in chunks.
+
+    Every row must have as many fields as the header. The numeric
+    columns are parsed as floats, any other column is float if all
+    fields of the first chunk are numbers and str otherwise, and keeps
+    that type in all later chunks.
+
+    Parameters:
+    ----------
+    path      ... path to CSV file
+    chunksize ... number of rows per chunk
+    delimiter ... column delimiter
+    numeric   ... names of columns that must hold numbers
+
+    Returns:
+    -------
+    generator of dicts of column arrays, numeric columns as float64
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        names = [n.strip() for n in next(reader)]
+        dtypes = {n: float if n in numeric else None for n in names}
+
+        def chunk(rows, lines):
+            cols = {n: _parse(n, c, lines, dtypes[n]) for n, c in zip(names, zip(*rows))}
+            for n, c in cols.items():
+                dtypes[n] = float if c.dtype == float else str
+            return cols
+
+        rows, lines = [], []
+        for row in reader:
+            if(not row):
+                continue
+            if(len(row) != len(names)):
+                raise ValueError('Line '+str(reader.line_num)+': expected '+str(len(names))+
+                                 ' fields, found '+str(len(row)))
+            rows.append(row)
+            lines.append(reader.line_num)
+            if(len(rows) == chunksize):
+                yield chunk(rows, lines)
+                rows, lines = [], []
+        if(rows):
+            yield chunk(rows, lines)
+
+def readparquet(path, chunksize=CHUNKSIZE):
+    """Stream a Parquet catalog in chunks (requires pyarrow).
+
+    Parameters:
+    ----------
+    path      ... path to Parquet file
+    chunksize ... number of rows per chunk
+
+    Returns:
+    -------
+    generator of dicts of column arrays
+    """
+    _pyarrow()
+    import pyarrow.parquet as pq
+
+    for rb in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield {n: rb.column(n).to_numpy(zero_copy_only=False)
+               for n in rb.schema.names}
+
+def readfeather(path, chunksize=CHUNKSIZE):
+    """Stream a Feather (Arrow IPC) catalog in chunks (requires pyarrow).
+    The file is memory mapped, so only the current chunk is resident.
+
+    Parameters:
+    ----------
+    path      ... path to Feather file
+    chunksize ... number of rows per chunk
+
+    Returns:
+    -------
+    generator of dicts of column arrays
+    """
+    pa = _pyarrow()
+    import pyarrow.ipc
+
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            rb = reader.get_batch(i)
+            for start in range(0, rb.num_rows, chunksize):
+                part = rb.slice(start, chunksize)
+                yield {n: part.column(n).to_numpy(zero_copy_only=False)
+                       for n in part.schema.names}
+
+def read(path, chunksize=CHUNKSIZE, fmt=None):
+    """Stream a catalog file in chunks. The format is taken from
+    the file extension unless given.
+
+    Parameters:
+    ----------
+    path      ... path to catalog file
+    chunksize ... number of rows per chunk
+    fmt       ... 'csv', 'parquet' or 'feather'
+
+    Returns:
+    -------
+    generator of dicts of column arrays
+    """
+    fmt = _format(path, fmt)
+    if(fmt == 'csv'):
+        return readcsv(path, chunksize)
+    elif(fmt == 'parquet'):
+        return readparquet(path, chunksize)
+    return readfeather(path, chunksize)
+
+#######################################
+# Evaluation
+######################################
+
+def evaluate(chunks, hztype='P', keep=()):
+    """Calculate PHZ, AHZ and stability limits for a stream of
+    catalog chunks.
+
+    Parameters:
+    ----------
+    chunks ... iterable of dicts of columns with
+               LA, teffA, mA, LB, teffB, mB, ab, eb
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    keep   ... names of input columns copied to the output (e.g. system ids)
+
+    Returns:
+    -------
+    generator of dicts of result columns, see batch.hzS and batch.hzP
+    """
+    if(hztype not in HZTYPES):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+    hz = HZTYPES[hztype]
+
+    for chunk in chunks:
+        res = {k: chunk[k] for k in keep}
+        res.update(hz(chunk))
+        yield res
+
+#######################################
+# Writers
+######################################
+
+def writecsv(results, path, delimiter=','):
+    """Write a stream of result chunks to a CSV file.
+
+    Parameters:
+    ----------
+    results   ... iterable of dicts of columns
+    path      ... path to CSV file
+    delimiter ... column delimiter
+
+    Returns:
+    -------
+    n         ... number of rows written
+    """
+    n = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        names = None
+        for res in results:
+            if(names is None):
+                names = list(res)
+                writer.writerow(names)
+            cols = []
+            for k in names:
+                c = np.asarray(res[k])
+                cols.append((c.astype(int) if c.dtype == bool else c).tolist())
+            writer.writerows(zip(*cols))
+            n += len(cols[0])
+    return n
+
+def _arrowwriter(results, path, new):
+    pa = _pyarrow()
+    n = 0
+    writer = None
+    try:
+        for res in results:
+            table = pa.table({k: np.asarray(v) for k, v in res.items()})
+            if(writer is None):
+                writer = new(path, table.schema)
+            writer.write_table(table)
+            n += table.num_rows
+    finally:
+        if(writer is not None):
+            writer.close()
+    return n
+
+def writeparquet(results, path):
+    """Write a stream of result chunks to a Parquet file
+    (requires pyarrow).
+
+    Parameters:
+    ----------
+    results ... iterable of dicts of columns
+    path    ... path to Parquet file
+
+    Returns:
+    -------
+    n       ... number of rows written
+    """
+    _pyarrow()
+    import pyarrow.parquet as pq
+    return _arrowwriter(results, path, pq.ParquetWriter)
+
+def writefeather(results, path):
+    """Write a stream of result chunks to a Feather (Arrow IPC)
+    file (requires pyarrow).
+
+    Parameters:
+    ----------
+    results ... iterable of dicts of columns
+    path    ... path to Feather file
+
+    Returns:
+    -------
+    n       ... number of rows written
+    """
+    pa = _pyarrow()
+    import pyarrow.ipc
+    return _arrowwriter(results, path, pa.ipc.new_file)
+
+def write(results, path, fmt=None):
+    """Write a stream of result chunks. The format is taken from
+    the file extension unless given.
+
+    Parameters:
+    ----------
+    results ... iterable of dicts of columns
+    path    ... path to output file
+    fmt     ... 'csv', 'parquet' or 'feather'
+
+    Returns:
+    -------
+    n       ... number of rows written
+    """
+    fmt = _format(path, fmt)
+    if(fmt == 'csv'):
+        return writecsv(results, path)
+    elif(fmt == 'parquet'):
+        return writeparquet(results, path)
+    return writefeather(results, path)
+
+#######################################
+# Pipeline
+######################################
+
+def run(inpath, outpath, hztype='P', chunksize=CHUNKSIZE, keep=(),
+        infmt=None, outfmt=None):
+    """Calculate PHZ, AHZ and stability limits for a catalog file
+    chunk by chunk and write the results incrementally. Memory use
+    is bounded by the chunk size, not the catalog size.
+
+    Parameters:
+    ----------
+    inpath    ... input catalog (CSV, Parquet or Feather)
+    outpath   ... output file (CSV, Parquet or Feather)
+    hztype    ... binary star type, 'S' or 'P'
+    chunksize ... number of rows per chunk
+    keep      ... names of input columns copied to the output
+    infmt     ... input format, default from file extension
+    outfmt    ... output format, default from file extension
+
+    Returns:
+    -------
+    n         ... number of rows processed
+    """
+    chunks = read(inpath, chunksize, infmt)
+    return write(evaluate(chunks, hztype, keep), outpath, outfmt)
+
+def main(argv=None):
+    """Command line entry point, see `python -m dihz --help`."""
+    parser = argparse.ArgumentParser(prog='dihz',
+        description='Dynamically informed habitable zones for a catalog '
+                    'of binary star systems. Input columns: '
+                    +', '.join(batch.COLUMNSP)+'.')
+    parser.add_argument('input', help='input catalog (.csv, .parquet, .feather)')
+    parser.add_argument('output', help='output file (.csv, .parquet, .feather)')
+    parser.add_argument('-t', '--type', default='P', choices=sorted(HZTYPES),
+                        help='binary star type: S (circumstellar) or P (circumbinary)')
+    parser.add_argument('-c', '--chunksize', type=int, default=CHUNKSIZE,
+                        help='number of rows per chunk')
+    parser.add_argument('-k', '--keep', nargs='*', default=[],
+                        help='input columns copied to the output, e.g. system ids')
+    args = parser.parse_args(argv)
+
+    n = run(args.input, args.output, args.type, args.chunksize, args.keep)
+    print('dihz: '+str(n)+' systems written to '+args.output)
+    return 0
@@ -1,10 +1,17 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Circle, Wedge
 from . import circumbinary
+from . import instrument
 from . import circumstellar
 from . import stability
 
-__all__=['circumbinaryhz2D','circumstellarhz2D']
+__all__=['circumbinaryhz2D','circumstellarhz2D','hzfigure','savehz','gallery']
 
 ### Plot Dynamically Informed Habitable Zones
 
@@ -12,6 +19,7 @@ sqrt=np.sqrt
 linspace=np.linspace
 meshgrid=np.meshgrid
 
+@instrument.stage('plot.circumbinaryhz2D')
 def circumbinaryhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=4,title=''):
     """Plot the circumbinary dynamically informed habitable zones. 
     
@@ -31,6 +39,7 @@ def circumbinaryhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=4
     matplotlib pyplot plot 
 
     """
+    import matplotlib.pyplot as plt
     xs = linspace(xmin,xmax, 201)
     ys = linspace(ymin,ymax, 201)
 
@@ -78,6 +87,7 @@ def circumbinaryhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=4
     plt.show()
 
     
+@instrument.stage('plot.circumstellarhz2D')
 def circumstellarhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=4):
     """Plot the circumstellar dynamically informed habitable zones. 
     
@@ -97,6 +107,7 @@ def circumstellarhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=
     matplotlib pyplot plot 
 
     """
+    import matplotlib.pyplot as plt
     
     xs = linspace(xmin,xmax, 201)
     ys = linspace(ymin,ymax, 201)
@@ -142,3 +153,175 @@ def circumstellarhz2D(LA,LB,teffA,teffB,mA,mB,ab,eb,xmin=-4,xmax=4,ymin=-4,ymax=
     plt.ylabel('y [au]')
     plt.show()
     
+
+
+
+### Headless rendering with analytic patches
+
+# colors and labels of the stability region per binary star type
+STABCOLORS = {'P': ('#bf00ff', '#ac10e0', 'Unstable Orbits', 'AB'),
+              'S': ('g', 'g', 'Stable Orbits', 'A')}
+
+def hzedges(hztype, LA, LB, teffA, teffB, mA, mB, ab, eb):
+    """PHZ, AHZ and stability limit as drawn by hzfigure.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    (see circumbinaryhz2D for the remaining parameters)
+
+    Returns:
+    -------
+    [phzi, phzo, ahzi, ahzo, astab] [au]
+    """
+    if(hztype == 'P'):
+        [phzi, phzo] = circumbinary.PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+        [ahzi, ahzo] = circumbinary.AHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+        astab = stability.hw99P(mA, mB, ab, eb)
+    elif(hztype == 'S'):
+        [phzi, phzo] = circumstellar.PHZ(LA, teffA, LB, teffB, ab, eb)
+        [ahzi, ahzo] = circumstellar.AHZ(LA, teffA, LB, teffB, ab, eb)
+        astab = stability.hw99S(mA, mB, ab, eb)
+    else:
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+    return [float(phzi), float(phzo), float(ahzi), float(ahzo), float(astab)]
+
+def _annulus(ax, ri, ro, color):
+    if(np.isfinite(ri) and np.isfinite(ro) and 0 <= ri < ro):
+        ax.add_patch(Wedge((0, 0), ro, 0, 360, width=ro-ri, color=color, lw=0))
+        for r in [ri, ro]:
+            ax.add_patch(Circle((0, 0), r, fill=False, ec='k', lw=0.6))
+
+@instrument.stage('plot.hzfigure')
+def hzfigure(hztype, LA, LB, teffA, teffB, mA, mB, ab, eb,
+             xmin=None, xmax=None, ymin=None, ymax=None, title='', ax=None, dpi=150):
+    """Draw the dynamically informed habitable zones as analytic
+    annulus patches, without evaluating a grid and without pyplot,
+    so that it can be used headless and in worker processes.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    LA     ... luminosity of primary star [Lsun]
+    LB     ... luminosity of secondary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    teffB  ... effective temperature of secondary star [K]
+    mA     ... mass of primary star [Msun]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+    xmin.. ... plot limits [au], default 1.25 times the outermost edge
+    title  ... plot title
+    ax     ... matplotlib axes to draw into, default a new Figure
+    dpi    ... resolution of a new Figure
+
+    Returns:
+    -------
+    matplotlib Figure
+    """
+    [phzi, phzo, ahzi, ahzo, astab] = hzedges(hztype, LA, LB, teffA, teffB, mA, mB, ab, eb)
+
+    if(ax is None):
+        fig = Figure(figsize=(4, 4), dpi=dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+    fig = ax.figure
+
+    edges = [r for r in [phzo, ahzo, astab] if np.isfinite(r) and r > 0]
+    rmax = 1.25*max(edges) if edges else 1.
+    xmin = -rmax if xmin is None else xmin
+    xmax = rmax if xmax is None else xmax
+    ymin = -rmax if ymin is None else ymin
+    ymax = rmax if ymax is None else ymax
+
+    fill, line, label, host = STABCOLORS[hztype]
+    if(np.isfinite(astab) and astab > 0):
+        ax.add_patch(Circle((0, 0), astab, color=fill, alpha=0.4, lw=0))
+        ax.add_patch(Circle((0, 0), astab, fill=False, ec=line, ls='dashed'))
+
+    _annulus(ax, ahzi, ahzo, '#EEA700')
+    _annulus(ax, phzi, phzo, 'blue')
+
+    ax.set_title(title)
+    ax.text(0, 0, host, horizontalalignment='center', verticalalignment='center')
+
+    ax.text(0.06, 0.96, 'Averaged Habitable Zone', transform=ax.transAxes,
+            horizontalalignment='left', verticalalignment='center', color='#EEA700')
+    ax.text(0.06, 0.89, 'Permanently Habitable Zone', transform=ax.transAxes,
+            horizontalalignment='left', verticalalignment='center', color='b')
+    ax.text(0.06, 0.06, label, transform=ax.transAxes,
+            horizontalalignment='left', verticalalignment='center', color=fill)
+
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    ax.set_aspect('equal')
+    ax.set_xlabel('x [au]')
+    ax.set_ylabel('y [au]')
+
+    return fig
+
+def savehz(path, hztype, LA, LB, teffA, teffB, mA, mB, ab, eb, **kwargs):
+    """Render the dynamically informed habitable zones to a file.
+
+    Parameters:
+    ----------
+    path   ... output file, the format follows the extension
+    kwargs ... passed on to hzfigure
+    (see hzfigure for the remaining parameters)
+
+    Returns:
+    -------
+    path
+    """
+    fig = hzfigure(hztype, LA, LB, teffA, teffB, mA, mB, ab, eb, **kwargs)
+    fig.savefig(path)
+    return path
+
+def _agg():
+    matplotlib.use('Agg', force=True)
+
+def _render(job):
+    path, hztype, args, kwargs = job
+    return savehz(path, hztype, *args, **kwargs)
+
+# column order of the plotting functions
+COLUMNS = ['LA', 'LB', 'teffA', 'teffB', 'mA', 'mB', 'ab', 'eb']
+
+@instrument.stage('plot.gallery')
+def gallery(catalog, outdir, hztype='P', names=None, fmt='png', workers=None, **kwargs):
+    """Render habitable zone figures for a whole catalog in parallel
+    on the Agg backend.
+
+    Parameters:
+    ----------
+    catalog ... numpy structured array or dict of columns with
+                LA, teffA, mA, LB, teffB, mB, ab, eb
+    outdir  ... output directory, created if missing
+    hztype  ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    names   ... file names (without extension) per system,
+                default the catalog column 'id' or the row number
+    fmt     ... image format / file extension
+    workers ... number of worker processes, default os.cpu_count()
+    kwargs  ... passed on to hzfigure, e.g. title or dpi
+
+    Returns:
+    -------
+    paths   ... list of written files in catalog order
+    """
+    cols = [np.asarray(catalog[k], dtype=float) for k in COLUMNS]
+    n = len(cols[0])
+    if(names is None):
+        try:
+            names = [str(x) for x in np.asarray(catalog['id'])]
+        except (KeyError, ValueError, IndexError):
+            names = [str(i) for i in range(n)]
+
+    os.makedirs(outdir, exist_ok=True)
+    jobs = [(os.path.join(outdir, names[i]+'.'+fmt), hztype,
+             tuple(float(c[i]) for c in cols), kwargs) for i in range(n)]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_agg) as pool:
+        paths = list(pool.map(_render, jobs, chunksize=max(1, n//(4*workers))))
+    return paths
@@ -1,4 +1,6 @@
 #!/bin/python
+import numpy as np
+from . import instrument
 
 ### Calculate effective insolation values (S_eff) for Habitable Zones. Kopparapu et al. (2014)
 
@@ -10,9 +12,22 @@
 # Solar Effective Temperature [K]
 teffsun = 5777.
 
-__all__=['seffi','seffo']
+__all__=['seffi','seffo','seffall','seffio','SeffTable']
 
+# Kopparapu et al. (2014) coefficients seff0, a, b, c, d
+COEFFS = {'rv': (1.776, 2.136e-4, 2.533e-8, -1.332e-11, -3.097e-15),    # Recent Venus
+          'rg': (1.107, 1.332e-4, 1.58e-8, -8.308e-12, -1.931e-15),     # Runaway Greenhouse
+          'mg': (0.356, 6.171e-5, 1.698e-9, -3.198e-12, -5.575e-16),    # Maximum Greenhouse
+          'em': (0.320, 5.547e-5, 1.526e-9, -2.874e-12, -5.011e-16),    # Early Mars
+          'rg5': (1.188, 1.433e-4, 1.707e-8, -8.968e-12, -2.084e-15),   # Runaway Greenhouse, 5 Earth masses
+          'rg01': (0.99, 1.209e-4, 1.404e-8, -7.418e-12, -1.713e-15)}   # Runaway Greenhouse, 0.1 Earth masses
 
+# effective temperature range of the Kopparapu et al. (2014) fits [K]
+TEFFMIN = 2600.
+TEFFMAX = 7200.
+
+
+@instrument.stage('seff.seffi')
 def seffi(teff):
     """Calculate effective insolation (S_eff) following
     Kopparapu et al. (2014): Ruaway Greenhouse limit.
@@ -39,6 +54,7 @@ def seffi(teff):
     sinner = seff0+a*tstar + b*tstar2 + c*tstar3+d*tstar4
     return sinner
 
+@instrument.stage('seff.seffo')
 def seffo(teff):
     """Calculate effective insolation (S_eff) following
     Kopparapu et al. (2014) Maximum Greenhouse limit.
@@ -63,3 +79,109 @@ def seffo(teff):
     d = -5.575e-16
     souter = seff0 + a*tstar + b*tstar2 + c*tstar3+d*tstar4
     return souter
+
+@instrument.stage('seff.seffall')
+def seffall(teff, limits=('rg', 'mg')):
+    """Calculate several effective insolation (S_eff) limits following
+    Kopparapu et al. (2014) in one pass, evaluating the polynomials
+    in Horner form on a shared temperature offset.
+
+    Parameters:
+    -----------
+    teff   ... [K] effective stellar temperature
+    limits ... sequence of keys of COEFFS:
+               'rv'   Recent Venus
+               'rg'   Runaway Greenhouse (1 Earth mass)
+               'mg'   Maximum Greenhouse
+               'em'   Early Mars
+               'rg5'  Runaway Greenhouse (5 Earth masses)
+               'rg01' Runaway Greenhouse (0.1 Earth masses)
+
+    Returns:
+    -------
+    seffs  ... list of S_eff values, one per limit
+    """
+    tstar = teff-teffsun
+    seffs = []
+    for limit in limits:
+        seff0, a, b, c, d = COEFFS[limit]
+        seffs.append(seff0+tstar*(a+tstar*(b+tstar*(c+tstar*d))))
+    return seffs
+
+@instrument.stage('seff.seffio')
+def seffio(teff):
+    """Calculate the inner (Runaway Greenhouse) and outer (Maximum
+    Greenhouse) effective insolation limits of Kopparapu et al. (2014)
+    in one pass, see seffall.
+
+    Parameters:
+    -----------
+    teff...   [K] effective stellar temperature
+
+    Returns:
+    -------
+    sinner... S_eff for the inner Habitable Zone border
+    souter... S_eff for the outer Habitable Zone border
+    """
+    return seffall(teff, ('rg', 'mg'))
+
+
+class SeffTable:
+    """Precomputed S_eff limits on a uniform effective temperature grid
+    with linear interpolation.
+
+    The interpolation error is bounded by h^2/8 max|S_eff''| for grid
+    spacing h, which is evaluated for each limit and stored in `error`.
+    With the default 4097 grid points between TEFFMIN and TEFFMAX the
+    bound is below 1e-7 for all limits. Temperatures outside
+    [tmin, tmax] are evaluated with the polynomials directly.
+
+    Parameters:
+    -----------
+    limits ... sequence of keys of COEFFS, see seffall
+    n      ... number of grid points
+    tmin   ... [K] lowest tabulated effective temperature
+    tmax   ... [K] highest tabulated effective temperature
+    """
+
+    def __init__(self, limits=('rg', 'mg'), n=4097, tmin=TEFFMIN, tmax=TEFFMAX):
+        self.limits = tuple(limits)
+        self.tmin = float(tmin)
+        self.tmax = float(tmax)
+        self.h = (self.tmax-self.tmin)/(n-1)
+
+        grid = np.linspace(self.tmin, self.tmax, n)
+        self.values = [np.append(v, v[-1]) for v in seffall(grid, self.limits)]
+        self.slopes = [np.append(np.diff(v), 0.) for v in self.values]
+
+        # max |S_eff''| of the quartic on the grid range
+        t = np.array([self.tmin, self.tmax])-teffsun
+        self.error = {}
+        for limit in self.limits:
+            seff0, a, b, c, d = COEFFS[limit]
+            tv = np.clip(-c/(4.*d), t[0], t[1])
+            f2 = lambda x: np.abs(2.*b+6.*c*x+12.*d*x*x)
+            self.error[limit] = self.h**2/8.*max(f2(t[0]), f2(t[1]), f2(tv))
+
+    def __call__(self, teff):
+        """Interpolated S_eff limits.
+
+        Parameters:
+        -----------
+        teff  ... [K] effective stellar temperature
+
+        Returns:
+        -------
+        seffs ... list of S_eff values, one per limit
+        """
+        teff = np.asarray(teff, dtype=float)
+        x = (teff-self.tmin)/self.h
+        inside = (x >= 0) & (x <= len(self.values[0])-2)
+        i = np.where(inside, x, 0.).astype(np.intp)
+        f = x-i
+
+        seffs = [v[i]+f*s[i] for v, s in zip(self.values, self.slopes)]
+        if(not np.all(inside)):
+            exact = seffall(teff, self.limits)
+            seffs = [np.where(inside, v, e) for v, e in zip(seffs, exact)]
+        return seffs
@@ -1,14 +1,17 @@
 #!/bin/python
 import numpy as np
-from scipy.optimize import fsolve
 
 from .seff import *
-import circumstellar
-import circumbinary 
+from . import circumstellar
+from . import circumbinary
+from . import instrument
 
 
 sqrt = np.sqrt
 
+__all__=['termsS','termsP','bracket','rootsolve','solve',
+         'PHZ_A','PHZ_S','AHZ_S','PHZ_P','AHZ_P']
+
 #######################################
 # Insolation equivalent orbit distance
 ######################################
@@ -23,154 +26,481 @@ def reqb(a, e):
     reqp = a*(1.-e*e)**(0.25)
     return reqp
 
-# circumstellar
-
-def ahziS(LA, teffA, LB, teffB, ab, eb, apI):
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
-
-    reqpSI = circumstellar.reqpS(ab, eb, apI)
-    reqbI = reqb(ab, eb)
-
-    lhsm1 = AI/reqpSI**2+BI/(reqbI**2-reqpSI**2)-1
+#######################################
+# System constant terms
+######################################
+# The residuals below depend on the planetary semimajor axis ap
+# only through a few operations. Everything else is computed
+# once per system by termsS / termsP and passed to the kernels.
 
-    return lhsm1
+def termsS(LA, teffA, LB, teffB, ab, eb):
+    """System constant terms of the S-type residuals.
 
-def ahzoS(LA, teffA, LB, teffB, ab, eb, apO):
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    t      ... dict with
+               AI, BI ... L/S_eff of both stars, Runaway Greenhouse [au^2]
+               AO, BO ... L/S_eff of both stars, Maximum Greenhouse [au^2]
+               BIo    ... LB/S_eff, Maximum Greenhouse, as used in phziS [au^2]
+               k      ... epmaxS = k*ap [1/au]
+               reqb2  ... squared insolation equivalent binary distance [au^2]
+               qb     ... binary pericenter distance [au]
+               apob   ... binary apocenter distance [au]
+    """
+    t = {}
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    t['AI'] = LA/siA
+    t['BI'] = LB/siB
+    t['AO'] = LA/soA
+    t['BO'] = LB/soB
+    t['BIo'] = t['BO']
 
-    reqpSO = circumstellar.reqpS(ab, eb, apO)
-    reqbO = reqb(ab, eb)
+    t['k'] = circumstellar.epmaxS(ab, eb, 1.)
+    t['reqb2'] = reqb(ab, eb)**2
+    t['qb'] = ab*(1.-eb)
+    t['apob'] = ab*(1.+eb)
+    return t
 
-    lhsm1 = AO/reqpSO**2+BO/(reqbO**2-reqpSO**2)-1
+def termsP(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    """System constant terms of the P-type residuals.
 
-    return lhsm1
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    mA     ... mass of primary star [Msun]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    t      ... dict with
+               AI, BI ... L/S_eff of both stars, Runaway Greenhouse [au^2]
+               AO, BO ... L/S_eff of both stars, Maximum Greenhouse [au^2]
+               k      ... epmaxP = k/ap [au]
+               ci, co ... apocenter distance of primary and secondary
+                          from the barycenter [au]
+               dA, dB ... squared insolation equivalent distances of
+                          the stars from the barycenter [au^2]
+    """
+    mu = mB/(mA+mB)
 
-def phziS(LA, teffA, LB, teffB, ab, eb, apI):
-    AI = LA/seffi(teffA)
-    BI = LB/seffo(teffB)
+    t = {}
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
 
-    epmaxi = circumstellar.epmaxS(ab, eb, apI)
+    t['AI'] = LA/siA
+    t['BI'] = LB/siB
+    t['AO'] = LA/soA
+    t['BO'] = LB/soB
 
-    qpI = apI*(1.-epmaxi)
-#       apopI = apI*(1.+epmaxi)
-    qb = ab*(1.-eb)
+    t['k'] = circumbinary.epmaxP(ab, eb, 1., mA, mB)
 
-    lhsm1 = AI/qpI**2+BI/(qpI-qb)**2-1.
+    apob = ab*(1.+eb)
+    t['ci'] = mu*apob
+    t['co'] = (1.-mu)*apob
 
-    return lhsm1
-###
+    reqbP = reqb(ab, eb)
+    t['dA'] = (mu*mu*reqbP)**2
+    t['dB'] = ((1.-mu)*(1.-mu)*reqbP)**2
+    return t
+
+# ap dependent parts of the residuals
+
+def _ahzS(ap, A, B, k, reqb2):
+    reqp2 = ap*ap*sqrt(1.-(k*ap)**2)
+    return A/reqp2+B/(reqb2-reqp2)-1.
+
+def _phziS(ap, A, B, k, qb):
+    qp = ap*(1.-k*ap)
+    return A/qp**2+B/(qp-qb)**2-1.
+
+def _phzoS(ap, A, B, k, apob):
+    apop = ap*(1.+k*ap)
+    return A/apop**2+B/(apop-apob)**2-1.
+
+def _ahzP(ap, A, B, k, dA, dB):
+    reqp2 = ap*ap*sqrt(1.-(k/ap)**2)
+    return A/(reqp2-dA)+B/(reqp2+dB)-1.
+
+def _phziP(ap, A, B, k, ci, co):
+    qp = ap-k
+    return A/(qp-ci)**2+B/(qp+co)**2-1.
+
+def _phzoP(ap, A, B, k, ci, co):
+    apop = ap+k
+    return A/(apop+ci)**2+B/(apop-co)**2-1.
+
+# terms, kernel, kernel arguments, HZ edge (0 inner, 1 outer)
+RESIDUALS = {'ahziS': (termsS, _ahzS, ('AI', 'BI', 'k', 'reqb2'), 0),
+             'ahzoS': (termsS, _ahzS, ('AO', 'BO', 'k', 'reqb2'), 1),
+             'phziS': (termsS, _phziS, ('AI', 'BIo', 'k', 'qb'), 0),
+             'phzoS': (termsS, _phzoS, ('AO', 'BO', 'k', 'apob'), 1),
+             'ahziP': (termsP, _ahzP, ('AI', 'BI', 'k', 'dA', 'dB'), 0),
+             'ahzoP': (termsP, _ahzP, ('AO', 'BO', 'k', 'dA', 'dB'), 1),
+             'phziP': (termsP, _phziP, ('AI', 'BI', 'k', 'ci', 'co'), 0),
+             'phzoP': (termsP, _phzoP, ('AO', 'BO', 'k', 'ci', 'co'), 1)}
+
+def _residual(name, params, ap):
+    terms, kernel, keys, i = RESIDUALS[name]
+    t = terms(*params)
+    return kernel(ap, *[t[k] for k in keys])
 
-def phzoS(LA, teffA, LB, teffB, ab, eb, apO):
+# circumstellar
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+def ahziS(LA, teffA, LB, teffB, ab, eb, apI):
+    return _residual('ahziS', (LA, teffA, LB, teffB, ab, eb), apI)
 
-    epmaxo = circumstellar.epmaxS(ab, eb, apO)
-#        qpO = apO*(1.-epmaxo)
-    apopO = apO*(1.+epmaxo)
-    apob = ab*(1.+eb)
-    lhsm1 = AO/apopO**2+BO/(apopO-apob)**2-1.
+def ahzoS(LA, teffA, LB, teffB, ab, eb, apO):
+    return _residual('ahzoS', (LA, teffA, LB, teffB, ab, eb), apO)
 
-    return lhsm1
+def phziS(LA, teffA, LB, teffB, ab, eb, apI):
+    return _residual('phziS', (LA, teffA, LB, teffB, ab, eb), apI)
 
-def PHZ_A(LA, teffA, LB, teffB, ab, eb):
+def phzoS(LA, teffA, LB, teffB, ab, eb, apO):
+    return _residual('phzoS', (LA, teffA, LB, teffB, ab, eb), apO)
 
-    [apI_initial_guess, apO_initial_guess] = SSHZ(LA, teffA)
+# circumbinary
 
-    funci = lambda apI: phziS(LA, teffA, LB, teffB, ab, eb, apI)
-    funco = lambda apO: phzoS(LA, teffA, LB, teffB, ab, eb, apO)
+def ahziP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    return _residual('ahziP', (LA, teffA, mA, LB, teffB, mB, ab, eb), ap)
 
-    phzi = fsolve(funci, apI_initial_guess)
-    phzo = fsolve(funco, apO_initial_guess)
+def ahzoP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    return _residual('ahzoP', (LA, teffA, mA, LB, teffB, mB, ab, eb), ap)
 
-    if(phzi > phzo or phzi < 0 or phzo < 0):
-        phzi = 0
-        phzo = 0
-        print("Error in class: semianalytic: no PHZ for given parameters")
+def phziP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    return _residual('phziP', (LA, teffA, mA, LB, teffB, mB, ab, eb), ap)
 
-    return [phzi, phzo]
+def phzoP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    return _residual('phzoP', (LA, teffA, mA, LB, teffB, mB, ab, eb), ap)
 
 
 ##########################################################
-# Circumbinary
+# Habitable zones
 ##########################################################
-def ahziP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
-
-    mu = mB/(mA+mB)
 
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+def _hz(names, params, hz):
+    terms = RESIDUALS[names[0]][0]
+    params = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in params])
+    shape = params[0].shape
+    t = terms(*[p.ravel() for p in params])
 
-#       apI=np.sqrt(AI+BI)
-    apI = ap
+    hzi, convi = _solve(names[0], t)
+    hzo, convo = _solve(names[1], t)
 
-    reqpPI = circumbinary.reqpP(mA, mB, ab, eb, apI)
-    reqbP = reqb(ab, eb)
+    fail = ~convi | ~convo | (hzi > hzo) | (hzi < 0) | (hzo < 0)
 
-    reqA = reqbP*mu
-    reqB = reqbP*(1-mu)
+    if(np.any(fail)):
+        hzi = np.where(fail, 0., hzi)
+        hzo = np.where(fail, 0., hzo)
+        print("Error in class: semianalytic: no "+hz+" for given parameters")
 
-    ahzi = AI/(reqpPI**2-(mu*reqA)**2)+BI/(reqpPI**2+((1-mu)*reqB)**2)-1
+    return [hzi.reshape(shape)[()], hzo.reshape(shape)[()]]
 
-    return ahzi
-
-def ahzoP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+@instrument.stage('semianalytic.PHZ_A')
+def PHZ_A(LA, teffA, LB, teffB, ab, eb):
+    """Semianalytic Permanently Habitable Zone (PHZ) for S-type
+    binary star systems (Eggl, 2018).
 
-    mu = mB/(mA+mB)
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    phzi   ... inner edge of the PHZ [au], 0 if there is no PHZ
+    phzo   ... outer edge of the PHZ [au], 0 if there is no PHZ
+    """
+    return _hz(['phziS', 'phzoS'], (LA, teffA, LB, teffB, ab, eb), 'PHZ')
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+PHZ_S = PHZ_A
 
-#       apO=np.sqrt(AO+BO)
-    apO = ap
+@instrument.stage('semianalytic.AHZ_S')
+def AHZ_S(LA, teffA, LB, teffB, ab, eb):
+    """Semianalytic Averaged Habitable Zone (AHZ) for S-type
+    binary star systems (Eggl, 2018).
 
-    reqpPO = circumbinary.reqpP(mA, mB, ab, eb, apO)
-    reqbP = reqb(ab, eb)
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    ahzi   ... inner edge of the AHZ [au], 0 if there is no AHZ
+    ahzo   ... outer edge of the AHZ [au], 0 if there is no AHZ
+    """
+    return _hz(['ahziS', 'ahzoS'], (LA, teffA, LB, teffB, ab, eb), 'AHZ')
 
-    reqA = reqbP*mu
-    reqB = reqbP*(1-mu)
+@instrument.stage('semianalytic.PHZ_P')
+def PHZ_P(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    """Semianalytic Permanently Habitable Zone (PHZ) for P-type
+    binary star systems (Eggl, 2018).
 
-    ahzo = AO/(reqpPO**2-(mu*reqA)**2)+BO/(reqpPO**2+((1-mu)*reqB)**2)-1
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    mA     ... mass of primary star [Msun]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    phzi   ... inner edge of the PHZ [au], 0 if there is no PHZ
+    phzo   ... outer edge of the PHZ [au], 0 if there is no PHZ
+    """
+    return _hz(['phziP', 'phzoP'], (LA, teffA, mA, LB, teffB, mB, ab, eb), 'PHZ')
 
-    return ahzo
+@instrument.stage('semianalytic.AHZ_P')
+def AHZ_P(LA, teffA, mA, LB, teffB, mB, ab, eb):
+    """Semianalytic Averaged Habitable Zone (AHZ) for P-type
+    binary star systems (Eggl, 2018).
 
-def phziP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    Parameters:
+    ----------
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    mA     ... mass of primary star [Msun]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    mB     ... mass of secondary star [Msun]
+    ab     ... binary star orbit semimajor axes [au]
+    eb     ... binary star orbit eccentricity
+
+    Returns:
+    -------
+    ahzi   ... inner edge of the AHZ [au], 0 if there is no AHZ
+    ahzo   ... outer edge of the AHZ [au], 0 if there is no AHZ
+    """
+    return _hz(['ahziP', 'ahzoP'], (LA, teffA, mA, LB, teffB, mB, ab, eb), 'AHZ')
 
-    mu = mB/(mA+mB)
 
-    AI = LA/seffi(teffA)
-    BI = LB/seffi(teffB)
+##########################################################
+# Batched root finding
+##########################################################
 
-#       apI=np.sqrt(AI+BI)
-    apI = ap
-    epmaxi = circumbinary.epmaxP(ab, eb, apI)
-    qpI = apI*(1.-epmaxi)
-#        apopI = apI*(1.+epmaxi)
-#        qb = ab*(1.-eb)
-    apob = ab*(1.+eb)
+def bracket(func, x0, args=(), grow=1.25, maxiter=40):
+    """Find brackets [lo, hi] around the root of func closest to x0
+    for many functions at once.
 
-    phzi = AI/(qpI-mu*apob)**2+BI/(qpI+(1-mu)*apob)**2-1
+    The search steps outward from x0 by geometrically increasing
+    factors until func changes sign on one side.
 
-    return phzi
+    Parameters:
+    ----------
+    func    ... vectorized residual func(x, *args)
+    x0      ... array of initial guesses (> 0)
+    args    ... tuple of parameter arrays of the same length as x0
+    grow    ... factor by which the search interval grows per step
+    maxiter ... maximum number of search steps
+
+    Returns:
+    -------
+    lo, hi  ... bracket edges, nan where no sign change was found
+    """
+    x0 = np.asarray(x0, dtype=float)
+    lo = np.full(x0.shape, np.nan)
+    hi = np.full(x0.shape, np.nan)
+
+    with np.errstate(all='ignore'):
+        f0 = func(x0, *args)
+        xl, fl = x0.copy(), f0.copy()
+        xh, fh = x0.copy(), f0.copy()
+        act = np.isfinite(f0) & (x0 > 0)
+        found = f0 == 0
+        lo[found] = x0[found]
+        hi[found] = x0[found]
+        act &= ~found
+
+        factor = grow
+        for i in range(maxiter):
+            idx = np.nonzero(act)[0]
+            if(idx.size == 0):
+                break
+            a = [p[idx] for p in args]
+
+            xl1 = x0[idx]/factor
+            xh1 = x0[idx]*factor
+            fl1 = func(xl1, *a)
+            fh1 = func(xh1, *a)
+
+            up = np.sign(fh1) != np.sign(fh[idx])
+            dn = (np.sign(fl1) != np.sign(fl[idx])) & ~up
+            up &= np.isfinite(fh1)
+            dn &= np.isfinite(fl1)
+
+            lo[idx[up]] = xh[idx[up]]
+            hi[idx[up]] = xh1[up]
+            lo[idx[dn]] = xl1[dn]
+            hi[idx[dn]] = xl[idx[dn]]
+            act[idx[up | dn]] = False
+
+            xl[idx], fl[idx] = xl1, fl1
+            xh[idx], fh[idx] = xh1, fh1
+            factor *= grow
+
+    if(instrument.ENABLED):
+        instrument.count('semianalytic.bracket', rows=x0.size,
+                         nobracket=np.count_nonzero(np.isnan(lo)))
+    return lo, hi
+
+
+def rootsolve(func, lo, hi, args=(), xtol=1e-12, rtol=1e-10, maxiter=100):
+    """Solve func(x, *args) = 0 for many bracketed roots at once
+    using the Illinois variant of regula falsi with a bisection
+    safeguard.
+
+    Only elements that have not yet converged are evaluated in
+    each iteration.
 
-def phzoP(LA, teffA, mA, LB, teffB, mB, ab, eb, ap):
+    Parameters:
+    ----------
+    func    ... vectorized residual func(x, *args)
+    lo, hi  ... arrays of bracket edges, func(lo)*func(hi) <= 0
+    args    ... tuple of parameter arrays of the same length as lo
+    xtol    ... absolute tolerance on the root
+    rtol    ... relative tolerance on the root
+    maxiter ... maximum number of iterations
+
+    Returns:
+    -------
+    x       ... roots, nan where no bracket was given
+    conv    ... boolean array, True where the root converged
+    """
+    a = np.array(lo, dtype=float)
+    b = np.array(hi, dtype=float)
+    x = np.full(a.shape, np.nan)
+    conv = np.zeros(a.shape, dtype=bool)
+
+    with np.errstate(all='ignore'):
+        fa = func(a, *args)
+        fb = func(b, *args)
+
+        act = np.isfinite(fa) & np.isfinite(fb) & (np.sign(fa) != np.sign(fb))
+        for f, y in [(fa, a), (fb, b)]:
+            done = np.isfinite(y) & (f == 0)
+            x[done] = y[done]
+            conv |= done
+        act &= ~conv
+        bracketed = act.copy()
+
+        niter = 0
+        nevals = 0
+        for i in range(maxiter):
+            idx = np.nonzero(act)[0]
+            if(idx.size == 0):
+                break
+            niter += 1
+            nevals += idx.size
+            ai, bi, fai, fbi = a[idx], b[idx], fa[idx], fb[idx]
+
+            c = bi-fbi*(bi-ai)/(fbi-fai)
+            bad = ~((c > np.minimum(ai, bi)) & (c < np.maximum(ai, bi)))
+            c[bad] = 0.5*(ai[bad]+bi[bad])
+            fc = func(c, *[p[idx] for p in args])
+
+            # Illinois: keep the endpoint with opposite sign, halve a stale one
+            flip = np.sign(fc) != np.sign(fbi)
+            ai = np.where(flip, bi, ai)
+            fai = np.where(flip, fbi, 0.5*fai)
+
+            a[idx], fa[idx] = ai, fai
+            b[idx], fb[idx] = c, fc
+
+            done = (fc == 0) | (np.abs(c-ai) <= xtol+rtol*np.abs(c)) | ~np.isfinite(fc)
+            ok = done & np.isfinite(fc)
+            x[idx[done]] = c[done]
+            conv[idx[ok]] = True
+            act[idx[done]] = False
+
+        # best estimate for elements that ran out of iterations
+        x[act] = b[act]
+
+    if(instrument.ENABLED):
+        instrument.count('semianalytic.rootsolve', rows=x.size, iterations=niter,
+                         evaluations=nevals, nonconverged=np.count_nonzero(bracketed & ~conv))
+    return x, conv
+
+
+def _solve(residual, t, xtol=1e-12, rtol=1e-10, maxiter=100):
+    terms, kernel, keys, i = RESIDUALS[residual]
+    args = [t[k] for k in keys]
+
+    # single star (S-type) or combined luminosity (P-type) HZ as initial guess
+    with np.errstate(all='ignore'):
+        if(terms is termsS):
+            x0 = sqrt([t['AI'], t['AO']][i])
+        else:
+            x0 = sqrt([t['AI']+t['BI'], t['AO']+t['BO']][i])
+
+    lo, hi = bracket(kernel, x0, args=args)
+    return rootsolve(kernel, lo, hi, args=args,
+                     xtol=xtol, rtol=rtol, maxiter=maxiter)
+
+@instrument.stage('semianalytic.solve')
+def solve(residual, *params, xtol=1e-12, rtol=1e-10, maxiter=100):
+    """Solve one of the semianalytic HZ edge equations for many
+    systems at once.
+
+    The system constant terms are computed once, the search starts
+    from the single star (S-type) or combined luminosity (P-type)
+    habitable zone limits, brackets the nearest root and refines it
+    with rootsolve.
 
-    mu = mB/(mA+mB)
+    Parameters:
+    ----------
+    residual ... name of the residual function, one of
+                 'ahziS', 'ahzoS', 'phziS', 'phzoS' with params
+                 LA, teffA, LB, teffB, ab, eb, or
+                 'ahziP', 'ahzoP', 'phziP', 'phzoP' with params
+                 LA, teffA, mA, LB, teffB, mB, ab, eb
+    params   ... scalars or arrays, broadcast against each other
+    xtol     ... absolute tolerance on the HZ edge [au]
+    rtol     ... relative tolerance on the HZ edge
+    maxiter  ... maximum number of solver iterations
+
+    Returns:
+    -------
+    edge     ... HZ edge [au], nan where no root was found
+    conv     ... boolean array, True where the solver converged
+    """
+    if(residual not in RESIDUALS):
+        raise ValueError('Residual not recognized. \
+                              Choose one of '+', '.join(RESIDUALS))
 
-    AO = LA/seffo(teffA)
-    BO = LB/seffo(teffB)
+    terms = RESIDUALS[residual][0]
 
-#       apO=np.sqrt(AO+BO)
-    apO = ap
-    epmaxo = circumbinary.epmaxP(ab, eb, apO)
-#        qpO = apO*(1.-epmaxo)
-    apopO = apO*(1.+epmaxo)
-#        qb = ab*(1.-eb)
-    apob = ab*(1.+eb)
+    params = np.broadcast_arrays(*[np.asarray(p, dtype=float) for p in params])
+    shape = params[0].shape
+    t = terms(*[p.ravel() for p in params])
 
-    phzo = AO/(apopO+mu*apob)**2+BO/(apopO-(1-mu)*apob)**2-1
+    edge, conv = _solve(residual, t, xtol=xtol, rtol=rtol, maxiter=maxiter)
 
-    return phzo
+    return edge.reshape(shape), conv.reshape(shape)
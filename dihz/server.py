@@ -0,0 +1,357 @@
+#!/bin/python
+import argparse
+import asyncio
+import json
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+from . import batch
+from . import stability
+
+################################
+# HTTP/JSON query service
+###############################
+# A small asyncio HTTP/1.1 server. Single system queries that arrive
+# within a short time window are collected and evaluated as one
+# vectorized batch in a worker pool, so the event loop stays responsive
+# and the per-request cost is a small share of one numpy call.
+#
+# Endpoints (GET with query parameters or POST with a JSON object):
+#   /phz       hztype, method, LA, teffA, mA, LB, teffB, mB, ab, eb
+#              -> phzi, phzo, phz, valid
+#   /ahz       same parameters -> ahzi, ahzo, ahz, valid
+#   /stability hztype, mA, mB, ab, eb -> astab
+#   /batch     POST {"hztype", "method", "systems": {column: [...]}
+#              or [{column: value}, ...]} -> columns of batch.hzP / hzS
+
+__all__=['Batcher','HZServer','serve']
+
+# default batching window [s] and maximum batch size
+WINDOW = 0.002
+MAXBATCH = 4096
+
+# maximum request body size [bytes]
+MAXBODY = 2**26
+
+ENDPOINTS = {'/phz': ['phzi', 'phzo', 'phz', 'valid'],
+             '/ahz': ['ahzi', 'ahzo', 'ahz', 'valid'],
+             '/stability': ['astab']}
+
+STABPARAMS = ['mA', 'mB', 'ab', 'eb']
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _float(params, name):
+    if(name not in params):
+        raise HTTPError(400, 'Missing parameter '+name)
+    try:
+        return float(params[name])
+    except (TypeError, ValueError):
+        raise HTTPError(400, 'Parameter '+name+' must be a number')
+
+def _hztype(params):
+    hztype = params.get('hztype', 'P')
+    if(hztype not in ['S', 'P']):
+        raise HTTPError(400, 'Binary star type not recognized. Choose "S" or "P".')
+    return hztype
+
+def _method(params):
+    method = params.get('method', 'analytic')
+    if(method not in ['analytic', 'semianalytic']):
+        raise HTTPError(400, 'Method not recognized. Choose "analytic" or "semianalytic".')
+    return method
+
+def _json(x):
+    # numpy scalars and arrays to JSON, nan and inf to null
+    if(isinstance(x, np.ndarray)):
+        return [_json(v) for v in x.tolist()]
+    if(isinstance(x, (np.generic,))):
+        x = x.item()
+    if(isinstance(x, float) and not math.isfinite(x)):
+        return None
+    if(isinstance(x, list)):
+        return [_json(v) for v in x]
+    return x
+
+
+class Batcher:
+    """Collect single row requests and evaluate them together.
+
+    Requests with the same key are queued. The queue is evaluated
+    `window` seconds after its first request arrived, or as soon as it
+    holds `maxbatch` requests, by func(key, columns) in the executor.
+
+    Parameters:
+    ----------
+    func     ... func(key, columns) -> dict of result arrays, where
+                 columns is a dict of 1D float arrays
+    window   ... batching window [s]
+    maxbatch ... maximum number of rows per evaluation
+    executor ... concurrent.futures executor for func
+    """
+
+    def __init__(self, func, window=WINDOW, maxbatch=MAXBATCH, executor=None):
+        self.func = func
+        self.window = window
+        self.maxbatch = maxbatch
+        self.executor = executor
+        self.batches = 0
+        self.rows = 0
+        self._queues = {}
+        self._timers = {}
+        # running evaluations, referenced until they are done
+        self._tasks = set()
+
+    async def submit(self, key, row):
+        """Queue a row (dict of floats) and wait for its results
+        (dict of scalars)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(key, [])
+        queue.append((row, future))
+        if(len(queue) >= self.maxbatch):
+            self._flush(key)
+        elif(key not in self._timers):
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if(timer is not None):
+            timer.cancel()
+        queue = self._queues.pop(key, [])
+        if(queue):
+            task = asyncio.get_running_loop().create_task(self._evaluate(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _evaluate(self, key, queue):
+        # every exception is passed on to the waiting requests
+        self.batches += 1
+        self.rows += len(queue)
+        try:
+            names = list(queue[0][0])
+            cols = {k: np.array([row[k] for row, f in queue], dtype=float) for k in names}
+            res = await asyncio.get_running_loop().run_in_executor(self.executor, self.func, key, cols)
+        except asyncio.CancelledError:
+            for row, f in queue:
+                f.cancel()
+            raise
+        except Exception as e:
+            for row, f in queue:
+                if(not f.done()):
+                    f.set_exception(e)
+            return
+        for i, (row, f) in enumerate(queue):
+            if(not f.done()):
+                f.set_result({k: v[i] for k, v in res.items()})
+
+
+class HZServer:
+    """Habitable zone query service.
+
+    Parameters:
+    ----------
+    window   ... batching window [s]
+    maxbatch ... maximum number of rows per evaluation
+    workers  ... number of worker threads (numpy releases the GIL
+                 in the array operations)
+    cache    ... optional cache.HZCache that serves /phz, /ahz and /batch
+    """
+
+    def __init__(self, window=WINDOW, maxbatch=MAXBATCH, workers=None, cache=None):
+        self.executor = ThreadPoolExecutor(workers)
+        self.cache = cache
+        self.batcher = Batcher(self._compute, window, maxbatch, self.executor)
+        self.requests = 0
+
+    def _compute(self, key, cols):
+        if(key[0] == 'stability'):
+            with np.errstate(all='ignore'):
+                ok = (cols['mA'] > 0) & (cols['mB'] > 0) & (cols['ab'] > 0) & \
+                    (cols['eb'] >= 0) & (cols['eb'] < 1)
+                astab = np.full(len(ok), np.nan)
+                if(np.any(ok)):
+                    astab[ok] = stability.stabilityLimit(key[1], *[cols[k][ok] for k in STABPARAMS])
+            return {'astab': astab}
+        return self._hz(cols, key[1], key[2])
+
+    def _hz(self, cols, hztype, method):
+        if(self.cache is not None):
+            return self.cache.query(cols, hztype, method)
+        return batch._hz(cols, batch.COLUMNSP, batch._kernel(hztype, method), batch.BLOCK)
+
+    async def dispatch(self, path, params):
+        """Answer a request for path with the parameters params (dict),
+        returns a JSON serializable dict."""
+        if(path == '/batch'):
+            return await self._batch(params)
+        if(path not in ENDPOINTS):
+            raise HTTPError(404, 'Unknown endpoint '+path)
+
+        hztype = _hztype(params)
+        if(path == '/stability'):
+            key = ('stability', hztype)
+            row = {k: _float(params, k) for k in STABPARAMS}
+        else:
+            key = ('hz', hztype, _method(params))
+            row = {k: _float(params, k) for k in batch.COLUMNSP}
+
+        res = await self.batcher.submit(key, row)
+        return {k: _json(res[k]) for k in ENDPOINTS[path]}
+
+    async def _batch(self, params):
+        hztype = _hztype(params)
+        method = _method(params)
+        systems = params.get('systems')
+        if(isinstance(systems, list)):
+            if(not all(isinstance(s, dict) for s in systems)):
+                raise HTTPError(400, 'systems must be an object of columns or a list of objects')
+            systems = {k: [s.get(k) for s in systems] for k in batch.COLUMNSP}
+        if(not isinstance(systems, dict)):
+            raise HTTPError(400, 'systems must be an object of columns or a list of objects')
+        try:
+            cols = {k: np.asarray(systems[k], dtype=float).ravel() for k in batch.COLUMNSP}
+        except KeyError as e:
+            raise HTTPError(400, 'Missing column '+e.args[0])
+        except (TypeError, ValueError):
+            raise HTTPError(400, 'Columns must be arrays of numbers')
+        if(len({len(c) for c in cols.values()}) > 1):
+            raise HTTPError(400, 'Catalog columns must have equal length!')
+
+        loop = asyncio.get_running_loop()
+        res = await loop.run_in_executor(self.executor, self._hz, cols, hztype, method)
+        return {k: _json(v) for k, v in res.items()}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests of one connection."""
+        try:
+            while(True):
+                line = await reader.readline()
+                if(not line):
+                    break
+                try:
+                    verb, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while(True):
+                    h = await reader.readline()
+                    if(h in (b'\r\n', b'\n', b'')):
+                        break
+                    k, _, v = h.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                body = await reader.readexactly(length) if 0 < length <= MAXBODY else b''
+                # the end of an unread body is unknown, so close afterwards
+                keep = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1' \
+                    and 0 <= length <= MAXBODY
+
+                status, res = await self._respond(verb, target, body, length)
+                data = json.dumps(res).encode()
+                writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                              'Content-Length: %d\r\nConnection: %s\r\n\r\n' %
+                              (status, REASONS[status], len(data),
+                               'keep-alive' if keep else 'close')).encode()+data)
+                await writer.drain()
+                if(not keep):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, verb, target, body, length):
+        self.requests += 1
+        url = urlsplit(target)
+        try:
+            if(length < 0):
+                raise HTTPError(400, 'Invalid Content-Length header')
+            if(length > MAXBODY):
+                raise HTTPError(413, 'Request body too large')
+            if(verb == 'GET'):
+                params = dict(parse_qsl(url.query))
+            elif(verb == 'POST'):
+                try:
+                    params = json.loads(body or b'{}')
+                except ValueError:
+                    raise HTTPError(400, 'Request body is not valid JSON')
+                if(not isinstance(params, dict)):
+                    raise HTTPError(400, 'Request body must be a JSON object')
+            else:
+                raise HTTPError(405, 'Use GET or POST')
+            return 200, await self.dispatch(url.path, params)
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': repr(e)}
+
+    async def start(self, host='127.0.0.1', port=8000):
+        """Start listening, returns the asyncio server (port=0 picks a free port)."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def serve(host='127.0.0.1', port=8000, **kwargs):
+    """Run the service until interrupted, see HZServer for kwargs."""
+    service = HZServer(**kwargs)
+
+    async def run():
+        server = await service.start(host, port)
+        print('dihz: serving on http://%s:%d' % server.sockets[0].getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dihz.server',
+                                     description='Habitable zone HTTP/JSON query service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8000)
+    parser.add_argument('-w', '--window', type=float, default=WINDOW,
+                        help='batching window [s]')
+    parser.add_argument('-b', '--maxbatch', type=int, default=MAXBATCH)
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--cache', type=int, default=0,
+                        help='size of the result cache, 0 for no cache')
+    args = parser.parse_args(argv)
+
+    cache = None
+    if(args.cache > 0):
+        from .cache import HZCache
+        cache = HZCache(maxsize=args.cache)
+    serve(args.host, args.port, window=args.window, maxbatch=args.maxbatch,
+          workers=args.workers, cache=cache)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,5 +25,6 @@ def SSHZ(L, teff):
     --------
     Functions sinner, souter
     """
-    return [np.sqrt(L/seffi(teff)), np.sqrt(L/seffo(teff))]
+    sinner, souter = seffio(teff)
+    return [np.sqrt(L/sinner), np.sqrt(L/souter)]
 
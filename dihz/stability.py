@@ -1,47 +1,74 @@
 #!/bin/python
 import numpy as np
+from . import instrument
 
 __all__=['stabilityLimit','hw99S','hw99P']
 
 ###########################
 # Orbital stability
 ############################
+# accepted binary star type labels, integer codes are 0 (S) and 1 (P)
+STYPES = ['S', 's', 'S-type', 'S-Type', 'circumstellar']
+PTYPES = ['P', 'p', 'P-type', 'P-Type', 'circumbinary']
+
+@instrument.stage('stability.stabilityLimit')
 def stabilityLimit(binary_star_type, mA, mB, ab, eb):
     """Routines for caculating dynamical stability
     for Earth-like planets in binary star systems following
     Holman & Wiegert (1999).
 
+    All arguments may be scalars or arrays that broadcast against
+    each other, so that catalogs with S- and P-type systems can be
+    evaluated in one call. Rows are routed to hw99S or hw99P by type.
+
     Parameters:
     -----------
+    binary_star_type ... 'S' (or one of STYPES, or 0) for circumstellar,
+                         'P' (or one of PTYPES, or 1) for circumbinary systems
     mA... mass of primary star [Msun]
     mB... mass of secondary star [Msun]
     ab... semimajor axis of binary orbit [au]
     eb... orbital eccentricity of binary
 
-    Calculates:
+    Returns:
     -----------
     stability_limit  ... maximum (cicumstellar) or minimum (circumbinary)
                          stable distance of planet on circular orbit from
                          host star(s)
     """
+    tp, mA, mB, ab, eb = np.broadcast_arrays(np.asarray(binary_star_type),
+        *[np.asarray(x, dtype=float) for x in [mA, mB, ab, eb]])
+
+    if(tp.dtype.kind in 'iub'):
+        S = tp == 0
+        P = tp == 1
+    else:
+        if(tp.dtype.kind == 'S'):
+            tp = np.char.decode(tp)
+        tp = tp.astype(str)
+        S = np.isin(tp, STYPES)
+        P = np.isin(tp, PTYPES)
+
+    if(not np.all(S | P)):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
 
-    tp=binary_star_type
+    if(np.any(~(mA > 0)) or np.any(~(mB > 0))):
+        raise ValueError('Stellar masses mA and mB must be > 0!')
 
-    if(ab <= 0):
-        raise ValueError('Semimajor axis ab must be >= 0!')
+    if(np.any(~(ab > 0))):
+        raise ValueError('Semimajor axis ab must be > 0!')
 
-    if(eb < 1 and eb >= 0):
-        raise ValueError('Eccentricity eb must be < 1!')
+    if(np.any(~((eb >= 0) & (eb < 1)))):
+        raise ValueError('Eccentricity eb must be 0 <= eb < 1!')
 
-    if(tp in ['S', 's', 'S-type', 'S-Type', 'circumstellar']):
-           stability_limit = hw99S(mA, mB, ab, eb)
+    stability_limit = np.empty(tp.shape)
+    stability_limit[S] = hw99S(mA[S], mB[S], ab[S], eb[S])
+    stability_limit[P] = hw99P(mA[P], mB[P], ab[P], eb[P])
 
-    elif(tp in ['P', 'p', 'P-type', 'P-Type', 'circumbinary']):
-           stability_limit = hw99P(mA, mB, ab, eb)
-    else:
-        raise ValueError('Binary star type not recognized. \
-                              Choose "S" or "P".')
+    return stability_limit[()]
 
+@instrument.stage('stability.hw99S')
 def hw99S(mA, mB, ab, eb):
         """ Circumstellar (S-type) stability limit for binary star systems
         according to Holman & Wiegert (1999)
@@ -64,6 +91,7 @@ def hw99S(mA, mB, ab, eb):
         ap = ab*(0.464-0.38*mu-0.631*eb+0.586*mu*eb + 0.15*eb2-0.198*mu*eb2)
         return ap
 
+@instrument.stage('stability.hw99P')
 def hw99P(mA, mB, ab, eb):
         """ Circumbinary (P-type) stability limit for binary star systems
         according to Holman & Wiegert (1999)
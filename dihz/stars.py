@@ -0,0 +1,249 @@
+#!/bin/python
+import re
+
+import numpy as np
+
+################################
+# Main-sequence stellar parameters
+###############################
+# Luminosities and effective temperatures of dwarf stars from their
+# masses or spectral types, for catalogs that lack them. The relations
+# are interpolated linearly in log mass from the table below, resampled
+# once on a uniform grid so that an evaluation is an index computation
+# instead of a search.
+
+__all__=['MassTable','mainsequence','spectype','complete']
+
+# Main-sequence dwarfs: spectral type, Teff [K], log10 L [L_sun], M [M_sun].
+# Rounded, approximately after Pecaut & Mamajek (2013, ApJS 208, 9) and
+# E. Mamajek's updated "Modern Mean Dwarf Stellar Color and Effective
+# Temperature Sequence".
+DWARFS = [('B0V', 31400., 4.40, 17.7),
+          ('B1V', 26000., 3.93, 11.8),
+          ('B2V', 20600., 3.44, 7.3),
+          ('B3V', 17000., 2.92, 5.4),
+          ('B5V', 15700., 2.65, 4.7),
+          ('B8V', 12500., 2.10, 3.6),
+          ('B9V', 10700., 1.69, 2.75),
+          ('A0V', 9700., 1.57, 2.18),
+          ('A2V', 8840., 1.33, 2.05),
+          ('A5V', 8080., 1.12, 1.86),
+          ('A7V', 7750., 0.98, 1.74),
+          ('F0V', 7220., 0.76, 1.61),
+          ('F2V', 6810., 0.62, 1.46),
+          ('F5V', 6510., 0.51, 1.33),
+          ('F8V', 6170., 0.30, 1.18),
+          ('G0V', 5920., 0.12, 1.06),
+          ('G2V', 5770., 0.01, 1.00),
+          ('G5V', 5660., -0.10, 0.97),
+          ('G8V', 5490., -0.25, 0.94),
+          ('K0V', 5280., -0.36, 0.88),
+          ('K2V', 5040., -0.53, 0.80),
+          ('K3V', 4830., -0.64, 0.75),
+          ('K5V', 4450., -0.82, 0.69),
+          ('K7V', 4050., -1.03, 0.63),
+          ('M0V', 3850., -1.16, 0.57),
+          ('M1V', 3660., -1.35, 0.50),
+          ('M2V', 3560., -1.54, 0.44),
+          ('M3V', 3430., -1.80, 0.37),
+          ('M4V', 3210., -2.15, 0.23),
+          ('M5V', 3060., -2.52, 0.162),
+          ('M6V', 2810., -2.97, 0.102),
+          ('M7V', 2680., -3.15, 0.090),
+          ('M8V', 2570., -3.33, 0.082),
+          ('M9V', 2380., -3.55, 0.075)]
+
+# tabulated mass range [M_sun]
+MMIN = min(d[3] for d in DWARFS)
+MMAX = max(d[3] for d in DWARFS)
+
+# numeric spectral type: class offset plus subclass
+CLASSES = {'O': 0., 'B': 10., 'A': 20., 'F': 30., 'G': 40., 'K': 50., 'M': 60.}
+SPECTYPE = re.compile(r'^\s*([OBAFGKM])\s*(\d+(?:\.\d*)?)\s*(V|IV-V)?\s*$')
+
+# catalog columns of each star: luminosity, Teff, mass, spectral type
+STARS = [('LA', 'teffA', 'mA', 'sptA'), ('LB', 'teffB', 'mB', 'sptB')]
+
+# catalog columns complete() can derive
+DERIVED = [k for star in STARS for k in star[:3]]
+
+
+def _code(spt):
+    # numeric spectral type of a dwarf, nan if not recognized
+    if(isinstance(spt, bytes)):
+        spt = spt.decode()
+    m = SPECTYPE.match(str(spt).upper())
+    if(m is None):
+        return np.nan
+    return CLASSES[m.group(1)]+float(m.group(2))
+
+
+class MassTable:
+    """Main-sequence luminosity and effective temperature as functions
+    of mass, precomputed on a uniform log mass grid with linear
+    interpolation.
+
+    The table interpolates log L and log Teff of DWARFS linearly in
+    log mass. Resampling it on the grid moves the values by at most
+    `error` [dex] between the tabulated masses, below 1e-3 dex for the
+    default 8193 grid points. Masses outside [MMIN, MMAX] give nan.
+
+    Parameters:
+    -----------
+    n ... number of grid points
+    """
+
+    def __init__(self, n=8193):
+        m = np.log10([d[3] for d in DWARFS])[::-1]
+        logL = np.array([d[2] for d in DWARFS])[::-1]
+        logt = np.log10([d[1] for d in DWARFS])[::-1]
+
+        self.xmin = m[0]
+        self.xmax = m[-1]
+        self.h = (self.xmax-self.xmin)/(n-1)
+
+        grid = np.linspace(self.xmin, self.xmax, n)
+        self.values = [np.append(v, v[-1]) for v in (np.interp(grid, m, logL), np.interp(grid, m, logt))]
+        self.slopes = [np.append(np.diff(v), 0.) for v in self.values]
+
+        # largest deviation from the table interpolation, at the grid
+        # mid points and the tabulated masses (where the slope changes)
+        x = np.concatenate([grid[:-1]+self.h/2., m])
+        self.error = max(np.max(np.abs(v-np.interp(x, m, y)))
+                         for v, y in zip(self._log(10.**x), (logL, logt)))
+
+    def _log(self, mass):
+        x = (np.log10(mass)-self.xmin)/self.h
+        inside = (x >= 0) & (x <= len(self.values[0])-2)
+        i = np.where(inside, x, 0.).astype(np.intp)
+        f = x-i
+        return [np.where(inside, v[i]+f*s[i], np.nan) for v, s in zip(self.values, self.slopes)]
+
+    def __call__(self, mass):
+        """Main-sequence luminosity and effective temperature.
+
+        Parameters:
+        -----------
+        mass ... [M_sun] stellar mass
+
+        Returns:
+        -------
+        L    ... [L_sun] luminosity
+        teff ... [K] effective temperature
+        """
+        mass = np.asarray(mass, dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            logL, logt = self._log(mass)
+        return [10.**logL, 10.**logt]
+
+
+# tables built on first use, by number of grid points
+_tables = {}
+
+def table(n=8193):
+    """The MassTable with n grid points, built once and then reused."""
+    if(n not in _tables):
+        _tables[n] = MassTable(n)
+    return _tables[n]
+
+def mainsequence(mass):
+    """Luminosity and effective temperature of main-sequence stars.
+
+    Parameters:
+    -----------
+    mass ... [M_sun] stellar mass, between MMIN and MMAX
+
+    Returns:
+    -------
+    L    ... [L_sun] luminosity, nan outside the tabulated masses
+    teff ... [K] effective temperature, nan outside the tabulated masses
+    """
+    return table()(mass)
+
+def spectype(spt):
+    """Mass, luminosity and effective temperature of main-sequence
+    stars from their spectral types (e.g. 'G2V', 'K7', 'M4.5 V'),
+    interpolated linearly in subclass between the tabulated types.
+
+    Parameters:
+    -----------
+    spt  ... spectral type string or array of strings; missing
+             entries and types other than dwarfs between B0 and M9
+             give nan
+
+    Returns:
+    -------
+    mass ... [M_sun] stellar mass
+    L    ... [L_sun] luminosity
+    teff ... [K] effective temperature
+    """
+    spt = np.asarray(spt)
+    if(spt.dtype.kind == 'O'):
+        # missing entries (None, nan) of object columns
+        spt = np.array([s if isinstance(s, (str, bytes)) else '' for s in spt.ravel()]).reshape(spt.shape)
+    # catalogs repeat few spectral types, so parse each one only once
+    types, inverse = np.unique(spt.ravel(), return_inverse=True)
+    code = np.array([_code(s) for s in types.tolist()], dtype=float)[inverse].reshape(spt.shape)
+
+    codes = np.array([_code(d[0]) for d in DWARFS])
+    with np.errstate(invalid='ignore'):
+        inside = (code >= codes[0]) & (code <= codes[-1])
+    res = []
+    for y in (np.log10([d[3] for d in DWARFS]), [d[2] for d in DWARFS], np.log10([d[1] for d in DWARFS])):
+        res.append(np.where(inside, 10.**np.interp(code, codes, y), np.nan))
+    return res
+
+
+def _has(catalog, name):
+    names = getattr(getattr(catalog, 'dtype', None), 'names', None)
+    if(names is not None):
+        return name in names
+    return name in catalog
+
+def complete(catalog, cols, names=DERIVED, dtype=np.float64):
+    """Fill in luminosities, effective temperatures and masses that
+    are missing from a catalog (absent columns or nan entries) with
+    main-sequence values. Missing masses are taken from the spectral
+    types (columns sptA, sptB), luminosities and effective temperatures
+    from the masses; given values are kept.
+
+    Parameters:
+    ----------
+    catalog ... numpy structured array or dict of columns, the source
+                of the spectral types
+    cols    ... dict of the catalog columns already extracted, updated
+                with new arrays (the given arrays are not modified)
+    names   ... columns to complete
+    dtype   ... floating point type of the new columns
+
+    Returns:
+    -------
+    cols    ... the updated dict
+    """
+    for L, t, m, s in STARS:
+        want = [k for k in (m, L, t) if k in names]
+        if(not want):
+            continue
+
+        # masses, missing ones from the spectral types
+        mass = cols.get(m)
+        if(mass is None and _has(catalog, m)):
+            mass = np.asarray(catalog[m], dtype=float).ravel()
+        if(_has(catalog, s)):
+            smass = spectype(np.asarray(catalog[s]).ravel())[0]
+            mass = smass if mass is None else np.where(np.isnan(mass), smass, mass)
+
+        derived = {m: mass}
+        if(mass is not None):
+            derived[L], derived[t] = table()(mass)
+
+        for k in want:
+            if(k not in cols):
+                if(derived.get(k) is None):
+                    raise KeyError('Catalog column '+k+' is missing and cannot be derived.')
+                cols[k] = np.ascontiguousarray(derived[k], dtype=dtype)
+            elif(derived.get(k) is not None):
+                missing = np.isnan(cols[k])
+                if(np.any(missing)):
+                    cols[k] = np.where(missing, derived[k], cols[k]).astype(dtype)
+    return cols
@@ -0,0 +1,217 @@
+#!/bin/python
+import json
+import os
+import struct
+
+import numpy as np
+
+################################
+# Memory-mapped result store
+###############################
+
+__all__=['ResultStore']
+
+# columns of a result store
+SCHEMA = [('id', '<i8'),      # system id
+          ('hztype', '|S1'),  # binary star type, b'S' or b'P'
+          ('phzi', '<f8'),    # inner edge of the PHZ [au]
+          ('phzo', '<f8'),    # outer edge of the PHZ [au]
+          ('ahzi', '<f8'),    # inner edge of the AHZ [au]
+          ('ahzo', '<f8'),    # outer edge of the AHZ [au]
+          ('astab', '<f8'),   # stability limit [au]
+          ('flags', '|u1')]   # bitwise OR of the FLAGS below
+
+# flag bits
+FLAGS = {'valid': 1, 'phz': 2, 'ahz': 4}
+
+VERSION = 1
+
+# total size of the .npy headers, fixed so that they can be
+# rewritten in place when rows are appended
+HEADER = 128
+
+
+def _header(dtype, n):
+    d = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (dtype, n)
+    d = d.ljust(HEADER-11)+'\n'
+    return b'\x93NUMPY\x01\x00'+struct.pack('<H', len(d))+d.encode('latin1')
+
+def flags(res):
+    """Pack boolean result masks into the flags column.
+
+    Parameters:
+    ----------
+    res   ... dict with (some of) the boolean arrays valid, phz, ahz
+
+    Returns:
+    -------
+    flags ... uint8 array
+    """
+    n = len(next(iter(res.values())))
+    f = np.zeros(n, dtype=np.uint8)
+    for k, bit in FLAGS.items():
+        if(k in res):
+            f |= np.where(np.asarray(res[k], dtype=bool), bit, 0).astype(np.uint8)
+    return f
+
+
+class ResultStore:
+    """Columnar, append-only store of HZ results on disk.
+
+    A store is a directory with one .npy file per column of SCHEMA
+    and a schema.json file holding the number of committed rows.
+    Columns are memory mapped on access, so reopening a store and
+    reading row ranges does not load or parse the full data set.
+
+    Parameters:
+    ----------
+    path ... store directory
+    mode ... 'r' read only, 'a' read and append (created if missing)
+    """
+
+    def __init__(self, path, mode='r'):
+        if(mode not in ['r', 'a']):
+            raise ValueError('Mode not recognized. Choose "r" or "a".')
+
+        self.path = path
+        self.mode = mode
+        self._maps = {}
+
+        meta = os.path.join(path, 'schema.json')
+        if(not os.path.exists(meta)):
+            if(mode == 'r'):
+                raise FileNotFoundError('No result store at '+str(path))
+            os.makedirs(path, exist_ok=True)
+            for name, dtype in SCHEMA:
+                with open(self._file(name), 'wb') as f:
+                    f.write(_header(dtype, 0))
+            self._nrows = 0
+            self._commit()
+
+        with open(meta) as f:
+            self.meta = json.load(f)
+        if(self.meta['version'] != VERSION):
+            raise ValueError('Unsupported result store version '+str(self.meta['version']))
+        if([tuple(c) for c in self.meta['schema']] != SCHEMA):
+            raise ValueError('Result store at '+str(path)+' has a different schema.')
+        self._nrows = self.meta['nrows']
+
+    def _file(self, name):
+        return os.path.join(self.path, name+'.npy')
+
+    def _commit(self):
+        self.meta = {'version': VERSION, 'nrows': self._nrows,
+                     'schema': [list(c) for c in SCHEMA], 'flags': FLAGS}
+        tmp = os.path.join(self.path, 'schema.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, 'schema.json'))
+
+    def __len__(self):
+        return self._nrows
+
+    @property
+    def columns(self):
+        return [name for name, dtype in SCHEMA]
+
+    def column(self, name):
+        """Memory mapped, read-only view of one column."""
+        if(name not in self._maps):
+            if(self._nrows == 0):
+                return np.zeros(0, dtype=dict(SCHEMA)[name])
+            m = np.load(self._file(name), mmap_mode='r')
+            self._maps[name] = m[:self._nrows]
+        return self._maps[name]
+
+    def rows(self, start=0, stop=None):
+        """Memory mapped views of all columns for a row range.
+
+        Parameters:
+        ----------
+        start ... first row
+        stop  ... end of row range (exclusive), default all rows
+
+        Returns:
+        -------
+        rows  ... dict of read-only arrays
+        """
+        return self[start:stop]
+
+    def __getitem__(self, key):
+        if(isinstance(key, str)):
+            return self.column(key)
+        if(isinstance(key, slice)):
+            return {name: self.column(name)[key] for name in self.columns}
+        raise TypeError('Index the store with a column name or a row slice.')
+
+    def append(self, res, hztype=None, ids=None):
+        """Append rows to the store.
+
+        Parameters:
+        ----------
+        res    ... dict of result columns, e.g. from batch.hzS/hzP;
+                   the boolean masks valid, phz, ahz are packed into
+                   flags if no flags column is given
+        hztype ... binary star type 'S' or 'P' for all rows, if res
+                   has no hztype column
+        ids    ... system ids, if res has no id column; defaults to
+                   consecutive row numbers
+
+        Returns:
+        -------
+        n      ... number of rows appended
+        """
+        if(self.mode != 'a'):
+            raise IOError('Result store is opened read only.')
+
+        n = len(res['phzi'])
+        cols = dict(res)
+        if('id' not in cols):
+            cols['id'] = np.arange(self._nrows, self._nrows+n) if ids is None else ids
+        if('hztype' not in cols):
+            if(hztype not in ['S', 'P']):
+                raise ValueError('Binary star type not recognized. \
+                                      Choose "S" or "P".')
+            cols['hztype'] = np.full(n, hztype, dtype='S1')
+        if('flags' not in cols):
+            cols['flags'] = flags(res)
+
+        data = {}
+        for name, dtype in SCHEMA:
+            if(name not in cols):
+                raise ValueError('Result column '+name+' is missing.')
+            x = np.asarray(cols[name], dtype=dtype)
+            if(x.shape not in [(), (n,)]):
+                raise ValueError('Result column '+name+' has shape '+str(x.shape)+', expected ('+str(n)+',).')
+            data[name] = np.ascontiguousarray(np.broadcast_to(x, (n,)))
+
+        # write data first, then the headers and finally commit the row count
+        for name, dtype in SCHEMA:
+            with open(self._file(name), 'r+b') as f:
+                f.seek(HEADER+self._nrows*np.dtype(dtype).itemsize)
+                f.write(data[name].tobytes())
+                f.truncate()
+                f.seek(0)
+                f.write(_header(dtype, self._nrows+n))
+
+        self._nrows += n
+        self._commit()
+        self._maps = {}
+        return n
+
+    def extend(self, results, hztype=None):
+        """Append a stream of result chunks, e.g. from pipeline.evaluate.
+
+        Parameters:
+        ----------
+        results ... iterable of dicts of result columns
+        hztype  ... binary star type 'S' or 'P'
+
+        Returns:
+        -------
+        n       ... number of rows appended
+        """
+        n = 0
+        for res in results:
+            n += self.append(res, hztype)
+        return n
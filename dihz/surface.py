@@ -0,0 +1,312 @@
+#!/bin/python
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from .seff import *
+from .seff import teffsun
+from . import circumbinary
+from . import circumstellar
+from . import stability
+from . import semianalytic
+
+################################
+# Dimensionless habitable zone surfaces
+###############################
+# Every HZ edge has the form  edge = s*g(lam, x, eb, mu)  with
+#   s   = sqrt(A), the single star HZ edge of the primary [au]
+#   lam = B/A, the S_eff weighted luminosity ratio of the stars
+#   x   = ab/s, the binary semimajor axis in units of s
+# where A = LA/S_eff,A and B = LB/S_eff,B are taken at the limit of
+# the edge (Runaway Greenhouse for inner, Maximum Greenhouse for outer
+# edges). S-type edges do not depend on mu. The functions g are tabulated
+# on a grid that is uniform in log10(lam), log10(x), eb and mu, and
+# interpolated multilinearly.
+
+__all__=['HZSurface']
+
+EDGES = ['phzi', 'phzo', 'ahzi', 'ahzo']
+AXES = ['lam', 'x', 'eb', 'mu']
+LOGAXES = ['lam', 'x']
+
+# default axis ranges and numbers of grid points
+LAM = (1e-4, 10., 41)
+XP = (1e-3, 1., 61)
+XS = (1., 1e3, 61)
+EB = (0., 0.9, 19)
+MU = (0., 1., 21)
+
+# semianalytic residual of every edge
+RESIDUALS = {'P': {'phzi': 'phziP', 'phzo': 'phzoP', 'ahzi': 'ahziP', 'ahzo': 'ahzoP'},
+             'S': {'phzi': 'phziS', 'phzo': 'phzoS', 'ahzi': 'ahziS', 'ahzo': 'ahzoS'}}
+
+
+def _terms(hztype, method, edge):
+    # names of the A and B terms (see semianalytic.termsP/S) of an edge
+    if(method == 'semianalytic'):
+        return semianalytic.RESIDUALS[RESIDUALS[hztype][edge]][2][:2]
+    return ('AI', 'BI') if edge[-1] == 'i' else ('AO', 'BO')
+
+def _exact(hztype, method, lam, x, eb, mu):
+    # dimensionless edges g for arrays of grid points
+    mA, mB = 1.-mu, mu
+    res = {}
+    with np.errstate(all='ignore'):
+        if(method == 'semianalytic'):
+            terms = semianalytic.termsP if hztype == 'P' else semianalytic.termsS
+            one = np.ones_like(lam)
+            if(hztype == 'P'):
+                t = terms(one, teffsun, mA, lam, teffsun, mB, x, eb)
+            else:
+                t = terms(one, teffsun, lam, teffsun, x, eb)
+            for edge in EDGES:
+                a, b = _terms(hztype, method, edge)
+                t[a], t[b] = one, lam
+                g, conv = semianalytic._solve(RESIDUALS[hztype][edge], t)
+                res[edge] = np.where(conv, g, np.nan)
+            return res
+
+        # primary luminosity such that A = 1 at the inner / outer limit
+        si, so = seffio(teffsun)
+        for L, k in [(si, 0), (so, 1)]:
+            if(hztype == 'P'):
+                p = circumbinary.PHZ(L, teffsun, mA, lam*L, teffsun, mB, x, eb)
+                a = circumbinary.AHZ(L, teffsun, mA, lam*L, teffsun, mB, x, eb)
+            else:
+                p = circumstellar.PHZ(L, teffsun, lam*L, teffsun, x, eb)
+                a = circumstellar.AHZ(L, teffsun, lam*L, teffsun, x, eb)
+            res[EDGES[k]] = p[k]
+            res[EDGES[2+k]] = a[k]
+    return res
+
+def _slab(job):
+    hztype, method, axes, start, stop = job
+    lam = axes['lam'][start:stop]
+    grid = np.meshgrid(lam, axes['x'], axes['eb'], axes['mu'], indexing='ij')
+    res = _exact(hztype, method, *[g.ravel() for g in grid])
+    return {k: v.reshape(grid[0].shape) for k, v in res.items()}
+
+def _axis(name, spec):
+    lo, hi, n = spec
+    if(name in LOGAXES):
+        return np.logspace(np.log10(lo), np.log10(hi), int(n))
+    return np.linspace(lo, hi, int(n))
+
+
+class HZSurface:
+    """Tabulated dimensionless habitable zone edges for fast
+    approximate evaluation of the analytic or semianalytic PHZ and
+    AHZ of many systems.
+
+    Use HZSurface.build() to compute a table and load() to read a
+    saved one. The interpolation error is estimated by comparing with
+    the exact edges at random points of the table range with a positive
+    exact edge; the relative error quantiles are stored per edge in
+    `error` (keys median, p90, p99, max, and missing, the fraction of
+    these points without an interpolated value). The tails come from
+    the poles of the edge formulae close to the binary, i.e. at the
+    largest x of P-type and the smallest x of S-type tables, where no
+    stable HZ exists. For systems with stable habitable zones the
+    relative error of the default tables is typically about 0.2% and
+    below 1% (see tests/test_surface.py). Queries outside the table
+    range, and cells next to grid points without a HZ edge, return nan.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' or 'P'
+    method ... 'analytic' or 'semianalytic'
+    axes   ... dict of axis arrays lam, x, eb, mu
+    tables ... dict of arrays g for phzi, phzo, ahzi, ahzo,
+               of shape (len(lam), len(x), len(eb), len(mu))
+    error  ... dict of error estimates per edge
+    """
+
+    def __init__(self, hztype, method, axes, tables, error=None):
+        self.hztype = hztype
+        self.method = method
+        self.axes = {k: np.asarray(axes[k], dtype=float) for k in AXES}
+        self.tables = tables
+        self.error = error or {}
+
+        # uniform grids in log10(lam), log10(x), eb and mu
+        self._u = {}
+        for k in AXES:
+            u = np.log10(self.axes[k]) if k in LOGAXES else self.axes[k]
+            h = (u[-1]-u[0])/(len(u)-1) if len(u) > 1 else 1.
+            self._u[k] = (u[0], h, len(u))
+
+    @classmethod
+    def build(cls, hztype='P', method='analytic', lam=LAM, x=None, eb=EB, mu=MU,
+              workers=None, nvalidate=20000, seed=0):
+        """Compute a table.
+
+        Parameters:
+        ----------
+        hztype    ... binary star type, 'S' or 'P'
+        method    ... 'analytic' or 'semianalytic'
+        lam       ... (min, max, n) of the luminosity ratio axis
+        x         ... (min, max, n) of the ab/s axis, default XP or XS
+        eb        ... (min, max, n) of the eccentricity axis
+        mu        ... (min, max, n) of the mass ratio axis,
+                      ignored for S-type systems
+        workers   ... number of worker processes, default os.cpu_count(),
+                      1 computes the table in this process
+        nvalidate ... number of random points for the error estimate
+        seed      ... seed of the validation points
+
+        Returns:
+        -------
+        surface   ... HZSurface
+        """
+        if(hztype not in ['S', 'P']):
+            raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+        if(method not in ['analytic', 'semianalytic']):
+            raise ValueError('Method not recognized. \
+                              Choose "analytic" or "semianalytic".')
+        if(x is None):
+            x = XP if hztype == 'P' else XS
+        if(hztype == 'S'):
+            mu = (0., 0., 1)
+        axes = {k: _axis(k, s) for k, s in zip(AXES, [lam, x, eb, mu])}
+
+        nlam = len(axes['lam'])
+        workers = workers or os.cpu_count() or 1
+        step = max(1, -(-nlam//(4*workers)))
+        jobs = [(hztype, method, axes, i, min(i+step, nlam)) for i in range(0, nlam, step)]
+        if(workers == 1):
+            slabs = [_slab(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                slabs = list(pool.map(_slab, jobs))
+        tables = {k: np.concatenate([s[k] for s in slabs]) for k in EDGES}
+
+        surface = cls(hztype, method, axes, tables)
+        if(nvalidate):
+            surface.validate(nvalidate, seed)
+        return surface
+
+    def _interp(self, table, coords):
+        # multilinear interpolation, nan outside the table
+        n = len(coords[0])
+        idx, frac = [], []
+        inside = np.ones(n, dtype=bool)
+        for k, c in zip(AXES, coords):
+            u0, h, m = self._u[k]
+            with np.errstate(all='ignore'):
+                u = (np.log10(c) if k in LOGAXES else c)-u0
+                if(m == 1):
+                    inside &= np.abs(u) <= 1e-12
+                    idx.append(np.zeros(n, dtype=np.intp))
+                    frac.append(None)
+                    continue
+                t = u/h
+                inside &= (t >= 0) & (t <= m-1)
+                i = np.clip(np.where(inside, t, 0.), 0, m-2).astype(np.intp)
+            idx.append(i)
+            frac.append(t-i)
+
+        out = np.zeros(n)
+        dims = [d for d in range(len(AXES)) if frac[d] is not None]
+        for corner in range(2**len(dims)):
+            j = list(idx)
+            w = np.ones(n)
+            for b, d in enumerate(dims):
+                if((corner >> b) & 1):
+                    j[d] = idx[d]+1
+                    w *= frac[d]
+                else:
+                    w *= 1.-frac[d]
+            out += w*table[tuple(j)]
+        out[~inside] = np.nan
+        return out
+
+    def coords(self, LA, teffA, mA, LB, teffB, mB, ab, eb):
+        """Scale s and dimensionless coordinates (lam, x, eb, mu) of
+        every edge for a set of systems, dict of edge -> (s, coords)."""
+        with np.errstate(all='ignore'):
+            siA, soA = seffio(teffA)
+            siB, soB = seffio(teffB)
+            t = {'AI': LA/siA, 'BI': LB/siB, 'AO': LA/soA, 'BO': LB/soB}
+            t['BIo'] = t['BO']
+            mu = np.zeros_like(t['AI']) if self.hztype == 'S' else mB/(mA+mB)
+            res = {}
+            for edge in EDGES:
+                a, b = _terms(self.hztype, self.method, edge)
+                s = np.sqrt(t[a])
+                res[edge] = (s, [t[b]/t[a], ab/s, eb+0.*s, mu+0.*s])
+        return res
+
+    def __call__(self, LA, teffA, mA, LB, teffB, mB, ab, eb):
+        """Interpolated habitable zone edges and the exact stability
+        limit, in the order of the batch kernels.
+
+        Parameters:
+        ----------
+        LA, teffA, mA, LB, teffB, mB, ab, eb ... scalars or arrays,
+                     see circumbinary.PHZ
+
+        Returns:
+        -------
+        phzi, phzo, ahzi, ahzo, astab ... arrays [au]
+        """
+        p = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in
+                                  [LA, teffA, mA, LB, teffB, mB, ab, eb]])
+        shape = p[0].shape
+        LA, teffA, mA, LB, teffB, mB, ab, eb = [v.ravel() for v in p]
+
+        res = []
+        for edge, (s, c) in self.coords(LA, teffA, mA, LB, teffB, mB, ab, eb).items():
+            res.append(s*self._interp(self.tables[edge], c))
+        with np.errstate(all='ignore'):
+            if(self.hztype == 'P'):
+                res.append(stability.hw99P(mA, mB, ab, eb))
+            else:
+                res.append(stability.hw99S(mA, mB, ab, eb))
+        return [np.reshape(v, shape)[()] for v in res]
+
+    def validate(self, n=20000, seed=0):
+        """Estimate the interpolation error at n random points of the
+        table range and store it in `error`."""
+        rng = np.random.default_rng(seed)
+        c = []
+        for k in AXES:
+            a = self.axes[k]
+            if(k in LOGAXES):
+                c.append(10.**rng.uniform(np.log10(a[0]), np.log10(a[-1]), n))
+            else:
+                c.append(rng.uniform(a[0], a[-1], n))
+        exact = _exact(self.hztype, self.method, *c)
+
+        for edge in EDGES:
+            approx = self._interp(self.tables[edge], c)
+            with np.errstate(invalid='ignore'):
+                ok = np.isfinite(exact[edge]) & (exact[edge] > 0)
+            both = ok & np.isfinite(approx)
+            with np.errstate(all='ignore'):
+                rel = np.abs(approx[both]/exact[edge][both]-1.)
+            q = np.quantile(rel, [0.5, 0.9, 0.99, 1.]) if rel.size else [np.nan]*4
+            self.error[edge] = {'median': float(q[0]), 'p90': float(q[1]),
+                                'p99': float(q[2]), 'max': float(q[3]),
+                                'missing': float(1.-both.sum()/max(ok.sum(), 1))}
+        return self.error
+
+    def save(self, path):
+        """Write the surface to a directory with one .npy file per edge."""
+        os.makedirs(path, exist_ok=True)
+        for edge in EDGES:
+            np.save(os.path.join(path, edge+'.npy'), self.tables[edge])
+        meta = {'hztype': self.hztype, 'method': self.method,
+                'axes': {k: v.tolist() for k, v in self.axes.items()}, 'error': self.error}
+        with open(os.path.join(path, 'surface.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Read a surface written by save(), memory mapped by default."""
+        with open(os.path.join(path, 'surface.json')) as f:
+            meta = json.load(f)
+        tables = {edge: np.load(os.path.join(path, edge+'.npy'), mmap_mode=mmap_mode)
+                  for edge in EDGES}
+        return cls(meta['hztype'], meta['method'], meta['axes'], tables, meta['error'])
@@ -0,0 +1,127 @@
+#!/bin/python
+import os
+
+import numpy as np
+from . import circumbinary
+from . import circumstellar
+from . import stability
+
+################################
+# Parameter space sweeps
+###############################
+
+__all__=['hzmap']
+
+# default number of grid points evaluated at once
+TILE = 2**18
+
+# names of the result cubes
+RESULTS = ['phzi', 'phzo', 'ahzi', 'ahzo', 'astab']
+FLAGS = ['phz', 'ahz', 'phzstable', 'ahzstable']
+
+
+def _edges(hztype, LA, teffA, LB, teffB, mA, mB, ab, eb):
+    if(hztype == 'P'):
+        [phzi, phzo] = circumbinary.PHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+        [ahzi, ahzo] = circumbinary.AHZ(LA, teffA, mA, LB, teffB, mB, ab, eb)
+        astab = stability.hw99P(mA, mB, ab, eb)
+    else:
+        [phzi, phzo] = circumstellar.PHZ(LA, teffA, LB, teffB, ab, eb)
+        [ahzi, ahzo] = circumstellar.AHZ(LA, teffA, LB, teffB, ab, eb)
+        astab = stability.hw99S(mA, mB, ab, eb)
+    return [phzi, phzo, ahzi, ahzo, astab]
+
+def _stable(hztype, inner, outer, astab):
+    # circumbinary orbits are stable beyond, circumstellar ones within astab
+    if(hztype == 'P'):
+        return inner >= astab
+    return outer <= astab
+
+def _allocate(name, shape, dtype, outdir):
+    if(outdir is None):
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(outdir, name+'.npy'),
+                                     mode='w+', dtype=dtype, shape=shape)
+
+def hzmap(hztype, LA, teffA, LB, teffB, ab, eb, mu, mtot=1., tile=TILE, outdir=None):
+    """Habitable zones and stability limits on a grid of binary
+    semimajor axis, eccentricity and mass ratio for one stellar pair.
+
+    The grid is evaluated in tiles of at most `tile` points, so the
+    temporaries do not grow with the grid size. With `outdir` the
+    result cubes are memory mapped .npy files, so that sweeps larger
+    than the available RAM can be computed.
+
+    Parameters:
+    ----------
+    hztype ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    LA     ... luminosity of primary star [Lsun]
+    teffA  ... effective temperature of primary star [K]
+    LB     ... luminosity of secondary star [Lsun]
+    teffB  ... effective temperature of secondary star [K]
+    ab     ... axis of binary star orbit semimajor axes [au]
+    eb     ... axis of binary star orbit eccentricities
+    mu     ... axis of mass ratios mB/(mA+mB)
+    mtot   ... total mass of the binary mA+mB [Msun]; the habitable
+               zones and stability limits depend on mu only
+    tile   ... number of grid points evaluated at once
+    outdir ... directory for memory mapped result cubes, default in memory
+
+    Returns:
+    -------
+    res    ... dict with
+               dims       ... ('ab', 'eb', 'mu')
+               ab, eb, mu ... axis arrays
+               phzi, phzo ... inner and outer edge of the PHZ [au]
+               ahzi, ahzo ... inner and outer edge of the AHZ [au]
+               astab      ... stability limit [au]
+               phz, ahz   ... the PHZ / AHZ exists (0 < inner < outer)
+               phzstable  ... the PHZ exists and lies in the stable region
+               ahzstable  ... the AHZ exists and lies in the stable region
+               cubes have the shape (len(ab), len(eb), len(mu))
+    """
+    if(hztype not in ['S', 'P']):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+
+    axes = [np.atleast_1d(np.asarray(x, dtype=float)).ravel() for x in [ab, eb, mu]]
+    shape = tuple(len(x) for x in axes)
+    n = int(np.prod(shape))
+
+    if(outdir is not None):
+        os.makedirs(outdir, exist_ok=True)
+
+    res = {'dims': ('ab', 'eb', 'mu'), 'ab': axes[0], 'eb': axes[1], 'mu': axes[2]}
+    for name in RESULTS:
+        res[name] = _allocate(name, shape, float, outdir)
+    for name in FLAGS:
+        res[name] = _allocate(name, shape, bool, outdir)
+
+    flat = {name: res[name].reshape(-1) for name in RESULTS+FLAGS}
+
+    with np.errstate(all='ignore'):
+        for start in range(0, n, tile):
+            s = slice(start, min(start+tile, n))
+            i, j, k = np.unravel_index(np.arange(s.start, s.stop), shape)
+            abt, ebt, mut = axes[0][i], axes[1][j], axes[2][k]
+
+            mB = mut*mtot
+            mA = mtot-mB
+            [phzi, phzo, ahzi, ahzo, astab] = _edges(hztype, LA, teffA, LB, teffB,
+                                                     mA, mB, abt, ebt)
+
+            for name, x in zip(RESULTS, [phzi, phzo, ahzi, ahzo, astab]):
+                flat[name][s] = x
+
+            phz = (phzi > 0) & (phzo > phzi)
+            ahz = (ahzi > 0) & (ahzo > ahzi)
+            flat['phz'][s] = phz
+            flat['ahz'][s] = ahz
+            flat['phzstable'][s] = phz & _stable(hztype, phzi, phzo, astab)
+            flat['ahzstable'][s] = ahz & _stable(hztype, ahzi, ahzo, astab)
+
+    if(outdir is not None):
+        for name in RESULTS+FLAGS:
+            res[name].flush()
+
+    return res
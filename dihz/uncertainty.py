@@ -0,0 +1,244 @@
+#!/bin/python
+import numpy as np
+from . import batch
+
+################################
+# Monte Carlo uncertainty propagation
+###############################
+
+__all__=['StreamingQuantiles','montecarlo']
+
+# default maximum number of samples (systems x samples) per block
+BLOCK = 2**22
+
+# edges for which quantiles are estimated
+EDGES = batch.RESULTS
+
+# smallest sampled value of positive parameters
+TINY = 1e-12
+
+
+class StreamingQuantiles:
+    """Streaming quantile estimator for many independent sample
+    streams at once, based on fixed-size histograms.
+
+    The bin range of every stream is set from its first batch with
+    finite samples, widened by `pad` times their spread on either side.
+    When more than a fraction `maxout` of the samples would fall outside
+    the range, the range is doubled towards that side by merging pairs
+    of bins, so the range follows the samples however few the first
+    batch held. The remaining outliers go to under- and overflow bins,
+    whose quantiles are interpolated towards the running minimum and
+    maximum. Memory is n*(nbins+2) counts regardless of the number of
+    samples. Quantiles that fall inside the bin range are accurate to
+    one bin width, (hi-lo)/nbins. Non-finite samples are counted but
+    ignored.
+
+    Parameters:
+    ----------
+    n      ... number of streams
+    nbins  ... number of bins per stream, even
+    pad    ... relative widening of the initial sample range
+    maxout ... largest fraction of samples kept outside the bin range
+    """
+
+    def __init__(self, n, nbins=128, pad=0.5, maxout=0.001):
+        if(nbins % 2):
+            raise ValueError('Number of bins must be even.')
+        self.n = n
+        self.nbins = nbins
+        self.pad = pad
+        self.maxout = maxout
+        self.counts = np.zeros((n, nbins+2), dtype=np.int64)
+        self.nvalid = np.zeros(n, dtype=np.int64)
+        self.ntotal = 0
+        self.lo = np.zeros(n)
+        self.hi = np.zeros(n)
+        self.started = np.zeros(n, dtype=bool)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+
+    def _start(self, x, ok):
+        # bin range of the streams with their first finite samples
+        new = ~self.started & ok.any(axis=1)
+        if(not np.any(new)):
+            return
+        xmin = np.where(ok[new], x[new], np.inf).min(axis=1)
+        xmax = np.where(ok[new], x[new], -np.inf).max(axis=1)
+        spread = np.maximum(xmax-xmin, 1e-9*np.maximum(np.abs(xmin), 1.))
+        self.lo[new] = xmin-self.pad*spread
+        self.hi[new] = self.lo[new]+(1.+2.*self.pad)*spread
+        self.started |= new
+
+    def _widen(self, x, ok):
+        # double the range of streams with too many new samples outside,
+        # towards the side where more of them are
+        h = self.nbins//2
+        while(True):
+            with np.errstate(invalid='ignore'):
+                below = (ok & (x < self.lo[:, None])).sum(axis=1)
+                above = (ok & (x >= self.hi[:, None])).sum(axis=1)
+            grow = below+above > self.maxout*(self.nvalid+ok.sum(axis=1))
+            if(not np.any(grow)):
+                return
+            up = grow & (above >= below)
+            down = grow & ~up
+
+            c = self.counts[:, 1:-1]
+            pairs = c[:, 0::2]+c[:, 1::2]
+            width = self.hi-self.lo
+            if(np.any(up)):
+                c[up, :h] = pairs[up]
+                c[up, h:] = 0
+                self.hi[up] += width[up]
+            if(np.any(down)):
+                c[down, h:] = pairs[down]
+                c[down, :h] = 0
+                self.lo[down] -= width[down]
+
+    def update(self, x):
+        """Add samples, x has the shape (n, nsamples)."""
+        x = np.asarray(x, dtype=float).reshape(self.n, -1)
+        ok = np.isfinite(x)
+
+        self._start(x, ok)
+        self._widen(x, ok)
+
+        np.minimum(self.min, np.where(ok, x, np.inf).min(axis=1), out=self.min)
+        np.maximum(self.max, np.where(ok, x, -np.inf).max(axis=1), out=self.max)
+
+        width = (self.hi-self.lo)/self.nbins
+        with np.errstate(invalid='ignore', divide='ignore'):
+            b = np.floor((x-self.lo[:, None])/width[:, None])
+        b = np.clip(np.where(ok, b, -1), -1, self.nbins).astype(np.int64)+1
+
+        flat = (np.arange(self.n)[:, None]*(self.nbins+2)+b)[ok]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self.nvalid += ok.sum(axis=1)
+        self.ntotal += x.shape[1]
+
+    def quantile(self, q):
+        """Estimated quantiles, an array of shape (n, len(q)),
+        nan for streams without finite samples."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        res = np.full((self.n, len(q)), np.nan)
+
+        width = (self.hi-self.lo)/self.nbins
+        # bin boundaries: [min, lo, lo+width, ..., hi, max]
+        left = self.lo[:, None]+width[:, None]*np.arange(-1, self.nbins+1)
+        right = left+width[:, None]
+        left[:, 0] = np.minimum(self.min, self.lo)
+        right[:, 0] = self.lo
+        left[:, -1] = self.hi
+        right[:, -1] = np.maximum(self.max, self.hi)
+
+        cum = np.cumsum(self.counts, axis=1)
+        rows = np.arange(self.n)
+        for j, p in enumerate(q):
+            target = p*self.nvalid
+            k = np.minimum(np.argmax(cum >= target[:, None], axis=1), self.nbins+1)
+            below = np.where(k > 0, cum[rows, np.maximum(k-1, 0)], 0)
+            c = self.counts[rows, k]
+            f = np.where(c > 0, (target-below)/np.maximum(c, 1), 0.)
+            res[:, j] = np.where(self.nvalid > 0,
+                                 left[rows, k]+f*(right[rows, k]-left[rows, k]), np.nan)
+        return res
+
+
+def _draw(rng, c, sigma, names, nsamples):
+    s = {}
+    for k in names:
+        x = np.repeat(c[k][:, None], nsamples, axis=1)
+        if(k in sigma):
+            sd = np.broadcast_to(np.asarray(sigma[k], dtype=float), c[k].shape)
+            x += rng.standard_normal(x.shape)*sd[:, None]
+        if(k == 'eb'):
+            np.clip(x, 0., 1.-1e-6, out=x)
+        else:
+            np.maximum(x, TINY, out=x)
+        s[k] = x
+    return s
+
+def montecarlo(catalog, sigma, hztype='P', nsamples=1000, quantiles=(0.16, 0.5, 0.84),
+               ap=None, method='analytic', nbins=128, block=BLOCK, seed=None):
+    """Propagate parameter uncertainties to the habitable zone edges
+    and stability limits with Monte Carlo sampling.
+
+    Every system is sampled `nsamples` times from independent normal
+    distributions (clipped to L, m, teff, ab > 0 and 0 <= eb < 1).
+    Samples are evaluated in vectorized blocks of at most `block`
+    system-samples and reduced on the fly by streaming quantile
+    estimators and counters, so memory does not depend on nsamples.
+
+    Parameters:
+    ----------
+    catalog   ... numpy structured array or dict of columns with
+                  LA, teffA, mA, LB, teffB, mB, ab, eb
+    sigma     ... dict of standard deviations (scalars or per system arrays)
+                  for any of the catalog columns; missing columns are exact
+    hztype    ... binary star type, 'S' (circumstellar) or 'P' (circumbinary)
+    nsamples  ... number of samples per system
+    quantiles ... quantile levels to estimate
+    ap        ... planetary orbit distance(s) [au] for which the probability
+                  of lying in the PHZ/AHZ is estimated
+    method    ... 'analytic' or 'semianalytic' habitable zones
+    nbins     ... histogram bins per system and edge, see StreamingQuantiles
+    block     ... maximum number of system-samples evaluated at once
+    seed      ... seed of the random number generator
+
+    Returns:
+    -------
+    res       ... dict with
+                  quantiles                   ... quantile levels
+                  phzi, phzo, ahzi, ahzo, astab ... arrays (nsystems, nquantiles) [au]
+                  pphz, pahz ... probability that ap lies in the PHZ / AHZ
+                  pphzstable, pahzstable ... same, and within the stable region
+                  (the probabilities only if ap is given)
+    """
+    if(hztype not in ['S', 'P']):
+        raise ValueError('Binary star type not recognized. \
+                              Choose "S" or "P".')
+    kernel = batch._kernel(hztype, method)
+    names = batch.COLUMNSP if hztype == 'P' else batch.COLUMNSS
+
+    c = batch.columns(catalog, names)
+    n = len(c[names[0]])
+    rng = np.random.default_rng(seed)
+
+    if(ap is not None):
+        ap = np.broadcast_to(np.asarray(ap, dtype=float), (n,))[:, None]
+        hits = {k: np.zeros(n, dtype=np.int64) for k in ['pphz', 'pahz', 'pphzstable', 'pahzstable']}
+
+    est = {k: StreamingQuantiles(n, nbins) for k in EDGES}
+
+    # at least 5 samples per system in the first block to set the bin ranges
+    per = max(min(nsamples, block//max(n, 1)), min(nsamples, 5))
+    done = 0
+    with np.errstate(all='ignore'):
+        while(done < nsamples):
+            m = min(per, nsamples-done)
+            s = _draw(rng, c, sigma, names, m)
+            edges = kernel(*[s[k].ravel() for k in names])
+            edges = [np.broadcast_to(x, (n*m,)).reshape(n, m) for x in edges]
+
+            for k, x in zip(EDGES, edges):
+                est[k].update(x)
+
+            if(ap is not None):
+                phzi, phzo, ahzi, ahzo, astab = edges
+                stable = ap >= astab if hztype == 'P' else ap <= astab
+                inphz = (phzi <= ap) & (ap <= phzo)
+                inahz = (ahzi <= ap) & (ap <= ahzo)
+                hits['pphz'] += inphz.sum(axis=1)
+                hits['pahz'] += inahz.sum(axis=1)
+                hits['pphzstable'] += (inphz & stable).sum(axis=1)
+                hits['pahzstable'] += (inahz & stable).sum(axis=1)
+            done += m
+
+    res = {'quantiles': np.asarray(quantiles, dtype=float)}
+    for k in EDGES:
+        res[k] = est[k].quantile(quantiles)
+    if(ap is not None):
+        for k, h in hits.items():
+            res[k] = h/nsamples
+    return res
@@ -0,0 +1,62 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from dihz import batch, circumbinary, circumstellar, semianalytic, stability
+
+
+def catalog(n, hztype='P', seed=0):
+    rng = np.random.default_rng(seed)
+    cat = np.zeros(n, dtype=[(k, 'f8') for k in batch.COLUMNSP])
+    for k, (lo, hi) in zip(batch.COLUMNSP, [(0.5, 2.), (4500., 6500.), (0.7, 1.3), (0.05, 0.5),
+                                            (3500., 5500.), (0.3, 0.7), (0.05, 0.3), (0., 0.5)]):
+        cat[k] = rng.uniform(lo, hi, n)
+    if(hztype == 'S'):
+        cat['ab'] *= 150.
+    return cat
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+@pytest.mark.parametrize('method', ['analytic', 'semianalytic'])
+def test_rows_match_scalar_calls(hztype, method):
+    cat = catalog(40, hztype)
+    cat['eb'][7] = 1.5
+    hz = batch.hzP if hztype == 'P' else batch.hzS
+    res = hz(cat, block=16, method=method)
+    for i, row in enumerate(cat):
+        p = [float(row[k]) for k in batch.COLUMNSP]
+        if(i == 7):
+            assert not res['valid'][i] and np.isnan(res['phzi'][i])
+            continue
+        s = p[:2]+p[3:5]+p[6:]
+        if(method == 'analytic'):
+            ref = circumbinary.PHZ(*p)+circumbinary.AHZ(*p) if hztype == 'P' else \
+                circumstellar.PHZ(*s)+circumstellar.AHZ(*s)
+        else:
+            ref = semianalytic.PHZ_P(*p)+semianalytic.AHZ_P(*p) if hztype == 'P' else \
+                semianalytic.PHZ_S(*s)+semianalytic.AHZ_S(*s)
+        ref.append(stability.stabilityLimit(hztype, p[2], p[5], p[6], p[7]))
+        assert np.allclose([res[k][i] for k in batch.RESULTS], ref, rtol=1e-12, atol=0.)
+        assert res['valid'][i]
+        assert res['phz'][i] == (0 < ref[0] < ref[1])
+        assert res['ahz'][i] == (0 < ref[2] < ref[3])
+
+
+def test_block_temporaries():
+    # apart from the results only block sized arrays are allocated
+    n, block = 200000, 4096
+    cat = catalog(n)
+    tracemalloc.start()
+    res = batch.hzP(cat, block=block)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results = sum(v.nbytes for v in res.values())
+    assert peak < results+200*block*8
+
+
+def test_unequal_columns():
+    cat = {k: np.ones(5) for k in batch.COLUMNSP}
+    cat['eb'] = np.zeros(4)
+    with pytest.raises(ValueError):
+        batch.hzP(cat)
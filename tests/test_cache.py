@@ -0,0 +1,52 @@
+import numpy as np
+
+from dihz import batch
+from dihz.cache import HZCache
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'ab': rng.uniform(0.05, 0.3, n), 'eb': rng.uniform(0., 0.5, n)}
+
+
+def test_miss_matches_uncached():
+    cat = catalog(500)
+    ref = batch.hzP(cat)
+    cache = HZCache(digits=4)
+    for res in (cache.query(cat), cache.query(cat)):
+        for k in batch.RESULTS+batch.FLAGS:
+            assert np.array_equal(res[k], ref[k], equal_nan=True)
+    assert cache.stats()['hits'] == 500
+
+
+def test_rounded_key():
+    cat = catalog(10)
+    cache = HZCache(digits=6)
+    first = cache.query(cat)
+    near = {k: v*(1.+1e-9) for k, v in cat.items()}
+    res = cache.query(near)
+    assert cache.hits == 10
+    assert np.array_equal(res['phzi'], first['phzi'])
+
+
+def test_nan_parameters_hit(tmp_path):
+    cat = catalog(5)
+    cat['LA'][1] = np.nan
+    cat['eb'][3] = np.nan
+    cache = HZCache(path=str(tmp_path/'cache.npz'))
+    ref = batch.hzP(cat)
+    cache.query(cat)
+    res = cache.query(cat)
+    assert cache.hits == 5
+    assert not res['valid'][3]
+    for k in batch.RESULTS:
+        assert np.array_equal(res[k], ref[k], equal_nan=True)
+
+    # nan keys survive saving and loading
+    cache.save()
+    loaded = HZCache(path=cache.path)
+    loaded.query(cat)
+    assert loaded.hits == 5
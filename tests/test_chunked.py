@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+import pytest
+
+from dihz import batch, chunked
+from dihz.chunked import NpyChunks
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cat = np.zeros(n, dtype=[('id', 'i8')]+[(k, 'f8') for k in batch.COLUMNSP])
+    cat['id'] = np.arange(n)
+    for k, (lo, hi) in zip(batch.COLUMNSP, [(0.5, 2.), (4500., 6500.), (0.7, 1.3), (0.05, 0.5),
+                                            (3500., 5500.), (0.3, 0.7), (0.05, 0.3), (0., 0.5)]):
+        cat[k] = rng.uniform(lo, hi, n)
+    return cat
+
+def equal(res, ref, rows=slice(None)):
+    for k in batch.RESULTS+batch.FLAGS:
+        assert np.array_equal(np.asarray(res[k])[rows], ref[k], equal_nan=True)
+
+def prefetching():
+    return [t for t in threading.enumerate() if t.name == 'dihz-prefetch']
+
+
+def test_npychunks(tmp_path):
+    cat = catalog(250)
+    store = NpyChunks(str(tmp_path/'cat'), 'w')
+    for start in range(0, 250, 100):
+        store.append(cat[start:start+100])
+    store = NpyChunks(str(tmp_path/'cat'))
+    assert store.shape == (250,) and len(store) == 250 and store.chunks == (100,)
+    assert store.bounds == [(0, 100), (100, 200), (200, 250)]
+    assert np.array_equal(store[50:230], cat[50:230])
+    assert np.array_equal(store['ab'], cat['ab'])
+    assert len(store[240:240]) == 0
+
+    with pytest.raises(ValueError):
+        store[::2]
+    with pytest.raises(TypeError):
+        store[3]
+    with pytest.raises(IOError):
+        store.append(cat)
+    with pytest.raises(FileExistsError):
+        NpyChunks(str(tmp_path/'cat'), 'w')
+    with pytest.raises(FileNotFoundError):
+        NpyChunks(str(tmp_path/'missing'))
+    with pytest.raises(ValueError):
+        NpyChunks(str(tmp_path/'cat'), 'a')
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_chunks(prefetch):
+    cat = catalog(1000)
+    parts = list(chunked.chunks(cat, names=['ab', 'eb'], chunksize=300, prefetch=prefetch))
+    assert [(a, b) for a, b, c in parts] == [(0, 300), (300, 600), (600, 900), (900, 1000)]
+    assert np.array_equal(np.concatenate([c['eb'] for a, b, c in parts]), cat['eb'])
+    assert not prefetching()
+
+
+def test_run_dict():
+    cat = catalog(1000)
+    cols = {k: cat[k] for k in cat.dtype.names}
+    sink = {}
+    assert chunked.run(cols, sink, chunksize=300, keep=['id'], block=128) == 1000
+    equal(sink, batch.hzP(cat))
+    assert np.array_equal(sink['id'], cat['id'])
+
+
+def test_run_npychunks(tmp_path):
+    cat = catalog(1000)
+    src = NpyChunks(str(tmp_path/'cat'), 'w')
+    for start in range(0, 1000, 100):
+        src.append(cat[start:start+100])
+    # chunksize groups whole files
+    assert chunked.run(src, str(tmp_path/'res'), hztype='S', chunksize=300) == 1000
+    res = NpyChunks(str(tmp_path/'res'))
+    assert res.bounds == [(0, 300), (300, 600), (600, 900), (900, 1000)]
+    equal(res[:], batch.hzS(cat))
+    with pytest.raises(ValueError):
+        chunked.run(src, {}, hztype='X')
+
+
+def test_prefetch_stops_early():
+    cat = catalog(2000)
+    gen = chunked.chunks(cat, chunksize=100, prefetch=2)
+    next(gen)
+    gen.close()
+    assert not prefetching()
+
+
+class Failing(dict):
+    # column source whose third chunk cannot be read
+    def __getitem__(self, key):
+        col = dict.__getitem__(self, key)
+        return Failing.Column(col)
+
+    class Column:
+        def __init__(self, col):
+            self.col = col
+            self.shape = col.shape
+
+        def __getitem__(self, s):
+            if(s.start >= 200):
+                raise OSError('read error')
+            return self.col[s]
+
+
+@pytest.mark.parametrize('prefetch', [0, 2])
+def test_read_error(prefetch):
+    cat = catalog(500)
+    source = Failing({k: cat[k] for k in batch.COLUMNSP})
+    sink = {}
+    with pytest.raises(OSError):
+        chunked.run(source, sink, chunksize=100, prefetch=prefetch)
+    equal(sink, batch.hzP(cat[:200]), slice(0, 200))
+    assert not prefetching()
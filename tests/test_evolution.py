@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, stability
+from dihz.evolution import chz, tracks
+
+
+def system(nsys, nage, hztype, seed=0):
+    rng = np.random.default_rng(seed)
+    grow = np.linspace(1., 2., nage)
+    ab = rng.uniform(0.05, 0.3, nsys) if hztype == 'P' else rng.uniform(20., 50., nsys)
+    return {'LA': rng.uniform(0.5, 1.5, (nsys, 1))*grow, 'teffA': rng.uniform(5000., 6000., (nsys, 1))*grow**-0.1,
+            'mA': rng.uniform(0.8, 1.2, nsys), 'LB': rng.uniform(0.05, 0.3, (nsys, 1))*grow,
+            'teffB': rng.uniform(3500., 4500., (nsys, 1))*np.ones(nage), 'mB': rng.uniform(0.3, 0.6, nsys),
+            'ab': ab, 'eb': rng.uniform(0., 0.5, nsys)}
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+def test_tracks_match_per_age(hztype):
+    s = system(20, 15, hztype)
+    res = tracks(hztype, **s)
+    assert res['phzi'].shape == (20, 15)
+    for j in range(15):
+        star = [s[k][:, j] for k in ['LA', 'teffA']], [s[k][:, j] for k in ['LB', 'teffB']]
+        if(hztype == 'P'):
+            p = star[0]+[s['mA']]+star[1]+[s['mB'], s['ab'], s['eb']]
+            ref = circumbinary.PHZ(*p)+circumbinary.AHZ(*p)
+        else:
+            p = star[0]+star[1]+[s['ab'], s['eb']]
+            ref = circumstellar.PHZ(*p)+circumstellar.AHZ(*p)
+        for k, r in zip(['phzi', 'phzo', 'ahzi', 'ahzo'], ref):
+            assert np.allclose(res[k][:, j], r, rtol=1e-12, atol=0.)
+    astab = stability.stabilityLimit(hztype, s['mA'], s['mB'], s['ab'], s['eb'])
+    assert np.allclose(res['astab'], astab, rtol=1e-12)
+
+
+def brute(ages, inner, outer, window):
+    lo = np.full(inner.shape, np.nan)
+    hi = np.full(inner.shape, np.nan)
+    for i, t in enumerate(ages):
+        if(t+window > ages[-1]):
+            continue
+        sel = (ages >= t) & (ages <= t+window)
+        a, b = inner[:, sel].max(axis=1), outer[:, sel].min(axis=1)
+        ok = (a > 0) & (b >= a)
+        lo[ok, i], hi[ok, i] = a[ok], b[ok]
+    return lo, hi
+
+
+@pytest.mark.parametrize('window', [0., 0.7, 2.5, 9.])
+def test_chz_matches_brute_force(window):
+    rng = np.random.default_rng(1)
+    ages = np.cumsum(rng.uniform(0.1, 0.5, 40))
+    res = {'phzi': rng.uniform(0.5, 1., (30, 40)), 'phzo': rng.uniform(1., 1.6, (30, 40))}
+    res['phzi'][3, 5] = np.nan
+    lo, hi = chz(ages, res, window=window)
+    ref = brute(ages, res['phzi'], res['phzo'], window)
+    assert np.array_equal(lo, ref[0], equal_nan=True)
+    assert np.array_equal(hi, ref[1], equal_nan=True)
+
+
+def test_chz_all_ages():
+    s = system(10, 30, 'P')
+    res = tracks('P', **s)
+    lo, hi = chz(None, res, 'ahz')
+    ok = np.isfinite(lo)
+    assert np.array_equal(lo[ok], res['ahzi'].max(axis=1)[ok])
+    assert np.array_equal(hi[ok], res['ahzo'].min(axis=1)[ok])
+
+
+def test_chz_errors():
+    res = {'phzi': np.ones((2, 3)), 'phzo': np.full((2, 3), 2.)}
+    with pytest.raises(ValueError):
+        chz([1., 2., 3.], res, window=-1.)
+    with pytest.raises(ValueError):
+        chz([1., 3., 2.], res, window=1.)
+    with pytest.raises(ValueError):
+        chz([1., 2., 3.], res, zone='xhz')
+    with pytest.raises(ValueError):
+        tracks('X', 1., 5000., 1., 0.1, 4000., 0.5, 0.2, 0.1)
@@ -0,0 +1,49 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+import dihz
+
+
+def module(name):
+    try:
+        return importlib.import_module('dihz.'+name)
+    except ImportError as e:
+        pytest.skip('dihz.'+name+' needs '+str(e.name))
+
+
+def test_submodules():
+    for name, names in dihz._exports:
+        assert name in dihz._submodules
+    assert sorted(dihz._submodules) == sorted(set(dihz._submodules))
+
+
+@pytest.mark.parametrize('name, names', dihz._exports)
+def test_exports_match_all(name, names):
+    assert names == list(module(name).__all__)
+    exported = dir(dihz)
+    assert name in exported
+    for k in names:
+        assert k in exported
+        assert k in dihz.__all__
+        # later modules take precedence
+        origin = [m for m, ns in dihz._exports if k in ns][-1]
+        assert getattr(dihz, k) is getattr(module(origin), k)
+
+
+def test_no_other_exports():
+    exported = set()
+    for name, names in dihz._exports:
+        exported.update(names)
+    assert sorted(dihz.__all__) == sorted(exported)
+
+
+def test_lazy():
+    code = 'import sys, dihz; print(sorted(m for m in sys.modules if m.startswith("dihz.")))'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(dihz.__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == '[]'
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from dihz import batch, fused
+
+HZ = {'P': batch.hzP, 'S': batch.hzS}
+
+
+def catalog(n, seed):
+    # wide ranges, including near-equal masses and eccentric binaries
+    rng = np.random.default_rng(seed)
+    c = {'LA': rng.uniform(0.05, 3., n), 'teffA': rng.uniform(3000., 7000., n),
+         'mA': rng.uniform(0.1, 1.5, n), 'LB': rng.uniform(0.001, 3., n),
+         'teffB': rng.uniform(2700., 7000., n), 'mB': rng.uniform(0.1, 1.5, n),
+         'ab': 10.**rng.uniform(-1.5, 2., n), 'eb': rng.uniform(0., 0.99, n)}
+    twins = slice(0, n//10)
+    c['mB'][twins] = c['mA'][twins]*(1.+rng.uniform(-1e-3, 1e-3, n//10))
+    return c
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+def test_float32_within_rtol(hztype):
+    c = catalog(200000, 4)
+    r64 = HZ[hztype](c)
+    r32 = HZ[hztype](c, dtype=np.float32)
+    for k in batch.FLAGS:
+        assert np.array_equal(r32[k], r64[k])
+    for k in batch.RESULTS:
+        assert r32[k].dtype == np.float32
+        zone = k[:3] if k != 'astab' else 'valid'
+        ok = r64[zone]
+        assert np.all(np.abs(r32[k][ok]/r64[k][ok]-1.) < fused.RTOL)
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+def test_guarded_rows_recomputed(hztype):
+    c = catalog(1000, 5)
+    # 1-eb^2 and 1-2mu cancel in single precision
+    c['eb'][:10] = 0.9999
+    c['mB'][10:20] = c['mA'][10:20]
+    r64 = HZ[hztype](c)
+    r32 = HZ[hztype](c, dtype=np.float32)
+    rows = np.arange(20) if hztype == 'P' else np.arange(10)
+    assert np.all(r32['recomputed'][rows] == r64['valid'][rows])
+    rec = r32['recomputed']
+    assert rec.sum() >= len(rows)
+    for k in batch.RESULTS:
+        assert np.array_equal(r32[k][rec], r64[k][rec].astype(np.float32), equal_nan=True)
+
+
+def test_flags_reported():
+    c = catalog(100, 6)
+    c['eb'][:5] = 0.9999
+    cols = [c[k].astype(np.float32) for k in batch.COLUMNSP]
+    flags = np.zeros(100, dtype=bool)
+    fused.edgesS(*cols, dtype=np.float32, flags=flags)
+    assert np.all(flags[:5])
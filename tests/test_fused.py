@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, fused, stability
+
+
+def systems(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.1, 5., n), 'teffA': rng.uniform(3000., 7000., n),
+            'mA': rng.uniform(0.5, 1.5, n), 'LB': rng.uniform(0.01, 1., n),
+            'teffB': rng.uniform(2800., 6000., n), 'mB': rng.uniform(0.1, 0.9, n),
+            'abP': rng.uniform(0.05, 0.5, n), 'abS': rng.uniform(10., 60., n),
+            'eb': rng.uniform(0., 0.8, n)}
+
+def params(s, hztype, masses=True):
+    ab = s['abP'] if hztype == 'P' else s['abS']
+    if(masses):
+        return [s['LA'], s['teffA'], s['mA'], s['LB'], s['teffB'], s['mB'], ab, s['eb']]
+    return [s['LA'], s['teffA'], s['LB'], s['teffB'], ab, s['eb']]
+
+
+@pytest.mark.parametrize('func, baseline, hztype, masses',
+                         [(fused.phzP, circumbinary.PHZ, 'P', True), (fused.ahzP, circumbinary.AHZ, 'P', True),
+                          (fused.phzS, circumstellar.PHZ, 'S', False), (fused.ahzS, circumstellar.AHZ, 'S', False)])
+def test_matches_baseline(func, baseline, hztype, masses):
+    p = params(systems(5000), hztype, masses)
+    ref = baseline(*p)
+    # blocks that do not divide the rows, and a reused workspace
+    work = fused.Workspace(block=999)
+    for res in (func(*p), func(*p, block=999), func(*p, work=work), func(*p, work=work)):
+        for x, r in zip(res, ref):
+            assert np.allclose(x, r, rtol=1e-12, atol=0., equal_nan=True)
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+def test_edges_out(hztype):
+    s = systems(3000, seed=1)
+    p = params(s, hztype)
+    if(hztype == 'P'):
+        ref = circumbinary.PHZ(*p)+circumbinary.AHZ(*p)+[stability.hw99P(s['mA'], s['mB'], s['abP'], s['eb'])]
+        edges = fused.edgesP
+    else:
+        ps = params(s, hztype, masses=False)
+        ref = circumstellar.PHZ(*ps)+circumstellar.AHZ(*ps)+[stability.hw99S(s['mA'], s['mB'], s['abS'], s['eb'])]
+        edges = fused.edgesS
+
+    out = [np.empty(3000) for i in range(5)]
+    res = edges(*p, out=out, block=512)
+    for o, x, r in zip(out, res, ref):
+        assert x is o
+        assert np.allclose(o, r, rtol=1e-12, atol=0., equal_nan=True)
+
+
+def test_broadcast_scalars():
+    s = systems(100, seed=2)
+    phzi, phzo = fused.phzP(s['LA'], 5800., 1., 0.3, 4000., 0.5, 0.2, 0.1)
+    ref = circumbinary.PHZ(s['LA'], 5800., 1., 0.3, 4000., 0.5, 0.2, 0.1)
+    assert np.allclose(phzi, ref[0], rtol=1e-12) and np.allclose(phzo, ref[1], rtol=1e-12)
+    assert np.ndim(fused.ahzS(1., 5800., 0.3, 4000., 30., 0.1)[0]) == 0
+
+
+def test_out_checked():
+    p = params(systems(10), 'P')
+    with pytest.raises(ValueError):
+        fused.phzP(*p, out=[np.empty(10)])
+    with pytest.raises(ValueError):
+        fused.phzP(*p, out=[np.empty(10, dtype=np.float32), np.empty(10, dtype=np.float32)])
+    with pytest.raises(ValueError):
+        fused.phzP(*p, out=[np.empty(20)[::2], np.empty(10)])
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from dihz import batch
+from dihz.index import IntervalIndex, habitable
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'ab': rng.uniform(0.05, 0.3, n), 'eb': rng.uniform(0., 0.5, n)}
+
+
+def test_hztype_required_without_column():
+    res = batch.hzP(catalog(100))
+    with pytest.raises(ValueError):
+        habitable(res)
+    with pytest.raises(ValueError):
+        IntervalIndex.fromresults(res)
+
+
+def test_fromresults_hzP():
+    res = batch.hzP(catalog(2000))
+    lo, hi = habitable(res, 'P')
+    # P-type zones start outside the stability limit
+    ok = np.isfinite(lo)
+    assert ok.sum() > 0
+    assert np.all(lo[ok] >= res['astab'][ok])
+    assert np.all(hi[ok] == res['phzo'][ok])
+
+    index = IntervalIndex.fromresults(res, 'P')
+    assert len(index) == ok.sum()
+    for x in np.linspace(0.2, 3., 25):
+        expected = np.nonzero(ok & (lo <= x) & (hi >= x))[0]
+        assert np.array_equal(index.stab(x), expected)
+
+
+@pytest.mark.parametrize('types', [np.array([b'P', b'S']*100), np.array(['P', 'S']*100),
+                                   np.array(['P', 'S']*100, dtype=object)])
+def test_hztype_column(types):
+    res = batch.hzP(catalog(200))
+    res['hztype'] = types
+    lo, hi = habitable(res)
+    loP, hiP = habitable(res, 'P')
+    loS, hiS = habitable(res, 'S')
+    for a, p, s in [(lo, loP, loS), (hi, hiP, hiS)]:
+        assert np.array_equal(a[::2], p[::2], equal_nan=True)
+        assert np.array_equal(a[1::2], s[1::2], equal_nan=True)
+
+    # empty types are not recognized
+    res['hztype'] = types.copy()
+    res['hztype'][0] = types[0][:0]
+    with pytest.raises(ValueError):
+        habitable(res)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from dihz.insolation import insolation, kepler, orbit
+from dihz.seff import seffio
+
+
+def test_kepler():
+    rng = np.random.default_rng(0)
+    M = rng.uniform(-10., 10., (50, 20))
+    e = rng.uniform(0., 0.99, (50, 1))
+    E = kepler(M, e)
+    assert E.shape == (50, 20)
+    assert np.all((E >= 0.) & (E < 2.*np.pi))
+    assert np.allclose(E-e*np.sin(E), np.mod(M, 2.*np.pi), rtol=0., atol=1e-12)
+
+
+def test_kepler_broadcast():
+    # e may have the larger shape
+    E = kepler(1.0, [0.1, 0.5])
+    assert E.shape == (2,)
+    assert np.allclose(E-np.array([0.1, 0.5])*np.sin(E), 1.0, atol=1e-12)
+    assert kepler(np.zeros((3, 1)), np.zeros(4)).shape == (3, 4)
+
+
+def direct(hztype, LA, teffA, mA, LB, teffB, mB, ab, eb, ap, ep, omega, Mb0, Mp0, t):
+    # flux of one system at all epochs at once from orbit() samples
+    G = 4.*np.pi**2
+    mu = mB/(mA+mB)
+    bx, by = orbit(ab, eb, np.sqrt(G*(mA+mB)/ab**3)*t+Mb0)
+    n_p = np.sqrt(G*(mA if hztype == 'S' else mA+mB)/ap**3)
+    px, py = orbit(ap, ep, n_p*t+Mp0, omega)
+    if(hztype == 'S'):
+        px, py = px-mu*bx, py-mu*by
+    rA2 = (px+mu*bx)**2+(py+mu*by)**2
+    rB2 = (px-(1.-mu)*bx)**2+(py-(1.-mu)*by)**2
+    siA, soA = seffio(teffA)
+    siB, soB = seffio(teffB)
+    return LA/rA2+LB/rB2, LA/siA/rA2+LB/siB/rB2, LA/soA/rA2+LB/soB/rB2
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+def test_streamed_matches_direct(hztype):
+    rng = np.random.default_rng(1)
+    n = 20
+    p = {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+         'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+         'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+         'ab': rng.uniform(0.05, 0.3, n) if hztype == 'P' else rng.uniform(10., 50., n),
+         'eb': rng.uniform(0., 0.5, n)}
+    p['ap'] = 4.*p['ab'] if hztype == 'P' else 0.1*p['ab']
+    p.update(ep=rng.uniform(0., 0.3, n), omega=rng.uniform(0., 2.*np.pi, n),
+             Mb0=rng.uniform(0., 2.*np.pi, n), Mp0=rng.uniform(0., 2.*np.pi, n))
+    # a block that does not divide the epochs
+    t = np.sort(rng.uniform(0., 20., 1000))
+    res = insolation(hztype, t=t, block=77, **p)
+
+    for i in range(n):
+        s, fi, fo = direct(hztype, *[p[k][i] for k in ['LA', 'teffA', 'mA', 'LB', 'teffB', 'mB', 'ab', 'eb',
+                                                      'ap', 'ep', 'omega', 'Mb0', 'Mp0']], t)
+        assert np.isclose(res['smin'][i], s.min(), rtol=1e-12)
+        assert np.isclose(res['smax'][i], s.max(), rtol=1e-12)
+        assert np.isclose(res['smean'][i], s.mean(), rtol=1e-12)
+        assert np.isclose(res['fimax'][i], fi.max(), rtol=1e-12)
+        assert np.isclose(res['fimean'][i], fi.mean(), rtol=1e-12)
+        assert np.isclose(res['fomin'][i], fo.min(), rtol=1e-12)
+        assert np.isclose(res['fomean'][i], fo.mean(), rtol=1e-12)
+        assert res['phz'][i] == ((fi.max() <= 1.) & (fo.min() >= 1.))
+        assert res['ahz'][i] == ((fi.mean() <= 1.) & (fo.mean() >= 1.))
+
+
+def test_single_star_limit():
+    # a dark, massless secondary leaves the constant flux of a circular orbit
+    res = insolation('S', 1., 5780., 1., 0., 3000., 0., 20., 0., 1., np.linspace(0., 3., 100))
+    for k in ['smin', 'smax', 'smean']:
+        assert np.isclose(res[k], 1., rtol=1e-12)
+    assert np.isclose(res['fimax'], 1./seffio(5780.)[0], rtol=1e-12)
+    assert res['phz'] and res['ahz']
+
+
+def test_bad_type():
+    with pytest.raises(ValueError):
+        insolation('X', 1., 5780., 1., 0.1, 3000., 0.1, 0.2, 0., 1., [0.])
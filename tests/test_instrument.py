@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+
+from dihz import instrument, semianalytic, stability
+
+
+@pytest.fixture(autouse=True)
+def clean():
+    instrument.disable()
+    instrument.reset()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+def test_disabled_records_nothing():
+    events = []
+    instrument.register(events.append)
+    try:
+        stability.hw99P(1., 0.5, np.full(10, 0.2), 0.1)
+        instrument.count('semianalytic.rootsolve', iterations=3)
+    finally:
+        instrument.unregister(events.append)
+    assert instrument.summary() == {}
+    assert events == []
+
+
+def test_instrumented():
+    ab = np.full(100, 0.2)
+    with instrument.instrumented() as summary:
+        assert instrument.ENABLED
+        stability.hw99P(1., 0.5, ab, 0.1)
+        stability.hw99P(1., 0.5, ab[:10], 0.1)
+        semianalytic.PHZ_A(1., 5800., 0.2, 4000., np.full(20, 30.), 0.1)
+        res = summary()
+    assert not instrument.ENABLED
+
+    s = res['stability.hw99P']
+    assert s['calls'] == 2 and s['size'] == 110 and s['maxsize'] == 100
+    assert s['time'] >= s['maxtime'] > 0. and s['mean'] == pytest.approx(s['time']/2)
+    # stages nest and solver counters are recorded without calls
+    assert res['semianalytic.PHZ_A']['calls'] == 1
+    assert res['circumstellar.epmaxS']['calls'] == 1
+    assert res['semianalytic.rootsolve']['calls'] == 0
+    assert res['semianalytic.rootsolve']['counters']['rows'] == 40
+    assert res['semianalytic.rootsolve']['counters']['iterations'] > 0
+
+    # statistics survive the block, and are cleared on the next one
+    assert instrument.summary() == res
+    with instrument.instrumented(clear=False):
+        stability.hw99S(1., 0.5, 30., 0.1)
+    assert set(instrument.summary()) == set(res) | {'stability.hw99S'}
+    with instrument.instrumented():
+        pass
+    assert instrument.summary() == {}
+
+
+def test_instrumented_restores_state():
+    instrument.enable()
+    with pytest.raises(RuntimeError):
+        with instrument.instrumented():
+            raise RuntimeError
+    assert instrument.ENABLED
+    instrument.disable()
+    with instrument.instrumented():
+        pass
+    assert not instrument.ENABLED
+
+
+def test_callbacks():
+    events = []
+    callback = lambda name, event: events.append((name, event))
+    with instrument.instrumented(callback):
+        stability.hw99P(1., 0.5, np.full(5, 0.2), 0.1)
+        instrument.record('custom', 0.5, size=7, steps=3)
+    assert [name for name, event in events] == ['stability.hw99P', 'custom']
+    assert events[0][1]['calls'] == 1 and events[0][1]['size'] == 5
+    assert events[1][1] == {'time': 0.5, 'size': 7, 'calls': 1, 'steps': 3}
+    assert instrument.summary()['custom']['counters'] == {'steps': 3}
+
+    # unregistered when the block ends
+    instrument.enable()
+    stability.hw99P(1., 0.5, 0.2, 0.1)
+    assert len(events) == 2
+
+    instrument.register(callback)
+    instrument.unregister(callback)
+    instrument.unregister(callback)
+    stability.hw99P(1., 0.5, 0.2, 0.1)
+    assert len(events) == 2
+
+
+def test_exceptions_recorded():
+    with instrument.instrumented():
+        with pytest.raises(ValueError):
+            stability.stabilityLimit('X', 1., 0.5, 0.2, 0.1)
+    assert instrument.summary()['stability.stabilityLimit']['calls'] == 1
+
+
+def test_export(tmp_path):
+    with instrument.instrumented():
+        instrument.record('a', 0.25, size=4, iterations=2)
+        instrument.record('a', 0.75, size=8)
+    path = str(tmp_path/'stats.json')
+    text = instrument.export(path)
+    with open(path) as f:
+        assert f.read() == text
+    res = json.loads(text)
+    assert res == instrument.summary()
+    assert res['a'] == {'calls': 2, 'time': 1., 'maxtime': 0.75, 'size': 12, 'maxsize': 8,
+                        'counters': {'iterations': 2}, 'mean': 0.5}
+    assert json.loads(instrument.export()) == res
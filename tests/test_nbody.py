@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, nbody
+
+
+def jacobi(res, mA, mB, ab):
+    # Jacobi constant of the planets, conserved for a circular binary
+    x, v = res['x'], res['v']
+    xA, vA, xB, vB = nbody.binary(mA, mB, ab, 0., res['t'])
+    rA = np.sqrt(((x-xA)**2).sum(axis=1))
+    rB = np.sqrt(((x-xB)**2).sum(axis=1))
+    n = np.sqrt(nbody.G*(mA+mB)/ab**3)
+    return 0.5*(v**2).sum(axis=1)-nbody.G*(mA/rA+mB/rB)-n*(x[:, 0]*v[:, 1]-x[:, 1]*v[:, 0])
+
+
+def test_emaxS():
+    # the integration covers the first secular eccentricity maximum;
+    # epmaxS is the maximum of an initially circular orbit
+    ap = np.array([1.25, 1.4])
+    res = nbody.integrate('S', 1., 1., 10., 0.3, ap, norbits=12, steps=80)
+    assert not res['ejected'].any()
+    assert np.allclose(res['emax'], circumstellar.epmaxS(10., 0.3, ap), rtol=0.1)
+
+
+def test_emaxP():
+    # initially circular circumbinary orbits reach epmaxPe0 = 2 epmaxP
+    ap = np.array([4.])
+    res = nbody.integrate('P', 1., 0.5, 1., 0.3, ap, norbits=350, steps=20)
+    assert not res['ejected'].any()
+    assert np.allclose(res['emax'], 2.*circumbinary.epmaxP(1., 0.3, ap, 1., 0.5), rtol=0.15)
+
+
+def test_jacobi_constant():
+    mA, mB, ab = 1., 0.5, 1.
+    ap = np.array([2., 3., 4.])
+    # the state after a single step as reference
+    start = nbody.integrate('P', mA, mB, ab, 0., ap, norbits=1e-9, steps=20)
+    res = nbody.integrate('P', mA, mB, ab, 0., ap, norbits=100, steps=20)
+    assert np.allclose(jacobi(res, mA, mB, ab), jacobi(start, mA, mB, ab), rtol=1e-5, atol=0.)
+
+
+def test_ejected():
+    # planets well inside the P-type stability limit do not survive
+    res = nbody.integrate('P', 1., 1., 1., 0.5, [0.8, 4.], norbits=50, steps=20)
+    assert res['ejected'][0] and not res['ejected'][1]
+    with pytest.raises(ValueError):
+        nbody.integrate('X', 1., 1., 1., 0.5, [4.])
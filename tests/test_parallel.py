@@ -0,0 +1,46 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from dihz import batch, parallel
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'ab': rng.uniform(0.05, 0.3, n), 'eb': rng.uniform(0., 0.5, n)}
+
+
+@pytest.mark.parametrize('method', ['analytic', 'semianalytic'])
+def test_matches_batch(method, monkeypatch):
+    created = []
+    create = parallel._create
+
+    def record(shape, dtype):
+        shm, arr = create(shape, dtype)
+        created.append(shm.name)
+        return shm, arr
+
+    monkeypatch.setattr(parallel, '_create', record)
+    cat = catalog(1000)
+    cat['eb'][3] = 2.
+    res = parallel.run(cat, method=method, chunksize=300, workers=2, block=128)
+    ref = batch.hzP(cat, method=method)
+    for k in batch.RESULTS+batch.FLAGS:
+        assert np.array_equal(res[k], ref[k], equal_nan=True)
+
+    # the shared memory blocks are unlinked
+    assert len(created) == 3
+    for name in created:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        parallel.run(catalog(10), hztype='X')
+    with pytest.raises(ValueError):
+        parallel.run(catalog(10), method='numeric')
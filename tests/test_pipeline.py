@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from dihz import batch, pipeline
+
+HEADER = 'id,name,'+','.join(batch.COLUMNSP)+'\n'
+ROW = '%d,%s,1.0,5777,1.0,0.3,4500,0.7,0.2,0.1\n'
+
+
+def write(tmp_path, lines):
+    path = tmp_path/'catalog.csv'
+    path.write_text(HEADER+''.join(lines))
+    return str(path)
+
+
+def test_readcsv_types_fixed_by_first_chunk(tmp_path):
+    path = write(tmp_path, [ROW % (i, 'sys%d' % i) for i in range(5)])
+    chunks = list(pipeline.readcsv(path, chunksize=2))
+    assert [len(c['id']) for c in chunks] == [2, 2, 1]
+    for c in chunks:
+        assert c['id'].dtype == float
+        assert c['name'].dtype.kind == 'U'
+        assert c['LA'].dtype == float
+
+
+def test_readcsv_ragged_row(tmp_path):
+    path = write(tmp_path, [ROW % (0, 'a'), '1,b,1.0,5777\n'])
+    with pytest.raises(ValueError, match='Line 3'):
+        list(pipeline.readcsv(path))
+
+
+def test_readcsv_non_numeric(tmp_path):
+    path = write(tmp_path, [ROW % (0, 'a'), ROW % (1, 'b'), ROW.replace('0.2', 'x') % (2, 'c')])
+    with pytest.raises(ValueError, match='Line 4: column ab'):
+        list(pipeline.readcsv(path, chunksize=2))
+    # keep columns are numeric once the first chunk was
+    path = write(tmp_path, [ROW % (0, 'a'), ROW % (1, 'b'), ROW.replace('%d', 'x') % 'c'])
+    with pytest.raises(ValueError, match='column id'):
+        list(pipeline.readcsv(path, chunksize=2))
+
+
+def test_run_csv(tmp_path):
+    path = write(tmp_path, [ROW % (i, 'sys%d' % i) for i in range(5)])
+    out = str(tmp_path/'results.csv')
+    assert pipeline.run(path, out, chunksize=2, keep=['id']) == 5
+    res = list(pipeline.readcsv(out, numeric=()))[0]
+    ref = batch.hzP({k: np.array([float(v)]) for k, v in zip(batch.COLUMNSP, ROW.split(',')[2:])})
+    assert np.allclose(res['phzi'], ref['phzi'][0])
+    assert np.array_equal(res['id'], np.arange(5.))
+
+
+def test_readcsv_empty_fields_derived(tmp_path):
+    # L and teff left empty for main-sequence stars
+    path = write(tmp_path, ['0,a,,,1.0,,,0.5,0.2,0.1\n', ROW % (1, 'b')])
+    chunk = next(pipeline.readcsv(path))
+    assert np.isnan(chunk['LA'][0]) and np.isnan(chunk['teffB'][0])
+    res = batch.hzP(chunk)
+    assert np.all(res['valid'])
+    assert np.all(np.isfinite(res['phzi']))
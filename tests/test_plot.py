@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+
+import dihz
+from dihz import plot
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+def test_hzfigure(tmp_path):
+    fig = plot.hzfigure('P', 1., 0.3, 5800., 4000., 1., 0.5, 0.2, 0.1, title='AB')
+    path = str(tmp_path/'hz.png')
+    fig.savefig(path)
+    with open(path, 'rb') as f:
+        assert f.read(8) == PNG
+    assert plot.savehz(str(tmp_path/'s.png'), 'S', 1., 0.3, 5800., 4000., 1., 0.5, 30., 0.2) == str(tmp_path/'s.png')
+
+
+def test_gallery(tmp_path):
+    catalog = {'id': np.array([7, 9]), 'LA': [1., 1.5], 'LB': [0.3, 0.2], 'teffA': [5800., 6000.],
+               'teffB': [4000., 3800.], 'mA': [1., 1.1], 'mB': [0.5, 0.4], 'ab': [0.2, 0.3], 'eb': [0.1, 0.3]}
+    paths = plot.gallery(catalog, str(tmp_path/'out'), workers=2)
+    assert paths == [str(tmp_path/'out'/'7.png'), str(tmp_path/'out'/'9.png')]
+    for path in paths:
+        with open(path, 'rb') as f:
+            assert f.read(8) == PNG
+
+
+def test_no_pyplot():
+    # figures are drawn without loading pyplot and a GUI backend
+    code = ('import sys, dihz.plot as p; p.hzfigure("P", 1., 0.3, 5800., 4000., 1., 0.5, 0.2, 0.1); '
+            'print("matplotlib.pyplot" in sys.modules)')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(dihz.__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == 'False'
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from dihz import seff
+from dihz.seff import COEFFS, SeffTable, seffall, seffi, seffio, seffo
+
+
+def test_seffio_matches_baseline():
+    teff = np.linspace(2600., 7200., 1001)
+    sinner, souter = seffio(teff)
+    assert np.allclose(sinner, seffi(teff), rtol=1e-14, atol=0.)
+    assert np.allclose(souter, seffo(teff), rtol=1e-14, atol=0.)
+    assert np.isclose(seffio(5777.)[0], 1.107) and np.isclose(seffio(5777.)[1], 0.356)
+
+
+def test_seffall_coefficients():
+    teff = np.linspace(2600., 7200., 101)
+    t = teff-seff.teffsun
+    res = seffall(teff, list(COEFFS))
+    for limit, s in zip(COEFFS, res):
+        seff0, a, b, c, d = COEFFS[limit]
+        assert np.allclose(s, seff0+a*t+b*t**2+c*t**3+d*t**4, rtol=1e-13, atol=0.)
+
+
+@pytest.mark.parametrize('n', [65, 4097])
+def test_table_error_bound(n):
+    table = SeffTable(list(COEFFS), n=n)
+    teff = np.linspace(seff.TEFFMIN, seff.TEFFMAX, 200001)
+    for limit, s, exact in zip(COEFFS, table(teff), seffall(teff, list(COEFFS))):
+        err = np.max(np.abs(s-exact))
+        assert err <= table.error[limit]*(1.+1e-6)+1e-15
+        # the bound is attained to within a factor of a few
+        assert err > table.error[limit]/4.
+    if(n == 4097):
+        assert max(table.error.values()) < 1e-7
+
+
+def test_table_outside_range():
+    table = SeffTable()
+    teff = np.array([2000., 2600., 7200., 8000.])
+    for s, exact in zip(table(teff), seffio(teff)):
+        assert np.allclose(s, exact, rtol=1e-7, atol=0.)
+    assert np.ndim(table(5000.)[0]) == 0
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, semianalytic
+from dihz.seff import seffi, seffo
+
+optimize = pytest.importorskip('scipy.optimize')
+
+
+def systems(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'abP': rng.uniform(0.05, 0.3, n), 'abS': rng.uniform(20., 50., n),
+            'eb': rng.uniform(0., 0.5, n)}
+
+
+# residuals of the original one system at a time implementation
+
+def phziS(ap, LA, teffA, LB, teffB, ab, eb):
+    qp = ap*(1.-circumstellar.epmaxS(ab, eb, ap))
+    return LA/seffi(teffA)/qp**2+LB/seffo(teffB)/(qp-ab*(1.-eb))**2-1.
+
+def phzoS(ap, LA, teffA, LB, teffB, ab, eb):
+    apop = ap*(1.+circumstellar.epmaxS(ab, eb, ap))
+    return LA/seffo(teffA)/apop**2+LB/seffo(teffB)/(apop-ab*(1.+eb))**2-1.
+
+def ahzS(ap, LA, teffA, LB, teffB, ab, eb, seff):
+    reqp = circumstellar.reqpS(ab, eb, ap)
+    return LA/seff(teffA)/reqp**2+LB/seff(teffB)/(circumbinary.reqb(ab, eb)**2-reqp**2)-1.
+
+def ahzP(ap, LA, teffA, mA, LB, teffB, mB, ab, eb, seff):
+    mu = mB/(mA+mB)
+    reqp = circumbinary.reqpP(mA, mB, ab, eb, ap)
+    reqbP = circumbinary.reqb(ab, eb)
+    return LA/seff(teffA)/(reqp**2-(mu*mu*reqbP)**2)+LB/seff(teffB)/(reqp**2+((1-mu)*(1-mu)*reqbP)**2)-1
+
+def phzP(ap, LA, teffA, mA, LB, teffB, mB, ab, eb, seff, sign):
+    mu = mB/(mA+mB)
+    x = ap*(1.+sign*circumbinary.epmaxP(ab, eb, ap, mA, mB))
+    apob = ab*(1.+eb)
+    return LA/seff(teffA)/(x+sign*mu*apob)**2+LB/seff(teffB)/(x-sign*(1-mu)*apob)**2-1
+
+
+def fsolve(residual, x0, params):
+    return np.array([optimize.fsolve(residual, x0[i], args=tuple(p[i] for p in params))[0]
+                     for i in range(len(x0))])
+
+
+def test_rootsolve():
+    c = np.linspace(0.1, 100., 50)
+    x, conv = semianalytic.rootsolve(lambda x, c: x**3-c, np.zeros(50), np.full(50, 5.), args=(c,))
+    assert conv.all()
+    assert np.allclose(x, np.cbrt(c), rtol=1e-9)
+
+
+def test_rootsolve_unbracketed():
+    lo = np.array([0., 0., np.nan])
+    hi = np.array([1., 1., 1.])
+    x, conv = semianalytic.rootsolve(lambda x, c: x*x+c, lo, hi, args=(np.array([1., -0.25, -0.25]),))
+    assert np.isnan(x[0]) and not conv[0]
+    assert conv[1] and np.isclose(x[1], 0.5)
+    assert np.isnan(x[2]) and not conv[2]
+
+
+@pytest.mark.parametrize('name, residual, guess', [('phziS', phziS, seffi), ('phzoS', phzoS, seffo)])
+def test_solve_matches_fsolve(name, residual, guess):
+    s = systems(50)
+    params = [s['LA'], s['teffA'], s['LB'], s['teffB'], s['abS'], s['eb']]
+    x, conv = semianalytic.solve(name, *params)
+    ref = fsolve(residual, np.sqrt(s['LA']/guess(s['teffA'])), params)
+    assert conv.all()
+    assert np.allclose(x, ref, rtol=1e-8)
+
+    phzi, phzo = semianalytic.PHZ_A(*params)
+    assert np.allclose([phzi, phzo][name == 'phzoS'], ref, rtol=1e-8)
+
+
+def test_solve_nan_and_no_root():
+    # nan parameters and a secondary too close for an AHZ around the primary
+    x, conv = semianalytic.solve('ahziS', [np.nan, 1., 1.], 5000., 1., 4000., [30., 0.5, 30.], 0.1)
+    assert np.isnan(x[:2]).all()
+    assert not conv[:2].any()
+    assert conv[2] and x[2] > 0
+
+    phzi, phzo = semianalytic.PHZ_A(np.nan, 5000., 0.1, 4000., 30., 0.2)
+    assert phzi == 0 and phzo == 0
+
+
+@pytest.mark.parametrize('hz', ['PHZ_P', 'AHZ_P', 'AHZ_S'])
+def test_hz_matches_fsolve(hz):
+    s = systems(50, seed=1)
+    if(hz == 'AHZ_S'):
+        params = [s['LA'], s['teffA'], s['LB'], s['teffB'], s['abS'], s['eb']]
+        guess = [np.sqrt(s['LA']/seff(s['teffA'])) for seff in (seffi, seffo)]
+        refs = [fsolve(ahzS, x0, params+[[seff]*50]) for x0, seff in zip(guess, (seffi, seffo))]
+    else:
+        params = [s['LA'], s['teffA'], s['mA'], s['LB'], s['teffB'], s['mB'], s['abP'], s['eb']]
+        guess = [np.sqrt(s['LA']/seff(s['teffA'])+s['LB']/seff(s['teffB'])) for seff in (seffi, seffo)]
+        if(hz == 'AHZ_P'):
+            refs = [fsolve(ahzP, x0, params+[[seff]*50]) for x0, seff in zip(guess, (seffi, seffo))]
+        else:
+            refs = [fsolve(phzP, x0, params+[[seff]*50, [sign]*50])
+                    for x0, seff, sign in zip(guess, (seffi, seffo), (-1., 1.))]
+
+    edges = getattr(semianalytic, hz)(*params)
+    for x, ref in zip(edges, refs):
+        assert np.allclose(x, ref, rtol=1e-8)
+
+
+@pytest.mark.parametrize('hz, analytic, rtol', [('PHZ_P', circumbinary.PHZ, 0.25), ('AHZ_P', circumbinary.AHZ, 0.03),
+                                                ('PHZ_S', circumstellar.PHZ, 0.05), ('AHZ_S', circumstellar.AHZ, 0.02)])
+def test_hz_close_to_analytic(hz, analytic, rtol):
+    # the analytic zones are first order approximations of the same equations
+    s = systems(1000, seed=2)
+    if(hz.endswith('S')):
+        params = [s['LA'], s['teffA'], s['LB'], s['teffB'], s['abS'], s['eb']]
+    else:
+        params = [s['LA'], s['teffA'], s['mA'], s['LB'], s['teffB'], s['mB'], s['abP'], s['eb']]
+    for x, ref in zip(getattr(semianalytic, hz)(*params), analytic(*params)):
+        assert np.allclose(x, ref, rtol=rtol)
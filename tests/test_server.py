@@ -0,0 +1,133 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import numpy as np
+import pytest
+
+from dihz import batch, server, stability
+
+SYSTEM = {'LA': 1.0, 'teffA': 5777., 'mA': 1.0, 'LB': 0.3, 'teffB': 4500.,
+          'mB': 0.7, 'ab': 0.2, 'eb': 0.1}
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split()[1])
+    length = int([h for h in head.split(b'\r\n') if h.lower().startswith(b'content-length')][0].split(b':')[1])
+    body = json.loads(await reader.readexactly(length))
+    writer.close()
+    return status, body
+
+def get(port, path, params):
+    return request(port, ('GET %s?%s HTTP/1.1\r\nConnection: close\r\n\r\n' %
+                          (path, urlencode(params))).encode())
+
+def post(port, path, obj, length=None):
+    data = json.dumps(obj).encode()
+    length = len(data) if length is None else length
+    return request(port, ('POST %s HTTP/1.1\r\nContent-Length: %s\r\nConnection: close\r\n\r\n' %
+                          (path, length)).encode()+data)
+
+def serve(test, **kwargs):
+    async def main():
+        service = server.HZServer(**kwargs)
+        srv = await service.start(port=0)
+        try:
+            return await test(service, srv.sockets[0].getsockname()[1])
+        finally:
+            srv.close()
+            await srv.wait_closed()
+            service.close()
+    return asyncio.run(main())
+
+
+def test_scalar_endpoints():
+    async def test(service, port):
+        ref = batch.hzP({k: np.array([v]) for k, v in SYSTEM.items()})
+        status, res = await get(port, '/phz', dict(SYSTEM, hztype='P'))
+        assert status == 200
+        assert np.isclose(res['phzi'], ref['phzi'][0]) and res['phz'] == bool(ref['phz'][0])
+        status, res = await get(port, '/ahz', dict(SYSTEM, hztype='P'))
+        assert status == 200 and np.isclose(res['ahzo'], ref['ahzo'][0])
+        params = {k: SYSTEM[k] for k in server.STABPARAMS}
+        status, res = await post(port, '/stability', dict(params, hztype='S'))
+        assert status == 200
+        assert np.isclose(res['astab'], stability.hw99S(*[SYSTEM[k] for k in server.STABPARAMS]))
+    serve(test)
+
+
+def test_batching():
+    async def test(service, port):
+        eb = np.linspace(0., 0.5, 40)
+        res = await asyncio.gather(*[get(port, '/phz', dict(SYSTEM, eb=e)) for e in eb])
+        ref = batch.hzP({k: np.full(len(eb), v) if k != 'eb' else eb for k, v in SYSTEM.items()})
+        assert all(status == 200 for status, r in res)
+        assert np.allclose([r['phzo'] for status, r in res], ref['phzo'], equal_nan=True)
+        assert service.batcher.rows == len(eb)
+        assert service.batcher.batches < len(eb)
+    serve(test, window=0.05)
+
+
+def test_batch_endpoint():
+    async def test(service, port):
+        status, res = await post(port, '/batch', {'hztype': 'P', 'systems': [SYSTEM, SYSTEM]})
+        assert status == 200 and len(res['phzi']) == 2
+        status, res = await post(port, '/batch', {'systems': [1, 2]})
+        assert status == 400
+        status, res = await post(port, '/batch', {'systems': {'LA': [1.]}})
+        assert status == 400
+    serve(test)
+
+
+def test_errors(monkeypatch):
+    monkeypatch.setattr(server, 'MAXBODY', 16)
+
+    async def test(service, port):
+        status, res = await get(port, '/phz', {'LA': 1.})
+        assert status == 400 and 'Missing parameter' in res['error']
+        status, res = await get(port, '/phz', dict(SYSTEM, LA='x'))
+        assert status == 400
+        status, res = await get(port, '/phz', dict(SYSTEM, hztype='X'))
+        assert status == 400
+        status, res = await get(port, '/nothing', {})
+        assert status == 404
+        status, res = await post(port, '/phz', SYSTEM, length='abc')
+        assert status == 400 and 'Content-Length' in res['error']
+        status, res = await post(port, '/phz', SYSTEM)
+        assert status == 413
+        status, res = await request(port, b'PUT /phz HTTP/1.1\r\nConnection: close\r\n\r\n')
+        assert status == 405
+    serve(test)
+
+
+def test_batcher_tasks():
+    def func(key, cols):
+        if(key == 'fail'):
+            raise RuntimeError('failed')
+        return {'y': 2.*cols['x']}
+
+    async def main():
+        batcher = server.Batcher(func, window=0.01, maxbatch=3)
+        ok = [asyncio.ensure_future(batcher.submit('ok', {'x': float(i)})) for i in range(4)]
+        fail = asyncio.ensure_future(batcher.submit('fail', {'x': 1.}))
+        # rows without the columns of the first row of their batch
+        bad = [asyncio.ensure_future(batcher.submit('bad', row)) for row in ({'x': 1.}, {'z': 1.})]
+        await asyncio.sleep(0)
+        # the full batch is evaluated at once, and referenced until it is done
+        assert len(batcher._tasks) == 1
+        res = await asyncio.gather(*ok)
+        assert [r['y'] for r in res] == [0., 2., 4., 6.]
+        assert batcher.batches >= 2 and batcher.rows >= 4
+        with pytest.raises(RuntimeError):
+            await fail
+        for f in bad:
+            with pytest.raises(KeyError):
+                await f
+        await asyncio.sleep(0)
+        assert not batcher._tasks
+
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from dihz.stability import hw99P, hw99S, stabilityLimit
+
+
+def test_scalar():
+    assert stabilityLimit('S', 1., 0.5, 20., 0.3) == hw99S(1., 0.5, 20., 0.3)
+    assert stabilityLimit('P', 1., 0.5, 0.2, 0.3) == hw99P(1., 0.5, 0.2, 0.3)
+    assert np.ndim(stabilityLimit('P', 1., 0.5, 0.2, 0.3)) == 0
+
+
+@pytest.mark.parametrize('codes', [['S', 'P', 'P', 'S'], [b'S', b'P', b'P', b'S'], [0, 1, 1, 0],
+                                   [False, True, True, False],
+                                   ['circumstellar', 'P-type', 'p', 'S-Type']])
+def test_mixed_types(codes):
+    mA = np.array([1., 0.8, 1.2, 0.9])
+    mB = np.array([0.5, 0.4, 0.2, 0.9])
+    ab = np.array([20., 0.2, 0.1, 40.])
+    eb = np.array([0.3, 0.1, 0.5, 0.])
+    res = stabilityLimit(np.array(codes), mA, mB, ab, eb)
+    S = np.array([True, False, False, True])
+    assert np.array_equal(res[S], hw99S(mA[S], mB[S], ab[S], eb[S]))
+    assert np.array_equal(res[~S], hw99P(mA[~S], mB[~S], ab[~S], eb[~S]))
+
+
+def test_broadcast():
+    res = stabilityLimit(['S', 'P'], 1., 0.5, [[20.], [0.2]], 0.3)
+    assert res.shape == (2, 2)
+    assert res[1, 1] == hw99P(1., 0.5, 0.2, 0.3)
+    assert res[0, 0] == hw99S(1., 0.5, 20., 0.3)
+
+
+@pytest.mark.parametrize('args', [('X', 1., 0.5, 1., 0.1), (2, 1., 0.5, 1., 0.1), (['S', 'Q'], 1., 0.5, 1., 0.1),
+                                  ('S', 0., 0.5, 1., 0.1), ('S', 1., -0.5, 1., 0.1), ('P', 1., np.nan, 1., 0.1),
+                                  ('S', 1., 0.5, 0., 0.1), ('P', 1., 0.5, 1., 1.), ('P', 1., 0.5, 1., -0.1)])
+def test_errors(args):
+    with pytest.raises(ValueError):
+        stabilityLimit(*args)
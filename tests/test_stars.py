@@ -0,0 +1,28 @@
+import numpy as np
+
+from dihz import batch, stars
+
+
+def test_spectype_missing_entries():
+    spt = np.array(['G2V', None, np.nan, 'M4V', b'K7'], dtype=object)
+    mass, L, teff = stars.spectype(spt)
+    assert np.isnan(mass[[1, 2]]).all()
+    assert np.allclose(mass[[0, 3, 4]], [1.0, 0.23, 0.63])
+    assert np.allclose(teff[[0, 3, 4]], [5770., 3210., 4050.])
+
+
+def test_complete_with_missing_spectral_types():
+    n = 4
+    catalog = {'sptA': np.array(['G2V', 'K0V', None, 'F5V'], dtype=object),
+               'mB': np.full(n, 0.5), 'ab': np.full(n, 0.2), 'eb': np.full(n, 0.1)}
+    res = batch.hzP(catalog)
+    assert np.array_equal(res['valid'], [True, True, False, True])
+
+
+
+def test_mainsequence_nodes():
+    mass = np.array([d[3] for d in stars.DWARFS])
+    L, teff = stars.mainsequence(mass)
+    assert np.allclose(np.log10(L), [d[2] for d in stars.DWARFS], atol=stars.table().error+1e-12)
+    assert stars.table().error < 1e-3
+    assert np.all(np.isnan(stars.mainsequence([0.01, 50.])[0]))
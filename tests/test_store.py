@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from dihz import batch
+from dihz.store import ResultStore
+
+
+def results(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cat = {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+           'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+           'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+           'ab': rng.uniform(0.05, 0.3, n), 'eb': rng.uniform(0., 0.5, n)}
+    return batch.hzP(cat)
+
+
+def test_create_append_reopen(tmp_path):
+    path = str(tmp_path/'store')
+    store = ResultStore(path, 'a')
+    assert len(store) == 0 and len(store['phzi']) == 0
+    a, b = results(100), results(50, seed=1)
+    assert store.append(a, 'P') == 100
+    assert store.extend([b], 'P') == 50
+
+    store = ResultStore(path)
+    assert len(store) == 150
+    assert np.array_equal(store['id'], np.arange(150))
+    assert np.array_equal(store['phzi'], np.concatenate([a['phzi'], b['phzi']]), equal_nan=True)
+    assert np.all(store['hztype'] == b'P')
+    flags = store['flags']
+    assert np.array_equal(flags & 1 > 0, np.concatenate([a['valid'], b['valid']]))
+    assert np.array_equal(flags & 4 > 0, np.concatenate([a['ahz'], b['ahz']]))
+
+    # memory mapped row ranges
+    rows = store[90:110]
+    assert isinstance(store.column('astab'), np.memmap)
+    assert isinstance(rows['astab'], np.memmap)
+    assert np.array_equal(rows['astab'], np.concatenate([a['astab'][90:], b['astab'][:10]]))
+    assert np.array_equal(store.rows(140)['ahzo'], b['ahzo'][40:], equal_nan=True)
+    with pytest.raises(ValueError):
+        store['astab'][0] = 1.
+    with pytest.raises(IOError):
+        store.append(a, 'P')
+    with pytest.raises(TypeError):
+        store[3]
+
+
+def test_ids_and_types(tmp_path):
+    store = ResultStore(str(tmp_path/'store'), 'a')
+    res = results(10)
+    res['hztype'] = np.array([b'P', b'S']*5)
+    store.append(res, ids=np.arange(10)+1000)
+    assert np.array_equal(store['id'], np.arange(1000, 1010))
+    assert np.array_equal(store['hztype'], res['hztype'])
+
+
+def test_schema_mismatch(tmp_path):
+    path = str(tmp_path/'store')
+    store = ResultStore(path, 'a')
+    res = results(10)
+    with pytest.raises(ValueError):
+        store.append(res)
+    with pytest.raises(ValueError):
+        store.append(dict(res, astab=res['astab'][:5]), 'P')
+    bad = {k: v for k, v in res.items() if k != 'ahzo'}
+    with pytest.raises(ValueError):
+        store.append(bad, 'P')
+    assert len(store) == 0
+    store.append(res, 'P')
+    assert len(ResultStore(path)) == 10
+
+    # stores written with another schema are not opened
+    meta = os.path.join(path, 'schema.json')
+    with open(meta) as f:
+        m = json.load(f)
+    m['schema'] = m['schema'][:-1]
+    with open(meta, 'w') as f:
+        json.dump(m, f)
+    with pytest.raises(ValueError):
+        ResultStore(path)
+
+
+def test_missing(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ResultStore(str(tmp_path/'none'))
+    with pytest.raises(ValueError):
+        ResultStore(str(tmp_path/'none'), 'w')
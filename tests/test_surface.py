@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, semianalytic, stability
+from dihz.surface import EDGES, HZSurface
+
+# relative interpolation error of the default tables for systems with a
+# stable habitable zone; the largest error seen for this catalog is 0.5%
+# (semianalytic S-type PHZ inner edge), about 0.2% for the other edges
+RTOL = 0.01
+
+
+def catalog(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'LA': rng.uniform(0.5, 2., n), 'teffA': rng.uniform(4500., 6500., n),
+            'mA': rng.uniform(0.7, 1.3, n), 'LB': rng.uniform(0.05, 0.5, n),
+            'teffB': rng.uniform(3500., 5500., n), 'mB': rng.uniform(0.3, 0.7, n),
+            'ab': rng.uniform(0.05, 0.3, n), 'eb': rng.uniform(0., 0.5, n),
+            'abS': rng.uniform(10., 50., n)}
+
+def exact(hztype, method, LA, teffA, mA, LB, teffB, mB, ab, eb):
+    if(hztype == 'P'):
+        p = (LA, teffA, mA, LB, teffB, mB, ab, eb)
+        if(method == 'analytic'):
+            return circumbinary.PHZ(*p)+circumbinary.AHZ(*p)
+        return list(semianalytic.PHZ_P(*p))+list(semianalytic.AHZ_P(*p))
+    p = (LA, teffA, LB, teffB, ab, eb)
+    if(method == 'analytic'):
+        return circumstellar.PHZ(*p)+circumstellar.AHZ(*p)
+    return list(semianalytic.PHZ_S(*p))+list(semianalytic.AHZ_S(*p))
+
+def params(c, hztype):
+    ab = c['ab'] if hztype == 'P' else c['abS']
+    return [c['LA'], c['teffA'], c['mA'], c['LB'], c['teffB'], c['mB'], ab, c['eb']]
+
+
+@pytest.fixture(scope='module')
+def surfaces():
+    return {(t, m): HZSurface.build(t, m, workers=2, nvalidate=2000)
+            for t in ['P', 'S'] for m in ['analytic', 'semianalytic']}
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+@pytest.mark.parametrize('method', ['analytic', 'semianalytic'])
+def test_matches_exact(surfaces, hztype, method):
+    p = params(catalog(2000), hztype)
+    res = surfaces[hztype, method](*p)
+    ref = exact(hztype, method, *p)
+
+    astab = (stability.hw99P if hztype == 'P' else stability.hw99S)(p[2], p[5], p[6], p[7])
+    assert np.array_equal(res[4], astab)
+    for k in [0, 2]:
+        inner, outer = ref[k], ref[k+1]
+        with np.errstate(invalid='ignore'):
+            stable = (inner > 0) & (outer > inner) & ((inner >= astab) if hztype == 'P' else (outer <= astab))
+        assert stable.sum() > 1900
+        for x, r in zip(res[k:k+2], ref[k:k+2]):
+            assert np.allclose(x[stable], r[stable], rtol=RTOL, atol=0.)
+
+    for edge in EDGES:
+        assert surfaces[hztype, method].error[edge]['median'] < RTOL
+
+
+def test_outside_range(surfaces):
+    s = surfaces['P', 'analytic']
+    # binary wider than the table range, and an eccentricity above EB
+    res = s(1., 5800., 1., 0.3, 4000., 0.5, [5., 0.2], [0.1, 0.95])
+    for x in res[:4]:
+        assert np.isnan(x).all()
+    assert np.ndim(s(1., 5800., 1., 0.3, 4000., 0.5, 0.2, 0.1)[0]) == 0
+
+
+def test_save_load(surfaces, tmp_path):
+    s = surfaces['P', 'semianalytic']
+    path = str(tmp_path/'surface')
+    s.save(path)
+    loaded = HZSurface.load(path)
+    assert loaded.hztype == 'P' and loaded.method == 'semianalytic'
+    assert loaded.error == s.error
+    for k in s.axes:
+        assert np.array_equal(loaded.axes[k], s.axes[k])
+    for edge in EDGES:
+        assert isinstance(loaded.tables[edge], np.memmap)
+        assert np.array_equal(loaded.tables[edge], s.tables[edge], equal_nan=True)
+
+    p = params(catalog(500, seed=1), 'P')
+    for x, r in zip(loaded(*p), s(*p)):
+        assert np.array_equal(x, r, equal_nan=True)
+
+    inmemory = HZSurface.load(path, mmap_mode=None)
+    assert not isinstance(inmemory.tables['phzi'], np.memmap)
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        HZSurface.build('X')
+    with pytest.raises(ValueError):
+        HZSurface.build('P', 'numeric')
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from dihz import circumbinary, circumstellar, stability
+from dihz.sweep import hzmap
+
+AXES = {'P': np.linspace(0.05, 0.5, 7), 'S': np.linspace(10., 60., 7)}
+
+
+def direct(hztype, LA, teffA, LB, teffB, ab, eb, mu, mtot):
+    # one broadcast evaluation over the full grid
+    ab, eb, mu = np.meshgrid(ab, eb, mu, indexing='ij')
+    mB = mu*mtot
+    mA = mtot-mB
+    with np.errstate(all='ignore'):
+        if(hztype == 'P'):
+            p = (LA, teffA, mA, LB, teffB, mB, ab, eb)
+            return circumbinary.PHZ(*p)+circumbinary.AHZ(*p)+[stability.hw99P(mA, mB, ab, eb)]
+        p = (LA, teffA, LB, teffB, ab, eb)
+        return circumstellar.PHZ(*p)+circumstellar.AHZ(*p)+[stability.hw99S(mA, mB, ab, eb)]
+
+
+@pytest.mark.parametrize('hztype', ['P', 'S'])
+@pytest.mark.parametrize('memmap', [False, True])
+def test_tiles_match_direct(hztype, memmap, tmp_path):
+    ab, eb, mu = AXES[hztype], np.linspace(0., 0.6, 5), np.linspace(0.1, 0.5, 3)
+    params = (1.2, 5900., 0.3, 4200.)
+    outdir = str(tmp_path/'cubes') if memmap else None
+    # a tile that does not divide the 105 grid points
+    res = hzmap(hztype, *params, ab, eb, mu, mtot=1.5, tile=16, outdir=outdir)
+    ref = direct(hztype, *params, ab, eb, mu, 1.5)
+
+    assert res['dims'] == ('ab', 'eb', 'mu')
+    for name, r in zip(['phzi', 'phzo', 'ahzi', 'ahzo', 'astab'], ref):
+        assert res[name].shape == (7, 5, 3)
+        assert np.allclose(res[name], r, rtol=1e-12, atol=0., equal_nan=True)
+        if(memmap):
+            assert isinstance(res[name], np.memmap)
+            assert np.array_equal(np.load(str(tmp_path/'cubes'/(name+'.npy'))), res[name], equal_nan=True)
+
+    [phzi, phzo, ahzi, ahzo, astab] = ref
+    phz = (phzi > 0) & (phzo > phzi)
+    ahz = (ahzi > 0) & (ahzo > ahzi)
+    assert np.array_equal(res['phz'], phz) and np.array_equal(res['ahz'], ahz)
+    if(hztype == 'P'):
+        assert np.array_equal(res['phzstable'], phz & (phzi >= astab))
+        assert np.array_equal(res['ahzstable'], ahz & (ahzi >= astab))
+    else:
+        assert np.array_equal(res['phzstable'], phz & (phzo <= astab))
+        assert np.array_equal(res['ahzstable'], ahz & (ahzo <= astab))
+    assert res['phz'].any() and res['phzstable'].any()
+
+
+def test_tile_size_independent():
+    args = ('P', 1., 5800., 0.2, 4000., AXES['P'], np.linspace(0., 0.5, 4), [0.3])
+    one = hzmap(*args, tile=1)
+    full = hzmap(*args)
+    for name in ['phzi', 'ahzo', 'astab', 'ahzstable']:
+        assert np.array_equal(one[name], full[name], equal_nan=True)
+
+
+def test_bad_type():
+    with pytest.raises(ValueError):
+        hzmap('X', 1., 5800., 0.2, 4000., [0.1], [0.], [0.3])
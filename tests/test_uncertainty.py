@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from dihz import batch, uncertainty
+from dihz.uncertainty import StreamingQuantiles
+
+
+@pytest.mark.parametrize('first', [np.full((4, 8), np.nan), np.full((4, 1), 3.)])
+def test_range_follows_samples(first):
+    # an uninformative first batch must not freeze the bin range
+    rng = np.random.default_rng(1)
+    est = StreamingQuantiles(4)
+    est.update(first)
+    x = rng.normal(np.arange(4)[:, None]*10., 1., (4, 20000))
+    for chunk in np.split(x, 40, axis=1):
+        est.update(chunk)
+    q = [0.05, 0.16, 0.5, 0.84, 0.95]
+    if(np.isfinite(first).any()):
+        x = np.concatenate([first, x], axis=1)
+    width = (est.hi-est.lo)/est.nbins
+    err = np.abs(est.quantile(q)-np.quantile(x, q, axis=1).T)
+    assert np.all(err <= 2*width[:, None])
+    assert np.all(est.counts[:, [0, -1]].sum(axis=1) <= est.maxout*est.nvalid+1)
+
+
+def test_no_samples():
+    est = StreamingQuantiles(2)
+    est.update(np.full((2, 5), np.nan))
+    assert np.all(np.isnan(est.quantile([0.5])))
+
+
+def test_montecarlo_median():
+    catalog = {'LA': np.array([1.]), 'teffA': np.array([5777.]), 'mA': np.array([1.]),
+               'LB': np.array([0.3]), 'teffB': np.array([4500.]), 'mB': np.array([0.7]),
+               'ab': np.array([0.2]), 'eb': np.array([0.1])}
+    res = uncertainty.montecarlo(catalog, {'ab': 0.002}, nsamples=2000, seed=0)
+    ref = batch.hzP(catalog)
+    for k in batch.RESULTS:
+        assert np.isclose(res[k][0, 1], ref[k][0], rtol=0.01)
+        assert res[k][0, 0] <= res[k][0, 1] <= res[k][0, 2]